@@ -0,0 +1,95 @@
+'''times the library's bulk operations against a FakeServer.
+
+    python benchmarks/benchmark.py --sizes 1000,10000 --latency 0.0005
+
+every case is run against a fresh fake seeded with the given number of
+torrents and reported with the best wall time of its repeats, the rpc
+requests it made and the calls rtorrent had to answer.'''
+
+import argparse
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rtorrent_tools import Server, Pacer, Torrent
+from rtorrent_tools.fakeserver import FakeServer
+from rtorrent_tools import instrument
+
+
+def _group(server):
+    return server.view()
+
+
+CASES = (
+    ('view', lambda s, g: s.view()),
+    ('matching_names', lambda s, g: s.matching_names('alpha')),
+    ('matching_trackers', lambda s, g: s.matching_trackers('example.org')),
+    ('matching_throttle_name', lambda s, g: s.matching_throttle_name('slow')),
+    ('throttle.inventory', lambda s, g: s.throttle.inventory()),
+    ('group.size_bytes', lambda s, g: g.size_bytes()),
+    ('group.down.rate', lambda s, g: g.down.rate()),
+    ('group.ratios', lambda s, g: g.ratios()),
+    ('group.filter', lambda s, g: g.filter(Torrent.complete)),
+    ('group.filter ratio', lambda s, g: g.filter(('ratio', '>', 1))),
+    ('group.table', lambda s, g: g.table()),
+    ('group.bitfields', lambda s, g: g.bitfields()),
+    ('group.incomplete_files', lambda s, g: g.incomplete_files()),
+    ('group.call stop+start', lambda s, g: g.call('d.stop', 'd.start')),
+    ('group.call paced', lambda s, g: g.call('d.stop', 'd.start',
+                                             pacer=Pacer(s))),
+    ('group.set_throttle_name', lambda s, g: g.set_throttle_name('slow')),
+    ('group.custom.set', lambda s, g: g.custom.set('bench', '1')),
+)
+
+
+def run(size, latency, call_cost, repeat, jsonrpc, only):
+    rows = []
+    with FakeServer(size, latency=latency, call_cost=call_cost) as fake:
+        server = Server(fake.url, jsonrpc=jsonrpc)
+        group = _group(server)
+        for name, case in CASES:
+            if only and not re.search(only, name):
+                continue
+            best = None
+            for _ in range(repeat):
+                instrument.STATS.reset()
+                calls = fake.fake.calls
+                start = time.perf_counter()
+                case(server, group)
+                seconds = time.perf_counter() - start
+                if best is None or seconds < best[0]:
+                    requests = sum(e['count'] for e in
+                                   instrument.STATS.requests.values())
+                    best = (seconds, requests, fake.fake.calls - calls)
+            rows.append((name, size) + best)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--sizes', default='1000,10000',
+                        help='comma separated torrent counts')
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='seconds the fake adds to every request')
+    parser.add_argument('--call-cost', type=float, default=0.0,
+                        help='seconds the fake adds to every call')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--jsonrpc', action='store_true')
+    parser.add_argument('--only', help='regex of cases to run')
+    args = parser.parse_args()
+
+    print(f'{"case":<26}{"torrents":>10}{"seconds":>10}{"requests":>10}'
+          f'{"calls":>10}')
+    for size in map(int, args.sizes.split(',')):
+        for name, size, seconds, requests, calls in run(
+                size, args.latency, args.call_cost, args.repeat,
+                args.jsonrpc, args.only):
+            print(f'{name:<26}{size:>10}{seconds:>10.3f}{requests:>10}'
+                  f'{calls:>10}', flush=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,54 @@
 #!/usr/bin/env python
 
-from .server import Server
-from .torrent import Torrent
-from .torrentgroup import TorrentGroup
-from .fileutils import File, FileGroup, TimePeriod, SizeBytes
+'''names are imported from their modules the first time they are used, so
+importing one module of the package (the rtt command's cached reads, say)
+doesn't pay for loading all the others'''
 
-__all__ = ['Server', 'Torrent', 'TorrentGroup', 'File', 'FileGroup',
-           'TimePeriod', 'SizeBytes']
+import importlib
+
+# maps public name -> module it comes from
+_EXPORTS = {
+    'Server': '.server',
+    'Torrent': '.torrent',
+    'TorrentGroup': '.torrentgroup',
+    'File': '.fileutils',
+    'FileGroup': '.fileutils',
+    'TimePeriod': '.fileutils',
+    'SizeBytes': '.fileutils',
+    'Series': '.fileutils',
+    'Metainfo': '.metainfo',
+    'build_index': '.metainfo',
+    'Bitfield': '.bitfield',
+    'Pacer': '.pacer',
+    'Exporter': '.exporter',
+    'RateHistory': '.history',
+    'Policy': '.retention',
+    'Rule': '.retention',
+    'col': '.retention',
+    'Placement': '.placement',
+    'Sidecar': '.sidecar',
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name in _EXPORTS:
+        value = getattr(importlib.import_module(_EXPORTS[name], __name__),
+                        name)
+    else:
+        # rtorrent_tools.torrentgroup and the like, without importing them
+        # by hand first
+        try:
+            value = importlib.import_module('.' + name, __name__)
+        except ModuleNotFoundError as e:
+            if e.name != f'{__name__}.{name}':
+                raise
+            raise AttributeError(f'module {__name__!r} has no attribute '
+                                 f'{name!r}') from None
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,196 @@
+'''bencode decoding and encoding.
+
+decoding works on any buffer (bytes, bytearray, mmap or memoryview) without
+copying it. dict keys and integers are returned as bytes and int, every
+other string is a memoryview slice of the original buffer, so the piece
+hashes of a large torrent are never copied. call bytes() on a value to keep
+it past the life of the buffer.'''
+
+import hashlib
+
+# deepest nesting of lists and dicts decoded, well inside python's
+# recursion limit
+MAX_DEPTH = 200
+
+
+class BencodeError(ValueError):
+
+    pass
+
+
+def _number(view, i, stop, signed=False):
+    '''parses the ascii integer starting at i up to the stop byte and
+    returns (value, index of the stop byte). only plain digits are taken,
+    with a leading - when signed, and a length can't start with a 0.'''
+    start = i
+    end = len(view)
+    while i < end and view[i] != stop:
+        i += 1
+    if i == end or i == start:
+        raise BencodeError(f'invalid number at offset {start}')
+    raw = bytes(view[start:i])
+    digits = raw[1:] if signed and raw[:1] == b'-' else raw
+    if not digits.isdigit() or (not signed and raw[:1] == b'0' and
+                                raw != b'0'):
+        raise BencodeError(f'invalid number at offset {start}')
+    return int(raw), i
+
+
+def _string(view, i):
+    length, colon = _number(view, i, 0x3a)   # ':'
+    end = colon + 1 + length
+    if end > len(view):
+        raise BencodeError(f'string at offset {i} runs past the end')
+    return view[colon+1:end], end
+
+
+def _decode(view, i, depth=0):
+    '''returns (value, index just past it) for the value starting at i'''
+    if i >= len(view):
+        raise BencodeError('unexpected end of data')
+    if depth > MAX_DEPTH:
+        raise BencodeError(f'nested too deeply at offset {i}')
+    c = view[i]
+    if c == 0x69:       # 'i'
+        value, end = _number(view, i + 1, 0x65, signed=True)
+        return value, end + 1
+    if c == 0x6c:       # 'l'
+        i += 1
+        items = []
+        while i < len(view) and view[i] != 0x65:
+            value, i = _decode(view, i, depth + 1)
+            items.append(value)
+        if i >= len(view):
+            raise BencodeError('unterminated list')
+        return items, i + 1
+    if c == 0x64:       # 'd'
+        i += 1
+        items = {}
+        while i < len(view) and view[i] != 0x65:
+            key, i = _string(view, i)
+            items[bytes(key)], i = _decode(view, i, depth + 1)
+        if i >= len(view):
+            raise BencodeError('unterminated dict')
+        return items, i + 1
+    if 0x30 <= c <= 0x39:
+        return _string(view, i)
+    raise BencodeError(f'invalid bencode at offset {i}')
+
+
+def _skip(view, i, depth=0):
+    '''returns the index just past the value starting at i without
+    building it'''
+    if i >= len(view):
+        raise BencodeError('unexpected end of data')
+    if depth > MAX_DEPTH:
+        raise BencodeError(f'nested too deeply at offset {i}')
+    c = view[i]
+    if c == 0x69:
+        return _number(view, i + 1, 0x65, signed=True)[1] + 1
+    if c == 0x6c or c == 0x64:
+        i += 1
+        while i < len(view) and view[i] != 0x65:
+            if c == 0x64:
+                i = _string(view, i)[1]
+            i = _skip(view, i, depth + 1)
+        if i >= len(view):
+            raise BencodeError('unterminated list or dict')
+        return i + 1
+    if 0x30 <= c <= 0x39:
+        return _string(view, i)[1]
+    raise BencodeError(f'invalid bencode at offset {i}')
+
+
+def decode(data):
+    '''decodes a complete bencoded buffer'''
+    view = memoryview(data).cast('B')
+    value, end = _decode(view, 0)
+    if end != len(view):
+        raise BencodeError(f'trailing data at offset {end}')
+    return value
+
+
+def _encode(value, out):
+    if isinstance(value, bool) or isinstance(value, int):
+        out.append(b'i%de' % value)
+    elif isinstance(value, str):
+        value = value.encode()
+        out.append(b'%d:' % len(value))
+        out.append(value)
+    elif isinstance(value, (bytes, bytearray, memoryview)):
+        out.append(b'%d:' % memoryview(value).nbytes)
+        out.append(value)
+    elif isinstance(value, (list, tuple)):
+        out.append(b'l')
+        for item in value:
+            _encode(item, out)
+        out.append(b'e')
+    elif isinstance(value, dict):
+        out.append(b'd')
+        keys = {k.encode() if isinstance(k, str) else bytes(k): k
+                for k in value}
+        for key in sorted(keys):
+            _encode(key, out)
+            _encode(value[keys[key]], out)
+        out.append(b'e')
+    else:
+        raise TypeError(f'cannot bencode {type(value).__name__}')
+
+
+def encode(value):
+    '''bencodes ints, strings, bytes (or any buffer), lists and dicts.
+    buffers are joined into the result without being copied first.'''
+    out = []
+    _encode(value, out)
+    return b''.join(out)
+
+
+def info_span(data):
+    '''returns the (start, end) offsets of the info dict in raw .torrent
+    data'''
+    view = memoryview(data).cast('B')
+    if not len(view) or view[0] != 0x64:
+        raise BencodeError('torrent data is not a dict')
+    i = 1
+    while i < len(view) and view[i] != 0x65:
+        key, i = _string(view, i)
+        end = _skip(view, i)
+        if key == b'info':
+            return i, end
+        i = end
+    raise BencodeError('torrent data has no info dict')
+
+
+def infohash(data):
+    '''returns the v1 info hash of raw .torrent data the way rtorrent
+    shows it, as upper case hex'''
+    start, end = info_span(data)
+    view = memoryview(data).cast('B')
+    return hashlib.sha1(view[start:end]).hexdigest().upper()
+
+
+def set_key(data, key, value):
+    '''returns raw bencoded dict data with key set to value. every other
+    entry is copied byte for byte in its original order, so a non canonical
+    info dict keeps its info hash. a new key goes in front of the first
+    key that sorts after it.'''
+    view = memoryview(data).cast('B')
+    if not len(view) or view[0] != 0x64:
+        raise BencodeError('data is not a dict')
+    entries = []
+    i = 1
+    while i < len(view) and view[i] != 0x65:
+        start = i
+        name, i = _string(view, i)
+        i = _skip(view, i)
+        entries.append((bytes(name), view[start:i]))
+    if i >= len(view):
+        raise BencodeError('unterminated dict')
+    names = [name for name, raw in entries]
+    entry = (key, encode({key: value})[1:-1])
+    if key in names:
+        entries[names.index(key)] = entry
+    else:
+        entries.insert(next((n for n, name in enumerate(names)
+                             if name > key), len(entries)), entry)
+    return b''.join([b'd'] + [raw for name, raw in entries] + [b'e'])
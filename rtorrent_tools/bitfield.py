@@ -0,0 +1,97 @@
+class Bitfield:
+
+    '''which pieces of a torrent are done, decoded from rtorrent's
+    d.bitfield hex string. piece 0 is the high bit of the first byte.'''
+
+    def __init__(self, data, size):
+        self.data = bytes(data)
+        self.size = size
+        # the whole field as one int makes range counts a couple of shifts
+        self.__bits = int.from_bytes(self.data, 'big') >> (
+            len(self.data) * 8 - size) if size else 0
+
+    @classmethod
+    def from_hex(cls, hex, size, completed=None):
+        '''rtorrent returns an empty bitfield for torrents it hasn't opened.
+        completed (d.completed_chunks) tells what that means: a full field
+        when every chunk is done, an empty one when none is, and None when
+        only some are or completed isn't given, since which ones can't be
+        known.'''
+        if not hex and size:
+            if completed == size:
+                return cls(b'\xff' * ((size + 7) // 8), size)
+            if completed == 0:
+                return cls(bytes((size + 7) // 8), size)
+            return None
+        return cls(bytes.fromhex(hex), size)
+
+    @classmethod
+    def from_have(cls, have):
+        '''packs have, one true or false value per piece, into a Bitfield'''
+        field = bytearray((len(have) + 7) // 8)
+        for i, ok in enumerate(have):
+            if ok:
+                field[i >> 3] |= 0x80 >> (i & 7)
+        return cls(field, len(have))
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += self.size
+        if not 0 <= i < self.size:
+            raise IndexError(i)
+        return bool(self.data[i >> 3] & (0x80 >> (i & 7)))
+
+    def count(self, first=0, last=None):
+        '''number of done pieces in first .. last-1'''
+        if last is None:
+            last = self.size
+        if last <= first:
+            return 0
+        bits = (self.__bits >> (self.size - last)) & ((1 << (last - first)) - 1)
+        return bin(bits).count('1')
+
+    def completion(self, first=0, last=None):
+        '''fraction of the pieces in first .. last-1 that are done'''
+        if last is None:
+            last = self.size
+        return self.count(first, last) / (last - first) if last > first else 1.0
+
+    def missing_ranges(self):
+        '''returns (first, last) for every run of missing pieces, last
+        exclusive'''
+        ranges = []
+        start = None
+        for n, byte in enumerate(self.data):
+            if (byte == 0xff and start is None) or (byte == 0 and start is not None):
+                continue
+            for bit in range(8):
+                i = n * 8 + bit
+                if i >= self.size:
+                    break
+                done = byte & (0x80 >> bit)
+                if not done and start is None:
+                    start = i
+                elif done and start is not None:
+                    ranges.append((start, i))
+                    start = None
+        if start is not None:
+            ranges.append((start, self.size))
+        return ranges
+
+    def numpy(self, packed=False):
+        '''the pieces as a numpy bool array, or with packed=True the raw
+        uint8 bytes. needs numpy installed.'''
+        import numpy
+        raw = numpy.frombuffer(self.data, dtype=numpy.uint8)
+        if packed:
+            return raw
+        return numpy.unpackbits(raw)[:self.size].astype(bool)
+
+    def hex(self):
+        return self.data.hex().upper()
+
+    def __repr__(self):
+        return f'Bitfield({self.count()}/{self.size})'
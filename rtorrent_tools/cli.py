@@ -0,0 +1,267 @@
+'''rtt: quick looks at an rtorrent instance from the shell.
+
+    rtt list [PATTERN]          name, size, done, ratio and rates
+    rtt grep PATTERN [-f FIELD] torrents whose field matches
+    rtt stats                   totals for the view
+    rtt top [-n N] [-b KEY]     busiest torrents
+    rtt start PATTERN           start, stop or move the torrents whose
+    rtt stop PATTERN            names match
+    rtt move PATTERN DEST
+
+the url comes from --url or RTT_URL. read commands answer from a snapshot
+of the view cached under ~/.cache/rtorrent_tools that is fetched again with
+one d.multicall2 once it is older than --max-age seconds, so most runs
+never load the rpc code or touch rtorrent. the cache is stored a column per
+field, which json reads several times faster than a dict per torrent.
+start, stop and move always work from a fresh snapshot and leave the cache
+stale behind them.'''
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+
+# seconds a cached snapshot answers read commands for
+MAX_AGE = 60.0
+# snapshot fields -> d.multicall2 command
+FIELDS = {
+    'hash': 'd.hash=',
+    'name': 'd.name=',
+    'size': 'd.size_bytes=',
+    'completed': 'd.completed_bytes=',
+    'ratio': 'd.ratio=',
+    'up': 'd.up.rate=',
+    'down': 'd.down.rate=',
+    'state': 'd.state=',
+    'active': 'd.is_active=',
+    'directory': 'd.directory=',
+    'label': 'd.custom1=',
+    'tracker': 't.multicall=,t.url=',
+}
+UNITS = ('B', 'KB', 'MB', 'GB', 'TB', 'PB')
+
+
+def _size(value):
+    for unit in UNITS:
+        if abs(value) < 1024 or unit == UNITS[-1]:
+            return f'{value:.1f}{unit}' if unit != 'B' else f'{value}B'
+        value /= 1024
+
+
+def cache_path(url, view):
+    base = os.environ.get('XDG_CACHE_HOME',
+                          os.path.join(os.path.expanduser('~'), '.cache'))
+    key = hashlib.sha1(f'{url} {view}'.encode()).hexdigest()[:16]
+    return os.path.join(base, 'rtorrent_tools', f'{key}.json')
+
+
+def fetch(url, view, jsonrpc=False):
+    '''reads the view from rtorrent. returns (server, snapshot) where the
+    snapshot is a dict with 'taken' and 'columns', mapping each of FIELDS
+    to a list with a value per torrent.'''
+    from .server import Server
+    from .fileutils import tracker_host
+    server = Server(url, jsonrpc=jsonrpc)
+    rows = server._rpc.d.multicall2('', view, *FIELDS.values())
+    columns = dict(zip(FIELDS, map(list, zip(*rows))) if rows else
+                   {field: [] for field in FIELDS})
+    columns['ratio'] = [ratio / 1000 for ratio in columns['ratio']]
+    columns['tracker'] = [tracker_host(urls) for urls in columns['tracker']]
+    return server, {'taken': time.time(), 'columns': columns}
+
+
+def save(path, snapshot):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    part = f'{path}.{os.getpid()}'
+    with open(part, 'w') as f:
+        json.dump(snapshot, f)
+    os.replace(part, path)
+
+
+def load(args):
+    '''the cached snapshot when it is fresh enough, otherwise a new one'''
+    path = cache_path(args.url, args.view)
+    if not args.refresh:
+        try:
+            with open(path) as f:
+                snapshot = json.load(f)
+            if time.time() - snapshot['taken'] <= args.max_age and \
+                    set(snapshot['columns']) == set(FIELDS):
+                return snapshot
+        except (OSError, ValueError, KeyError):
+            pass
+    snapshot = fetch(args.url, args.view, args.jsonrpc)[1]
+    save(path, snapshot)
+    return snapshot
+
+
+def _matching(columns, pattern, field='name'):
+    search = re.compile(pattern, re.I).search
+    return [i for i, value in enumerate(columns[field])
+            if search(str(value))]
+
+
+def _done(columns, i):
+    size = columns['size'][i]
+    return 100 * columns['completed'][i] / size if size else 100.0
+
+
+def _print_rows(columns, indexes):
+    c = columns
+    for i in indexes:
+        print(f'{_size(c["size"][i]):>9} {_done(c, i):5.1f}% '
+              f'{c["ratio"][i]:6.2f} {_size(c["down"][i]) + "/s":>11} '
+              f'{_size(c["up"][i]) + "/s":>11}  {c["name"][i]}')
+
+
+def cmd_list(args):
+    columns = load(args)['columns']
+    if args.pattern:
+        indexes = _matching(columns, args.pattern)
+    else:
+        indexes = range(len(columns['hash']))
+    names = columns['name']
+    _print_rows(columns, sorted(indexes, key=lambda i: names[i].lower()))
+
+
+def cmd_grep(args):
+    columns = load(args)['columns']
+    for i in _matching(columns, args.pattern, args.field):
+        print(f'{columns["hash"][i]}  {columns[args.field][i]}')
+
+
+def cmd_stats(args):
+    snapshot = load(args)
+    c = snapshot['columns']
+    trackers = set(c['tracker'])
+    print(f'torrents   {len(c["hash"])}')
+    print(f'complete   '
+          f'{sum(a == b for a, b in zip(c["completed"], c["size"]))}')
+    print(f'started    {sum(map(bool, c["state"]))}')
+    print(f'active     {sum(map(bool, c["active"]))}')
+    print(f'size       {_size(sum(c["size"]))}')
+    print(f'done       {_size(sum(c["completed"]))}')
+    print(f'down       {_size(sum(c["down"]))}/s')
+    print(f'up         {_size(sum(c["up"]))}/s')
+    print(f'trackers   {len(trackers)}')
+    print(f'age        {time.time() - snapshot["taken"]:.0f}s')
+
+
+def cmd_top(args):
+    columns = load(args)['columns']
+    key = columns[args.by]
+    _print_rows(columns, sorted(range(len(key)), key=key.__getitem__,
+                                reverse=True)[:args.count])
+
+
+def _act(args, act):
+    '''runs act(group) on the torrents matching args.pattern in a fresh
+    snapshot, then marks the cache stale'''
+    from .torrent import Torrent
+    from .torrentgroup import TorrentGroup
+    server, snapshot = fetch(args.url, args.view, args.jsonrpc)
+    columns = snapshot['columns']
+    indexes = _matching(columns, args.pattern)
+    if not indexes:
+        print(f'nothing matches {args.pattern!r}', file=sys.stderr)
+        return 1
+    group = TorrentGroup(*[Torrent(server, columns['hash'][i],
+                                   columns['name'][i]) for i in indexes])
+    report = act(group)
+    try:
+        os.remove(cache_path(args.url, args.view))
+    except FileNotFoundError:
+        pass
+    failed = 0
+    for torrent, error in zip(group, report):
+        if error is not None:
+            failed += 1
+            print(f'{torrent.name}: {error}', file=sys.stderr)
+    print(f'{len(group) - failed} of {len(group)} torrents done')
+    return 1 if failed else 0
+
+
+def _call(command):
+    def act(group):
+        from .fileutils import first_fault
+        return [first_fault(row) for row in group.call(command)]
+    return act
+
+
+def cmd_start(args):
+    return _act(args, _call('d.start'))
+
+
+def cmd_stop(args):
+    return _act(args, _call('d.stop'))
+
+
+def cmd_move(args):
+    def act(group):
+        report = group.relocate(args.dest)
+        return [report.get(t.hash) for t in group]
+    return _act(args, act)
+
+
+def parser():
+    parser = argparse.ArgumentParser(
+        prog='rtt', description=__doc__.split('\n')[0],
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=__doc__.split('\n\n', 1)[1])
+    parser.add_argument('--url', default=os.environ.get('RTT_URL'),
+                        help='rtorrent rpc url, RTT_URL by default')
+    parser.add_argument('--jsonrpc', action='store_true')
+    parser.add_argument('--view', default='main')
+    parser.add_argument('--max-age', type=float, default=MAX_AGE,
+                        help='seconds a cached snapshot is used for')
+    parser.add_argument('--refresh', action='store_true',
+                        help='ignore the cached snapshot')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    p = commands.add_parser('list', help='list torrents')
+    p.add_argument('pattern', nargs='?')
+    p.set_defaults(run=cmd_list)
+
+    p = commands.add_parser('grep', help='search a field')
+    p.add_argument('pattern')
+    p.add_argument('-f', '--field', default='name',
+                   choices=('name', 'tracker', 'directory', 'label', 'hash'))
+    p.set_defaults(run=cmd_grep)
+
+    p = commands.add_parser('stats', help='totals for the view')
+    p.set_defaults(run=cmd_stats)
+
+    p = commands.add_parser('top', help='busiest torrents')
+    p.add_argument('-n', '--count', type=int, default=10)
+    p.add_argument('-b', '--by', default='up',
+                   choices=('up', 'down', 'ratio', 'size'))
+    p.set_defaults(run=cmd_top)
+
+    for name, run in (('start', cmd_start), ('stop', cmd_stop)):
+        p = commands.add_parser(name, help=f'{name} matching torrents')
+        p.add_argument('pattern')
+        p.set_defaults(run=run)
+
+    p = commands.add_parser('move', help='move the data of matching torrents')
+    p.add_argument('pattern')
+    p.add_argument('dest')
+    p.set_defaults(run=cmd_move)
+    return parser
+
+
+def main(argv=None):
+    args = parser().parse_args(argv)
+    if not args.url:
+        print('rtt: no url, give --url or set RTT_URL', file=sys.stderr)
+        return 2
+    try:
+        return args.run(args) or 0
+    except BrokenPipeError:
+        return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
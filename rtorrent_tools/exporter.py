@@ -0,0 +1,202 @@
+'''serves rtorrent metrics in the prometheus text format.
+
+every scrape is answered from one snapshot: a single multicall that reads
+the global throttle counters together with a d.multicall2 over the whole
+view, plus one more for the limits of named throttles. the rendered page
+is kept for a minimum refresh interval and scrapes that arrive while a
+snapshot is being taken wait for it, so any number of scrapers costs
+rtorrent at most one snapshot per interval.
+
+    python -m rtorrent_tools.exporter http://localhost/RPC2 --port 9135'''
+
+from .fileutils import multicall_results, first_fault, tracker_host
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import argparse
+import threading
+import time
+
+# seconds a snapshot is served before rtorrent is asked again
+REFRESH_INTERVAL = 15
+PORT = 9135
+
+GLOBALS = (
+    ('down_rate_bytes', 'gauge', 'global download rate',
+     'throttle.global_down.rate'),
+    ('up_rate_bytes', 'gauge', 'global upload rate',
+     'throttle.global_up.rate'),
+    ('down_total_bytes', 'counter', 'bytes downloaded this session',
+     'throttle.global_down.total'),
+    ('up_total_bytes', 'counter', 'bytes uploaded this session',
+     'throttle.global_up.total'),
+    ('down_max_bytes', 'gauge', 'global download limit, 0 for none',
+     'throttle.global_down.max_rate'),
+    ('up_max_bytes', 'gauge', 'global upload limit, 0 for none',
+     'throttle.global_up.max_rate'),
+)
+
+TORRENT_FIELDS = ('d.throttle_name=', 'd.state=', 'd.is_active=',
+                  'd.complete=', 'd.down.rate=', 'd.up.rate=',
+                  'd.size_bytes=', 'd.completed_bytes=',
+                  'd.peers_connected=', 't.multicall=,t.url=')
+
+
+def _state(state, active):
+    if not state:
+        return 'stopped'
+    return 'started' if active else 'paused'
+
+
+def _escape(value):
+    return (str(value).replace('\\', '\\\\').replace('"', '\\"')
+            .replace('\n', '\\n'))
+
+
+class Exporter:
+
+    '''takes snapshots of a Server and renders them as metrics. metrics()
+    is safe to call from many threads and only takes a new snapshot once
+    refresh seconds have passed since the last one.'''
+
+    def __init__(self, server, view='main', refresh=REFRESH_INTERVAL):
+        self.server = server
+        self.view = view
+        self.refresh = refresh
+        self.__lock = threading.Lock()
+        self.__text = None
+        self.__taken = 0.0
+
+    def snapshot(self):
+        '''returns (globals, throttle limits, torrent rows) read from
+        rtorrent in two round trips at most'''
+        mc = self.server.get_mc_proxy()
+        for name, kind, help, command in GLOBALS:
+            getattr(mc, command)()
+        getattr(mc, 'd.multicall2')('', self.view, *TORRENT_FIELDS)
+        results = multicall_results(mc)
+        error = first_fault(results)
+        if error is not None:
+            raise error
+        *values, rows = results
+
+        limits = self.server.throttle.limits(
+            sorted(set(row[0] for row in rows if row[0])))
+        return values, limits, rows
+
+    def render(self, values, limits, rows, seconds):
+        '''the metrics page for one snapshot'''
+        metrics = {}
+
+        def add(name, kind, help, labels, value):
+            samples = metrics.setdefault(name, (kind, help, {}))[2]
+            key = tuple(sorted(labels.items()))
+            samples[key] = samples.get(key, 0) + value
+
+        for (name, kind, help, command), value in zip(GLOBALS, values):
+            add(name, kind, help, {}, value)
+        for (throttle, state, active, complete, down, up, size, done, peers,
+             urls) in rows:
+            tracker = tracker_host(urls)
+            add('torrents', 'gauge', 'torrents by state',
+                {'state': _state(state, active),
+                 'complete': str(int(bool(complete)))}, 1)
+            add('peers_connected', 'gauge', 'connected peers',
+                {'state': _state(state, active)}, peers)
+            add('throttle_torrents', 'gauge', 'torrents per throttle',
+                {'throttle': throttle}, 1)
+            add('throttle_down_rate_bytes', 'gauge',
+                'download rate per throttle', {'throttle': throttle}, down)
+            add('throttle_up_rate_bytes', 'gauge',
+                'upload rate per throttle', {'throttle': throttle}, up)
+            add('tracker_torrents', 'gauge', 'torrents per tracker',
+                {'tracker': tracker}, 1)
+            add('tracker_down_rate_bytes', 'gauge',
+                'download rate per tracker', {'tracker': tracker}, down)
+            add('tracker_up_rate_bytes', 'gauge', 'upload rate per tracker',
+                {'tracker': tracker}, up)
+            add('tracker_size_bytes', 'gauge', 'data size per tracker',
+                {'tracker': tracker}, size)
+            add('tracker_completed_bytes', 'gauge',
+                'data downloaded per tracker', {'tracker': tracker}, done)
+        for throttle, (down_max, up_max) in limits.items():
+            if down_max is not None:
+                add('throttle_down_max_bytes', 'gauge',
+                    'download limit per throttle', {'throttle': throttle},
+                    down_max)
+            if up_max is not None:
+                add('throttle_up_max_bytes', 'gauge',
+                    'upload limit per throttle', {'throttle': throttle},
+                    up_max)
+        add('snapshot_seconds', 'gauge', 'time taken by the last snapshot',
+            {}, seconds)
+
+        lines = []
+        for name, (kind, help, samples) in metrics.items():
+            name = 'rtorrent_' + name
+            lines.append(f'# HELP {name} {help}')
+            lines.append(f'# TYPE {name} {kind}')
+            for key, value in samples.items():
+                labels = ','.join(f'{k}="{_escape(v)}"' for k, v in key)
+                lines.append(f'{name}{{{labels}}} {value}' if labels
+                             else f'{name} {value}')
+        return '\n'.join(lines) + '\n'
+
+    def metrics(self):
+        '''the current metrics page, from cache while it is fresh'''
+        with self.__lock:
+            if self.__text is None or \
+                    time.monotonic() - self.__taken >= self.refresh:
+                start = time.monotonic()
+                snapshot = self.snapshot()
+                self.__text = self.render(*snapshot,
+                                          time.monotonic() - start)
+                self.__taken = time.monotonic()
+            return self.__text
+
+    def serve(self, host='127.0.0.1', port=PORT):
+        '''serves /metrics over http until interrupted'''
+        exporter = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def do_GET(self):
+                if self.path.split('?')[0] not in ('/', '/metrics'):
+                    self.send_error(404)
+                    return
+                try:
+                    body = exporter.metrics().encode()
+                except Exception as e:
+                    self.send_error(503, str(e))
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type',
+                                 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        httpd = ThreadingHTTPServer((host, port), Handler)
+        try:
+            httpd.serve_forever()
+        finally:
+            httpd.server_close()
+
+
+def main():
+    from .server import Server
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('url', help='rtorrent rpc url')
+    parser.add_argument('--jsonrpc', action='store_true')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--view', default='main')
+    parser.add_argument('--refresh', type=float, default=REFRESH_INTERVAL)
+    args = parser.parse_args()
+    server = Server(args.url, jsonrpc=args.jsonrpc)
+    Exporter(server, args.view, args.refresh).serve(args.host, args.port)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,487 @@
+'''an in memory stand in for rtorrent, for benchmarks and trying things out.
+
+FakeServer is seeded with any number of synthetic torrents and answers
+xmlrpc and json-rpc over http and xmlrpc over scgi. it implements the
+commands this library uses: d.*, f.*, t.* and p.* getters and setters,
+d.multicall2 with nested f/t/p.multicall, system.multicall, view.*,
+load.*, throttle.* and the common system.* calls. like rtorrent it runs
+one request at a time, and latency (seconds per request) and call_cost
+(seconds per call, so a d.multicall2 costs one per torrent and command)
+make it as slow as a real daemon.
+
+    with FakeServer(torrents=10000, latency=0.001) as fake:
+        server = Server(fake.url)
+
+or from a shell
+
+    python -m rtorrent_tools.fakeserver --torrents 10000 --port 8000'''
+
+from .bencode import encode
+from .metainfo import Metainfo
+from .rpcserver import Endpoint, RPCServer, fault
+import argparse
+import hashlib
+import os
+import random
+import threading
+import time
+import xmlrpc.client
+
+TRACKERS = ('tracker.example.org', 'tracker.example.net', 'announce.test',
+            'bt.example.com', 'open.tracker.test')
+THROTTLES = ('', '', 'slow', 'fast')
+WORDS = ('alpha', 'bravo', 'charlie', 'delta', 'echo', 'foxtrot', 'golf',
+         'hotel', 'india', 'juliet', 'kilo', 'lima', 'mike', 'november')
+VIEWS = {
+    'main': lambda t: True,
+    'default': lambda t: True,
+    'name': lambda t: True,
+    'started': lambda t: t['state'],
+    'stopped': lambda t: not t['state'],
+    'complete': lambda t: t['complete'],
+    'incomplete': lambda t: not t['complete'],
+    'hashing': lambda t: t['hashing'],
+    'seeding': lambda t: t['state'] and t['complete'],
+    'leeching': lambda t: t['state'] and not t['complete'],
+    'active': lambda t: t['is_active'],
+}
+# unknown methods, the same fault rtorrent sends
+NOT_DEFINED = -506
+NOT_FOUND = -501
+
+
+def synthetic(count, seed=0):
+    '''returns a dict of count synthetic torrents keyed by info hash. the
+    same count and seed always give the same torrents.'''
+    rng = random.Random(seed)
+    torrents = {}
+    now = int(time.time())
+    for i in range(count):
+        hash = hashlib.sha1(f'{seed}:{i}'.encode()).hexdigest().upper()
+        name = '.'.join(rng.choice(WORDS).title() for _ in range(3))
+        name += f'.S{rng.randint(1, 12):02d}E{i % 100:02d}.1080p-GRP{i}'
+        chunk_size = 1 << rng.randint(18, 22)
+        files = [(f'{name}.part{n}.mkv' if n else f'{name}.mkv',
+                  rng.randint(1, 2000) * 1024**2)
+                 for n in range(rng.choice((1, 1, 1, 2, 4)))]
+        size = sum(s for p, s in files)
+        chunks = (size + chunk_size - 1) // chunk_size
+        complete = rng.random() < 0.7
+        done = chunks if complete else rng.randint(0, chunks - 1)
+        state = int(rng.random() < 0.8)
+        active = int(state and rng.random() < 0.9)
+        multi = len(files) > 1
+        base = f'/data/{rng.choice(WORDS)}' + (f'/{name}' if multi else '')
+        uploaded = int(size * rng.random() * 3)
+        added = now - rng.randint(0, 400 * 86400)
+        torrents[hash] = {
+            'hash': hash, 'name': name, 'state': state, 'is_active': active,
+            'is_open': state, 'complete': int(complete),
+            'incomplete': int(not complete), 'is_multi_file': int(multi),
+            'is_private': int(rng.random() < 0.5), 'size_bytes': size,
+            'size_chunks': chunks, 'chunk_size': chunk_size,
+            'size_files': len(files),
+            'completed_chunks': done,
+            'completed_bytes': min(done * chunk_size, size),
+            'left_bytes': size - min(done * chunk_size, size),
+            'chunks_hashed': 0, 'hashing': 0, 'is_hash_checking': 0,
+            'hashing_failed': 0,
+            'down.rate': 0 if complete else rng.randint(0, 5 * 1024**2),
+            'up.rate': rng.randint(0, 1024**2) if active else 0,
+            'down.total': min(done * chunk_size, size),
+            'bytes_done': min(done * chunk_size, size),
+            'up.total': uploaded,
+            'ratio': uploaded * 1000 // size if size else 0,
+            'throttle_name': rng.choice(THROTTLES),
+            'message': ('Tracker: [Failure reason "Unregistered torrent"]'
+                        if rng.random() < 0.03 else ''),
+            'directory': base, 'directory_base': base,
+            'base_path': base if state else '',
+            'peers_connected': rng.randint(0, 40) if active else 0,
+            'priority': 2, 'creation_date': added - 3600,
+            'load_date': added, 'timestamp.started': added,
+            'timestamp.finished': added + 3600 if complete else 0,
+            'connection_current': 'seed' if complete else 'leech',
+            'tied_to_file': '', 'loaded_file': '', 'views': [],
+            'custom': {'addtime': str(added)},
+            'custom1': '', 'custom2': '', 'custom3': '', 'custom4': '',
+            'custom5': '',
+            'files': _files(files, chunk_size, complete),
+            'trackers': [{'url': f'https://{rng.choice(TRACKERS)}/announce',
+                          'is_enabled': 1, 'type': 1, 'scrape_complete':
+                          rng.randint(0, 500), 'scrape_incomplete':
+                          rng.randint(0, 50)}],
+            'peers': [{'address': f'10.{i % 256}.{n}.{rng.randint(1, 254)}',
+                       'port': rng.randint(1024, 65535),
+                       'client_version': 'rtorrent 0.9.8',
+                       'id': hashlib.sha1(f'{hash}{n}'.encode())
+                       .hexdigest().upper(),
+                       'down_rate': 0, 'up_rate': 0,
+                       'completed_percent': rng.randint(0, 100),
+                       'is_encrypted': 1}
+                      for n in range(min(3, rng.randint(0, 6)) if active
+                                     else 0)],
+        }
+        torrents[hash]['bitfield'] = _bitfield(chunks, done)
+    return torrents
+
+
+def _files(files, chunk_size, complete):
+    '''file entries for (path, size) pairs laid end to end in chunks of
+    chunk_size, range_second being exclusive like rtorrent's'''
+    entries = []
+    offset = 0
+    for path, size in files:
+        first = offset // chunk_size
+        last = max(first + 1, -(-(offset + size) // chunk_size))
+        entries.append({'path': path, 'size_bytes': size,
+                        'size_chunks': last - first,
+                        'completed_chunks': last - first if complete else 0,
+                        'range_first': first, 'range_second': last,
+                        'priority': 1})
+        offset += size
+    return entries
+
+
+def _bitfield(chunks, done):
+    if not chunks:
+        return ''
+    bits = ((1 << done) - 1) << (chunks - done)
+    pad = -chunks % 8
+    return (bits << pad).to_bytes((chunks + pad) // 8, 'big').hex().upper()
+
+
+class FakeRtorrent(Endpoint):
+
+    '''the command handling, without any transport. dispatch(method,
+    params) returns what rtorrent would or raises its Fault.'''
+
+    def __init__(self, torrents=1000, seed=0, latency=0.0, call_cost=0.0):
+        self.torrents = synthetic(torrents, seed)
+        self.latency = latency
+        self.call_cost = call_cost
+        self.throttles = {'slow': [100 * 1024, 100 * 1024],
+                          'fast': [10 * 1024**2, 10 * 1024**2]}
+        self.globals = {'throttle.global_down.max_rate': 0,
+                        'throttle.global_up.max_rate': 0,
+                        'scheduler.max_active': -1,
+                        'network.xmlrpc.size_limit': 4 * 1024**2,
+                        'directory.default': '/data',
+                        'session.path': '/var/lib/rtorrent/session'}
+        self.requests = 0
+        self.calls = 0
+        self.__lock = threading.Lock()
+
+    def request(self, method, params):
+        '''handles one request from a client. requests are answered one at
+        a time like rtorrent's main loop does.'''
+        with self.__lock:
+            self.requests += 1
+            if self.latency:
+                time.sleep(self.latency)
+            return self.dispatch(method, params)
+
+    def dispatch(self, method, params):
+        self.calls += 1
+        if self.call_cost:
+            time.sleep(self.call_cost)
+        params = list(params)
+        if method == 'system.multicall':
+            return self.__multicall(params[0])
+        prefix = method.split('.', 1)[0]
+        if prefix == 'd':
+            return self.__download(method, params)
+        if prefix in ('f', 't', 'p'):
+            return self.__item(prefix, method, params)
+        if prefix == 'view':
+            return self.__view(method, params)
+        if prefix == 'load':
+            return self.__load(method, params)
+        if prefix == 'throttle':
+            return self.__throttle(method, params)
+        if method == 'download_list':
+            view = params[1] if len(params) > 1 else 'main'
+            return [t['hash'] for t in self.__in_view(view)]
+        if method == 'system.time_usec':
+            return int(time.time() * 1e6)
+        if method == 'system.time':
+            return int(time.time())
+        if method == 'system.client_version':
+            return '0.9.8'
+        if method == 'system.library_version':
+            return '0.13.8'
+        if method == 'system.hostname':
+            return 'fake'
+        if method == 'system.pid':
+            return os.getpid()
+        if method == 'system.listMethods':
+            return sorted({'system.multicall', 'd.multicall2', 'f.multicall',
+                           't.multicall', 'p.multicall', 'view.list',
+                           'download_list'} | set(self.globals))
+        if method in self.globals:
+            return self.globals[method]
+        if method.endswith('.set') and method[:-4] in self.globals:
+            self.globals[method[:-4]] = params[-1]
+            return 0
+        raise fault(NOT_DEFINED, f"Method '{method}' not defined")
+
+    def __multicall(self, calls):
+        results = []
+        for call in calls:
+            try:
+                results.append([self.dispatch(call['methodName'],
+                                              call.get('params', []))])
+            except xmlrpc.client.Fault as f:
+                results.append({'faultCode': f.faultCode,
+                                'faultString': f.faultString})
+        return results
+
+    def __torrent(self, hash):
+        torrent = self.torrents.get(hash)
+        if torrent is None:
+            raise fault(NOT_FOUND, 'Could not find info-hash.')
+        return torrent
+
+    def __in_view(self, view):
+        if view not in VIEWS:
+            raise fault(-500, 'Could not find view: ' + str(view))
+        match = VIEWS[view]
+        return [t for t in self.torrents.values() if match(t)]
+
+    def __row(self, target, commands):
+        '''runs the 'command=arg,...' strings of a multicall on target'''
+        row = []
+        for command in commands:
+            name, _, args = command.partition('=')
+            args = [a[1:-1] if len(a) > 1 and a[0] == a[-1] == '"' else a
+                    for a in args.split(',')] if args else []
+            row.append(self.dispatch(name, [target] + args))
+        return row
+
+    def __download(self, method, params):
+        if method == 'd.multicall2':
+            return [self.__row(t['hash'], params[2:])
+                    for t in self.__in_view(params[1] or 'main')]
+        if not params:
+            raise fault(-500, 'Unsupported target type found.')
+        t = self.__torrent(params[0])
+        field = method[2:]
+        args = params[1:]
+        if field == 'custom':
+            return t['custom'].get(args[0], '')
+        if field == 'custom.set':
+            t['custom'][args[0]] = args[1]
+            return 0
+        if field == 'custom.if_z':
+            return t['custom'].get(args[0]) or args[1]
+        if field == 'custom.keys':
+            return sorted(t['custom'])
+        if field in ('start', 'resume'):
+            t['state'] = 1
+            t['is_active'] = t['is_open'] = 1
+            return 0
+        if field == 'stop':
+            t['state'] = t['is_active'] = 0
+            return 0
+        if field == 'pause':
+            t['is_active'] = 0
+            return 0
+        if field == 'open':
+            t['is_open'] = 1
+            return 0
+        if field == 'close':
+            t['is_open'] = t['is_active'] = 0
+            return 0
+        if field == 'erase':
+            del self.torrents[t['hash']]
+            return 0
+        if field == 'check_hash':
+            t['chunks_hashed'] = t['size_chunks']
+            return 0
+        if field == 'directory.set':
+            base = args[0].rstrip('/')
+            if t['is_multi_file']:
+                base = f"{base}/{t['name']}"
+            t['directory'] = t['directory_base'] = base
+            return 0
+        if field == 'directory_base.set':
+            t['directory'] = t['directory_base'] = args[0].rstrip('/')
+            return 0
+        if field.endswith('.set') and field[:-4] in t:
+            t[field[:-4]] = args[0]
+            return 0
+        if field == 'bitfield' and not t['is_open']:
+            # rtorrent only has the bitfield of open torrents
+            return ''
+        if field in ('f.multicall', 't.multicall', 'p.multicall'):
+            return self.__item_multicall(field[0], t, args[1:])
+        if field in t and not isinstance(t[field], (list, dict)):
+            return t[field]
+        raise fault(NOT_DEFINED, f"Method '{method}' not defined")
+
+    def __item_multicall(self, prefix, t, commands):
+        key = {'f': 'files', 't': 'trackers', 'p': 'peers'}[prefix]
+        return [self.__row(f"{t['hash']}:{prefix}{i}", commands)
+                for i in range(len(t[key]))]
+
+    def __item(self, prefix, method, params):
+        target = params[0] if params else ''
+        if method == prefix + '.multicall':
+            # f.multicall takes the info hash, a pattern and the commands
+            return self.__item_multicall(prefix, self.__torrent(target),
+                                         params[2:])
+        hash, _, index = target.partition(':')
+        t = self.__torrent(hash)
+        key = {'f': 'files', 't': 'trackers', 'p': 'peers'}[prefix]
+        try:
+            item = t[key][int(index[1:])]
+        except (ValueError, IndexError):
+            raise fault(-500, 'Unsupported target type found.') from None
+        field = method[2:]
+        if field.endswith('.set') and field[:-4] in item:
+            item[field[:-4]] = params[1]
+            return 0
+        if field == 'frozen_path':
+            return os.path.join(t['directory_base'], item['path'])
+        if field in item:
+            return item[field]
+        raise fault(NOT_DEFINED, f"Method '{method}' not defined")
+
+    def __view(self, method, params):
+        if method == 'view.list':
+            return list(VIEWS)
+        if method == 'view.size':
+            return len(self.__in_view(params[1]))
+        if method == 'view.size_not_visible':
+            return 0
+        raise fault(NOT_DEFINED, f"Method '{method}' not defined")
+
+    def __load(self, method, params):
+        data = params[1]
+        if 'raw' not in method:
+            with open(data, 'rb') as f:
+                data = f.read()
+        metainfo = Metainfo(bytes(data))
+        if metainfo.infohash in self.torrents:
+            return 0
+        size = metainfo.size
+        t = synthetic(1, seed=metainfo.infohash)
+        t = next(iter(t.values()))
+        multi = metainfo.multi_file
+        base = self.globals['directory.default'] + (
+            f'/{metainfo.name}' if multi else '')
+        t.update(hash=metainfo.infohash, name=metainfo.name, state=0,
+                 is_active=0, is_open=0, complete=0, incomplete=1,
+                 is_multi_file=int(multi), size_bytes=size,
+                 size_chunks=len(metainfo), chunk_size=metainfo.piece_length,
+                 completed_chunks=0, completed_bytes=0, left_bytes=size,
+                 directory=base, directory_base=base,
+                 bitfield='', custom={}, peers=[],
+                 files=_files(metainfo.files, metainfo.piece_length, False))
+        self.torrents[t['hash']] = t
+        self.__row(t['hash'], params[2:])
+        if 'start' in method:
+            t['state'] = t['is_active'] = t['is_open'] = 1
+        return 0
+
+    def __throttle(self, method, params):
+        if method in ('throttle.down', 'throttle.up'):
+            limits = self.throttles.setdefault(params[1], [0, 0])
+            limits[method == 'throttle.up'] = int(params[2]) * 1024
+            return 0
+        if method in ('throttle.down.max', 'throttle.up.max',
+                      'throttle.down.rate', 'throttle.up.rate'):
+            name = params[1]
+            if name not in self.throttles:
+                raise fault(-503, 'Throttle not found.')
+            up = method.startswith('throttle.up')
+            if method.endswith('.max'):
+                return self.throttles[name][up]
+            field = 'up.rate' if up else 'down.rate'
+            return sum(t[field] for t in self.torrents.values()
+                       if t['throttle_name'] == name)
+        if method in ('throttle.global_down.rate', 'throttle.global_up.rate',
+                      'throttle.global_down.total',
+                      'throttle.global_up.total'):
+            field = ('up.' if 'global_up' in method else 'down.') + \
+                method.rsplit('.', 1)[1]
+            return sum(t[field] for t in self.torrents.values())
+        if method in self.globals:
+            return self.globals[method]
+        if method.endswith('.set') and method[:-4] in self.globals:
+            self.globals[method[:-4]] = int(params[-1])
+            return 0
+        raise fault(NOT_DEFINED, f"Method '{method}' not defined")
+
+
+class FakeServer:
+
+    '''runs a FakeRtorrent on background threads. url is the http endpoint
+    for Server (xmlrpc, or json-rpc with jsonrpc=True) and, when scgi_port
+    is not None, scgi is the (host, port) it listens on.'''
+
+    def __init__(self, torrents=1000, seed=0, latency=0.0, call_cost=0.0,
+                 host='127.0.0.1', port=0, scgi_port=None):
+        self.fake = FakeRtorrent(torrents, seed, latency, call_cost)
+        self.__rpc = RPCServer(self.fake, host, port, scgi_port)
+        self.url = self.__rpc.url
+        self.scgi = self.__rpc.scgi
+
+    def start(self):
+        self.__rpc.start()
+        return self
+
+    def stop(self):
+        self.__rpc.stop()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+    def __repr__(self):
+        return f'FakeServer({len(self.fake.torrents)} torrents, {self.url})'
+
+
+def torrent_file(name, sizes, piece_length=2**18):
+    '''raw .torrent data for files of the given sizes, with zeroed piece
+    hashes, for feeding load.raw'''
+    pieces = (sum(sizes) + piece_length - 1) // piece_length
+    info = {b'name': name.encode(), b'piece length': piece_length,
+            b'pieces': b'\0' * 20 * pieces}
+    if len(sizes) == 1:
+        info[b'length'] = sizes[0]
+    else:
+        info[b'files'] = [{b'length': s, b'path': [f'{n}.bin'.encode()]}
+                          for n, s in enumerate(sizes)]
+    return encode({b'announce': b'https://tracker.example.org/announce',
+                   b'info': info})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--torrents', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--scgi-port', type=int)
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='seconds added to every request')
+    parser.add_argument('--call-cost', type=float, default=0.0,
+                        help='seconds added to every call in a request')
+    args = parser.parse_args()
+    fake = FakeServer(args.torrents, args.seed, args.latency, args.call_cost,
+                      args.host, args.port, args.scgi_port).start()
+    print(fake.url, *(['scgi://%s:%d' % fake.scgi] if fake.scgi else []),
+          flush=True)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        fake.stop()
+
+
+if __name__ == '__main__':
+    main()
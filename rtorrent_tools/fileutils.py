@@ -1,6 +1,10 @@
 from collections.abc import Sequence
-import pprint
+from array import array
+from urllib.parse import urlsplit
+import math
+import os
 import datetime
+import xmlrpc.client
 
 class File:
 
@@ -155,6 +159,7 @@ class FileGroup(Sequence):
             return self.__data[val]
 
     def __repr__(self):
+        import pprint
         return pprint.pformat(self.__data, width=120)
 
 
@@ -231,6 +236,99 @@ class TimePeriod(datetime.timedelta):
     def __repr__(self):
         return 'TimePeriod' + repr(self.format())
 
+class Series(Sequence):
+
+    '''per Torrent values in group order, held in a flat array of doubles.
+    nan marks a value that is unknown and is left out of percentiles.'''
+
+    def __init__(self, values=()):
+        self.values = array('d', values)
+
+    def __len__(self):
+        return len(self.values)
+
+    def __getitem__(self, val):
+        if isinstance(val, slice):
+            return Series(self.values[val])
+        return self.values[val]
+
+    def known(self):
+        return sorted(v for v in self.values if not math.isnan(v))
+
+    def percentile(self, p):
+        '''returns the p-th percentile (0-100) interpolated between the
+        closest known values'''
+        return _percentile(self.known(), p)
+
+    def summary(self, percentiles=(0, 50, 90, 99, 100)):
+        '''returns a dict of percentile -> value, sorting the values once'''
+        known = self.known()
+        return {p: _percentile(known, p) for p in percentiles}
+
+    def __repr__(self):
+        import pprint
+        return 'Series' + pprint.pformat(self.values.tolist(), width=120)
+
+def _percentile(known, p):
+    if not known:
+        return math.nan
+    k = (len(known) - 1) * p / 100.0
+    lo = int(k)
+    hi = min(lo + 1, len(known) - 1)
+    if known[lo] == known[hi]:
+        return known[lo]
+    return known[lo] + (known[hi] - known[lo]) * (k - lo)
+
 def chunk(hashes, chunk_size=100):
     return [hashes[x:x+chunk_size]
             for x in range(0, len(hashes), chunk_size)]
+
+def device(path):
+    '''the st_dev of the filesystem path is on, found through its nearest
+    existing parent. None when nothing on the way can be stat'ed.'''
+    while True:
+        try:
+            return os.stat(path).st_dev
+        except OSError:
+            parent = os.path.dirname(path)
+            if parent == path:
+                return None
+            path = parent
+
+def remove_file(path):
+    '''removes a file, treating one that is already gone as removed'''
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+def remove_empty_dirs(top):
+    '''removes top and every directory below it that is left empty,
+    deepest first. directories that still hold anything are kept.'''
+    for root, dirs, files in os.walk(top, topdown=False):
+        try:
+            os.rmdir(root)
+        except OSError:
+            pass
+
+def multicall_results(mc):
+    '''runs a multicall and returns its results with failed calls as Fault
+    instances. xmlrpc.client raises the first fault while iterating, the
+    json proxy already returns them in place.'''
+    results = mc()
+    if isinstance(results, xmlrpc.client.MultiCallIterator):
+        return [xmlrpc.client.Fault(r['faultCode'], r['faultString'])
+                if isinstance(r, dict) else r[0] for r in results.results]
+    return list(results)
+
+def first_fault(row):
+    '''returns the first Fault in a row of multicall results or None'''
+    for value in row:
+        if isinstance(value, xmlrpc.client.Fault):
+            return value
+    return None
+
+def tracker_host(urls):
+    '''the host of the first tracker in a t.multicall=,t.url= result, ''
+    when there are none'''
+    return urlsplit(urls[0][0]).netloc if urls else ''
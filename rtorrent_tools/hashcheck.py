@@ -0,0 +1,105 @@
+'''rechecks torrents a few at a time per disk.
+
+rtorrent hashes every torrent queued with d.check_hash as fast as it can,
+and a few hundred of them spread over the same disks turn into random
+reads that take far longer than checking one after the other. the queue
+here keeps a fixed number of checks in flight per device, found by
+stat'ing each torrent's d.directory, and polls the ones in flight with one
+multicall per tick, starting the next torrent on a device as soon as one
+finishes.
+
+devices are only told apart when the download directories can be stat'ed
+from where this runs; otherwise every torrent shares one queue.'''
+
+from .fileutils import SizeBytes, device, first_fault
+from .torrentgroup import TorrentGroup
+from collections import deque
+import time
+
+# checks rtorrent runs at once on one device
+CHECKS_PER_DEVICE = 1
+# seconds between polls of the checks in flight
+POLL_INTERVAL = 2.0
+
+
+def check_hashes(group, per_device=CHECKS_PER_DEVICE, interval=POLL_INTERVAL,
+                 progress=None):
+    '''hash checks every Torrent in group, at most per_device at a time on
+    each device. progress, if given, is called after every poll with
+    (finished, total, bytes hashed per second).
+    returns a dict with
+        'checked': {hash: fraction of chunks found complete}
+        'failed': {hash: error}
+        'bytes': SizeBytes hashed
+        'seconds': time taken
+        'rate': SizeBytes hashed per second'''
+    report = {'checked': {}, 'failed': {}, 'bytes': SizeBytes(0),
+              'seconds': 0.0, 'rate': SizeBytes(0)}
+    if not group.data:
+        return report
+    start = time.monotonic()
+    queues = {}
+    sizes = {}
+    for torrent, row in zip(group, group.call('d.directory', 'd.chunk_size',
+                                              'd.size_chunks')):
+        error = first_fault(row)
+        if error is not None:
+            report['failed'][torrent.hash] = error
+            continue
+        directory, chunk_size, chunks = row
+        sizes[torrent.hash] = (chunk_size, chunks)
+        queues.setdefault(device(directory), deque()).append(torrent)
+
+    total = len(group.data)
+    hashed = 0
+    flight = {dev: [] for dev in queues}
+    while any(queues.values()) or any(flight.values()):
+        starting = []
+        for dev, queue in queues.items():
+            while queue and len(flight[dev]) < per_device:
+                torrent = queue.popleft()
+                flight[dev].append(torrent)
+                starting.append(torrent)
+        for torrent, row in zip(starting,
+                                TorrentGroup(*starting).call('d.check_hash')):
+            error = first_fault(row)
+            if error is not None:
+                report['failed'][torrent.hash] = error
+        for dev in flight:
+            flight[dev] = [t for t in flight[dev]
+                           if t.hash not in report['failed']]
+
+        time.sleep(interval)
+        running = TorrentGroup(*[t for ts in flight.values() for t in ts])
+        rows = running.call('d.is_hash_checking', 'd.hashing',
+                            'd.chunks_hashed', 'd.completed_chunks')
+        in_progress = 0
+        finished = set()
+        for torrent, row in zip(running, rows):
+            chunk_size, chunks = sizes[torrent.hash]
+            error = first_fault(row)
+            if error is not None:
+                report['failed'][torrent.hash] = error
+                finished.add(torrent.hash)
+                continue
+            checking, hashing, chunks_hashed, completed = row
+            if checking or hashing:
+                in_progress += chunks_hashed * chunk_size
+                continue
+            hashed += chunks * chunk_size
+            report['checked'][torrent.hash] = (completed / chunks
+                                               if chunks else 1.0)
+            finished.add(torrent.hash)
+        for dev in flight:
+            flight[dev] = [t for t in flight[dev] if t.hash not in finished]
+
+        seconds = time.monotonic() - start
+        rate = SizeBytes((hashed + in_progress) / seconds)
+        if progress is not None:
+            progress(len(report['checked']) + len(report['failed']),
+                     total, rate)
+
+    report['seconds'] = time.monotonic() - start
+    report['bytes'] = SizeBytes(hashed)
+    report['rate'] = SizeBytes(hashed / report['seconds'])
+    return report
@@ -0,0 +1,173 @@
+'''keeps recent transfer rates of every torrent in memory.
+
+each sample() reads d.down.rate, d.up.rate and d.bytes_done of the whole
+view with one d.multicall2. samples are averaged into slots at several
+resolutions, by default a slot a second for two minutes, a minute for two
+hours and an hour for two days, and each resolution is a fixed size ring
+of floats per torrent, so memory stays the same however long it runs.
+torrents that leave the view are dropped.'''
+
+from .fileutils import SizeBytes, Series
+from array import array
+import math
+import threading
+import time
+
+# (seconds per slot, slots kept) from finest to coarsest
+LEVELS = ((1, 120), (60, 120), (3600, 48))
+METRICS = ('down', 'up', 'done')
+NAN = float('nan')
+
+
+def _hash(target):
+    return target if isinstance(target, str) else target.hash
+
+
+class RateHistory:
+
+    '''rate history of the torrents in a view. call sample() on a timer or
+    start() a thread that does. queries take an info hash or a Torrent,
+    and rate() also a TorrentGroup or any list of them.'''
+
+    def __init__(self, server, view='main', levels=LEVELS):
+        self.server = server
+        self.view = view
+        self.levels = levels
+        self.__rings = {}
+        self.__sums = {}
+        self.__heads = [0] * len(levels)
+        self.__buckets = [None] * len(levels)
+        self.__lock = threading.Lock()
+        self.__thread = None
+        self.__stop = threading.Event()
+        self.error = None
+
+    def sample(self, now=None):
+        '''reads the rates of every torrent in one call and adds them'''
+        rows = self.server._rpc.d.multicall2('', self.view, 'd.hash=',
+                                             'd.down.rate=', 'd.up.rate=',
+                                             'd.bytes_done=')
+        if now is None:
+            now = time.time()
+        with self.__lock:
+            for level, (seconds, slots) in enumerate(self.levels):
+                bucket = int(now // seconds)
+                previous = self.__buckets[level]
+                if previous is not None and bucket > previous:
+                    self.__flush(level, bucket - previous)
+                self.__buckets[level] = bucket
+            seen = set()
+            for hash, down, up, done in rows:
+                seen.add(hash)
+                if hash not in self.__rings:
+                    self.__rings[hash] = [
+                        array('f', [NAN]) * (slots * len(METRICS))
+                        for seconds, slots in self.levels]
+                    # down, up, last bytes_done, samples, bytes_done when
+                    # the previous slot closed
+                    self.__sums[hash] = [array('d', [0.0, 0.0, 0.0, 0.0, NAN])
+                                         for _ in self.levels]
+                for sums in self.__sums[hash]:
+                    sums[0] += down
+                    sums[1] += up
+                    sums[2] = done
+                    sums[3] += 1
+            for hash in set(self.__rings) - seen:
+                del self.__rings[hash]
+                del self.__sums[hash]
+        return len(rows)
+
+    def __flush(self, level, steps):
+        '''closes the current slot of level and skips steps - 1 empty ones'''
+        seconds, slots = self.levels[level]
+        width = len(METRICS)
+        head = self.__heads[level]
+        for hash, rings in self.__rings.items():
+            ring = rings[level]
+            sums = self.__sums[hash][level]
+            n = sums[3]
+            i = head * width
+            if n:
+                ring[i] = sums[0] / n
+                ring[i + 1] = sums[1] / n
+                # bytes_done is kept as the rate it grew at so every column
+                # is a rate and fits a float
+                ring[i + 2] = (sums[2] - sums[4]) / (seconds * steps)
+                sums[4] = sums[2]
+            else:
+                ring[i] = ring[i + 1] = ring[i + 2] = NAN
+            for step in range(1, min(steps, slots)):
+                j = (head + step) % slots * width
+                ring[j] = ring[j + 1] = ring[j + 2] = NAN
+            sums[0] = sums[1] = sums[2] = sums[3] = 0.0
+        self.__heads[level] = (head + steps) % slots
+
+    def series(self, target, metric='down', level=0):
+        '''the closed slots of one torrent at one resolution, oldest first,
+        as a Series. gaps and slots from before it was seen are nan.'''
+        column = METRICS.index(metric)
+        slots = self.levels[level][1]
+        width = len(METRICS)
+        with self.__lock:
+            rings = self.__rings.get(_hash(target))
+            if rings is None:
+                return Series()
+            ring = rings[level]
+            head = self.__heads[level]
+            return Series(ring[(head + n) % slots * width + column]
+                          for n in range(slots))
+
+    def __level(self, seconds):
+        for level, (width, slots) in enumerate(self.levels):
+            if width * slots >= seconds:
+                return level
+        return len(self.levels) - 1
+
+    def rate(self, target, metric='down', seconds=3600):
+        '''average rate over the last seconds from the finest resolution
+        that reaches that far back. for a TorrentGroup or list the rates of
+        its torrents are summed. metric 'done' gives the rate bytes_done
+        grew at.'''
+        if not isinstance(target, (str, bytes)) and \
+                not hasattr(target, 'hash'):
+            return SizeBytes(sum(self.rate(t, metric, seconds)
+                                 for t in target))
+        level = self.__level(seconds)
+        width = self.levels[level][0]
+        recent = self.series(target, metric, level)[-max(1, math.ceil(
+            seconds / width)):]
+        known = [v for v in recent.values if not math.isnan(v)]
+        if not known:
+            return SizeBytes(0)
+        return SizeBytes(sum(known) / len(known))
+
+    def __len__(self):
+        return len(self.__rings)
+
+    def start(self, interval=1.0):
+        '''samples every interval seconds on a background thread'''
+        if self.__thread is not None:
+            return
+        self.__stop.clear()
+
+        def run():
+            while not self.__stop.is_set():
+                try:
+                    self.sample()
+                    self.error = None
+                except Exception as e:
+                    # kept for the caller, the next tick tries again
+                    self.error = e
+                self.__stop.wait(interval)
+
+        self.__thread = threading.Thread(target=run, daemon=True)
+        self.__thread.start()
+
+    def stop(self):
+        if self.__thread is not None:
+            self.__stop.set()
+            self.__thread.join()
+            self.__thread = None
+
+    def __repr__(self):
+        return f'RateHistory({len(self)} torrents, view={self.view!r})'
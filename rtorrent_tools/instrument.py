@@ -0,0 +1,183 @@
+'''counts what the library sends to rtorrent.
+
+every request made through JsonRpcProxy, JsonRpcMultiCall or the xmlrpc
+transports below is recorded in STATS: requests, errors, a latency
+histogram, bytes sent and received and, for multicalls, how many calls
+each one carried, all keyed by method ('system.multicall' for batches).
+the methods inside batches are counted on their own as well, so
+STATS.methods shows what rtorrent was actually asked to do.
+
+hooks added with add_hook are called with a dict for every request:
+    method, methods, seconds, sent, received, error
+error is the exception of a request that got no answer; a Fault is an
+answer and isn't counted as one.'''
+
+import bisect
+import re
+import threading
+import time
+import xmlrpc.client
+
+# upper bounds, in seconds, of the latency histogram buckets
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10,
+           float('inf'))
+
+_METHOD_NAME = re.compile(rb'<methodName>([^<]*)</methodName>')
+_MULTICALL_NAME = re.compile(
+    rb'<name>methodName</name>\s*<value>(?:<string>)?([^<]*)<')
+
+
+class RpcStats:
+
+    '''thread safe totals of rpc requests. requests maps method -> dict of
+    count, errors, seconds, sent, received, calls and buckets (counts per
+    BUCKETS entry), methods maps every method called, batched or not, to
+    the number of calls.'''
+
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.__lock:
+            self.requests = {}
+            self.methods = {}
+
+    def record(self, method, methods, seconds, sent, received, error=None):
+        with self.__lock:
+            entry = self.requests.get(method)
+            if entry is None:
+                entry = self.requests[method] = {
+                    'count': 0, 'errors': 0, 'seconds': 0.0, 'sent': 0,
+                    'received': 0, 'calls': 0, 'max_calls': 0,
+                    'buckets': [0] * len(BUCKETS)}
+            entry['count'] += 1
+            entry['errors'] += error is not None
+            entry['seconds'] += seconds
+            entry['sent'] += sent
+            entry['received'] += received
+            entry['calls'] += len(methods)
+            entry['max_calls'] = max(entry['max_calls'], len(methods))
+            entry['buckets'][bisect.bisect_left(BUCKETS, seconds)] += 1
+            for name in methods:
+                self.methods[name] = self.methods.get(name, 0) + 1
+
+    def percentile(self, method, p):
+        '''upper bound of the bucket holding the p-th percentile latency of
+        method, None if it hasn't been called'''
+        entry = self.requests.get(method)
+        if not entry:
+            return None
+        rank = entry['count'] * p / 100.0
+        seen = 0
+        for bound, n in zip(BUCKETS, entry['buckets']):
+            seen += n
+            if seen >= rank:
+                return bound
+        return BUCKETS[-1]
+
+    def summary(self):
+        '''a dict of method -> count, errors, mean and p95 seconds, bytes
+        and calls per request, busiest first'''
+        rows = {}
+        for method, entry in sorted(self.requests.items(),
+                                    key=lambda i: i[1]['seconds'],
+                                    reverse=True):
+            rows[method] = {
+                'count': entry['count'],
+                'errors': entry['errors'],
+                'mean': entry['seconds'] / entry['count'],
+                'p95': self.percentile(method, 95),
+                'sent': entry['sent'],
+                'received': entry['received'],
+                'calls_per_request': entry['calls'] / entry['count'],
+            }
+        return rows
+
+    def __repr__(self):
+        return (f'RpcStats({sum(e["count"] for e in self.requests.values())}'
+                f' requests, {sum(self.methods.values())} calls)')
+
+
+STATS = RpcStats()
+_hooks = []
+
+
+def add_hook(hook):
+    '''calls hook(event) after every request'''
+    _hooks.append(hook)
+
+
+def remove_hook(hook):
+    _hooks.remove(hook)
+
+
+def record(method, methods, seconds, sent, received, error=None):
+    '''adds one request to STATS and passes it to the hooks'''
+    STATS.record(method, methods, seconds, sent, received, error)
+    if _hooks:
+        event = {'method': method, 'methods': methods, 'seconds': seconds,
+                 'sent': sent, 'received': received, 'error': error}
+        for hook in list(_hooks):
+            hook(event)
+
+
+def _xml_methods(body):
+    match = _METHOD_NAME.search(body)
+    method = match.group(1).decode() if match else ''
+    if method == 'system.multicall':
+        return method, [m.decode() for m in _MULTICALL_NAME.findall(body)]
+    return method, [method]
+
+
+class _CountingResponse:
+
+    '''wraps an http response to count the bytes read from it'''
+
+    def __init__(self, response):
+        self.response = response
+        self.read_bytes = 0
+
+    def read(self, *args):
+        data = self.response.read(*args)
+        self.read_bytes += len(data)
+        return data
+
+    def __getattr__(self, name):
+        return getattr(self.response, name)
+
+
+class _Instrumented:
+
+    '''mixin recording every request of an xmlrpc.client.Transport'''
+
+    def single_request(self, host, handler, request_body, verbose=False):
+        self._response = None
+        start = time.perf_counter()
+        error = None
+        try:
+            return super().single_request(host, handler, request_body,
+                                          verbose)
+        except xmlrpc.client.Fault:
+            raise
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            method, methods = _xml_methods(request_body)
+            response = self._response
+            record(method, methods, time.perf_counter() - start,
+                   len(request_body),
+                   response.read_bytes if response is not None else 0, error)
+
+    def parse_response(self, response):
+        self._response = _CountingResponse(response)
+        return super().parse_response(self._response)
+
+
+class Transport(_Instrumented, xmlrpc.client.Transport):
+    pass
+
+
+class SafeTransport(_Instrumented, xmlrpc.client.SafeTransport):
+    pass
@@ -3,6 +3,8 @@ import uuid
 import xmlrpc.client
 import json
 import logging
+import time
+from . import instrument as _instrument
 from urllib.parse import urlsplit, urlunsplit
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
@@ -12,6 +14,16 @@ logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
 logger = logging.getLogger("JsonRpcProxy")
 
 
+def _record(method, methods, start, resp, error):
+    '''passes one request to instrument.record'''
+    sent = received = 0
+    if resp is not None:
+        sent = len(resp.request.body or b'')
+        received = len(resp.content)
+    _instrument.record(method, methods, time.perf_counter() - start, sent,
+                       received, error)
+
+
 class JsonRpcProxy:
     """
     A drop-in JSON-RPC replacement for xmlrpc.client.ServerProxy.
@@ -95,6 +107,9 @@ class JsonRpcProxy:
             logger.info(f"REQ: {json.dumps(payload)}")
 
         # 2. Execute the Request
+        resp = None
+        error = None
+        start = time.perf_counter()
         try:
             resp = self._session.post(
                 self._url, 
@@ -110,6 +125,7 @@ class JsonRpcProxy:
             
         except requests.exceptions.HTTPError as e:
             # Map HTTP errors to native xmlrpc.client.ProtocolError
+            error = e
             raise xmlrpc.client.ProtocolError(
                 self._url,
                 e.response.status_code,
@@ -118,8 +134,16 @@ class JsonRpcProxy:
             ) from None
         except Exception as e:
             # Handle connection timeouts, DNS issues, etc.
+            error = e
             raise xmlrpc.client.ProtocolError(
                     self._url, 500, str(e), {}) from None
+        finally:
+            if isinstance(payload, list):
+                _record('system.multicall', [q['method'] for q in payload],
+                        start, resp, error)
+            else:
+                _record(payload['method'], [payload['method']], start, resp,
+                        error)
 
         # 3. Handle the Response Data
         # Handle Batch Responses (system.multicall compatibility)
@@ -183,6 +207,9 @@ class JsonRpcMultiCall:
     def __call__(self):
         if not self._calls:
             return []
+        resp = None
+        error = None
+        start = time.perf_counter()
         try:
             resp = self._session.post(
                 self._url, json=self._calls,
@@ -192,8 +219,12 @@ class JsonRpcMultiCall:
             resp.raise_for_status()
             data = resp.json()
         except Exception as e:
+            error = e
             raise xmlrpc.client.ProtocolError(
                     self._url, 500, str(e), {}) from None
+        finally:
+            _record('system.multicall', [q['method'] for q in self._calls],
+                    start, resp, error)
 
         res_map = {r['id']: r for r in data}
         final = []
@@ -0,0 +1,97 @@
+from .bencode import decode, info_span, BencodeError
+from collections import namedtuple
+import hashlib
+import mmap
+import os
+
+# summary of a .torrent file as kept by build_index. files is a tuple of
+# (path relative to the torrent's base directory, size) pairs
+TorrentInfo = namedtuple('TorrentInfo', 'path infohash name size '
+                                        'piece_length files multi_file')
+
+
+class Metainfo:
+
+    '''a parsed .torrent file. everything is read straight out of the
+    buffer it was given: the piece hashes stay a view of that buffer and
+    are never copied. use from_file() to map a file from disk.'''
+
+    def __init__(self, data):
+        self.data = data
+        view = memoryview(data).cast('B')
+        start, end = info_span(view)
+        self.infohash = hashlib.sha1(view[start:end]).hexdigest().upper()
+        self.meta = decode(view)
+        self.info = self.meta[b'info']
+        self.name = _text(self.info[b'name'])
+        self.piece_length = self.info[b'piece length']
+        self.pieces = self.info[b'pieces']
+        if len(self.pieces) % 20:
+            raise BencodeError('pieces is not a multiple of 20 bytes')
+        self.multi_file = b'files' in self.info
+        if self.multi_file:
+            self.files = [
+                (os.path.join(*[_text(p) for p in f[b'path']]), f[b'length'])
+                for f in self.info[b'files']
+            ]
+        else:
+            self.files = [(self.name, self.info[b'length'])]
+
+    @classmethod
+    def from_file(cls, path):
+        '''memory maps a .torrent file and parses it in place'''
+        with open(path, 'rb') as f:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(data)
+
+    @property
+    def size(self):
+        return sum(size for path, size in self.files)
+
+    def __len__(self):
+        '''the number of pieces'''
+        return len(self.pieces) // 20
+
+    def piece(self, index):
+        '''returns the 20 byte sha1 of a piece as a view into the data'''
+        return self.pieces[index*20:index*20+20]
+
+    def summary(self, path=None):
+        return TorrentInfo(path, self.infohash, self.name, self.size,
+                           self.piece_length, tuple(self.files),
+                           self.multi_file)
+
+    def __repr__(self):
+        return f'Metainfo({self.name!r}, {self.infohash})'
+
+
+def _text(value):
+    return bytes(value).decode('utf-8', 'surrogateescape')
+
+
+def _summary(path):
+    try:
+        return Metainfo.from_file(path).summary(path)
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def build_index(directory, workers=None, suffix='.torrent'):
+    '''parses every .torrent file below directory across a pool of
+    processes and returns a dict mapping info hash -> TorrentInfo.
+    files that aren't valid torrents are left out.'''
+    paths = [
+        os.path.join(root, name)
+        for root, dirs, files in os.walk(directory)
+        for name in files if name.endswith(suffix)
+    ]
+    index = {}
+    if not paths:
+        return index
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        size = max(1, len(paths) // ((workers or os.cpu_count() or 1) * 4))
+        for info in pool.map(_summary, paths, chunksize=size):
+            if info is not None:
+                index[info.infohash] = info
+    return index
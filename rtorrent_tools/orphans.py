@@ -0,0 +1,152 @@
+'''finds data on disk that no torrent in rtorrent references any more.
+
+every torrent's files are fetched with a single d.multicall2 and the
+download roots are walked by a pool of threads. with a cache file the walk
+is incremental: a directory whose mtime hasn't changed is not listed again,
+only stat'ed, and the cache is saved as the walk goes so an interrupted
+scan picks up where it stopped. file sizes in a reused listing are the ones
+seen when it was cached.'''
+
+from .fileutils import SizeBytes
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import json
+import os
+
+# threads listing directories
+SCAN_WORKERS = 16
+# directories listed between cache saves
+CHECKPOINT = 1000
+
+
+def referenced(server, view='main'):
+    '''returns the set of absolute paths of every file of every torrent
+    and the set of directories holding them'''
+    files = set()
+    dirs = set()
+
+    def add_dir(path):
+        while path not in dirs and path != os.path.dirname(path):
+            dirs.add(path)
+            path = os.path.dirname(path)
+
+    for base, paths in server._rpc.d.multicall2('', view, 'd.directory_base=',
+                                                'f.multicall=,f.path='):
+        base = os.path.normpath(base)
+        add_dir(base)
+        for path, in paths:
+            path = os.path.join(base, path)
+            files.add(path)
+            add_dir(os.path.dirname(path))
+    return files, dirs
+
+
+def _list(path):
+    '''returns (mtime, [(name, is_dir, size)]) for a directory'''
+    mtime = os.stat(path).st_mtime
+    entries = []
+    with os.scandir(path) as it:
+        for entry in it:
+            try:
+                is_dir = entry.is_dir(follow_symlinks=False)
+                size = 0 if is_dir else entry.stat(follow_symlinks=False).st_size
+            except OSError:
+                continue
+            entries.append((entry.name, is_dir, size))
+    return mtime, entries
+
+
+def _cached_list(path, cache):
+    try:
+        mtime = os.stat(path).st_mtime
+    except OSError:
+        return None
+    cached = cache.get(path)
+    if cached is not None and cached[0] == mtime:
+        return cached
+    try:
+        return _list(path)
+    except OSError:
+        return None
+
+
+def walk(roots, cache=None, workers=SCAN_WORKERS):
+    '''lists every directory below roots in parallel and returns a dict
+    mapping directory -> [(name, is_dir, size)]. cache is the path of a
+    json file of earlier listings that is used and updated.'''
+    listings = {}
+    if cache is not None and os.path.exists(cache):
+        with open(cache) as f:
+            listings = {k: (v[0], [tuple(e) for e in v[1]])
+                        for k, v in json.load(f).items()}
+    tree = {}
+    since_save = 0
+    complete = False
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            pending = {pool.submit(_cached_list, root, listings): root
+                       for root in map(os.path.normpath, roots)}
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    path = pending.pop(future)
+                    listing = future.result()
+                    if listing is None:
+                        continue
+                    listings[path] = listing
+                    tree[path] = listing[1]
+                    for name, is_dir, size in listing[1]:
+                        if is_dir:
+                            child = os.path.join(path, name)
+                            pending[pool.submit(_cached_list, child,
+                                                listings)] = child
+                    since_save += 1
+                    if cache is not None and since_save >= CHECKPOINT:
+                        _save(cache, listings)
+                        since_save = 0
+        complete = True
+    finally:
+        if cache is not None:
+            # after a full walk listings of directories that are gone are
+            # dropped, after an interrupted one everything is kept to resume
+            _save(cache, {k: v for k, v in listings.items()
+                          if k in tree or not complete})
+    return tree
+
+
+def _save(cache, listings):
+    tmp = cache + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(listings, f)
+    os.replace(tmp, cache)
+
+
+def _size(tree, path):
+    total = 0
+    for name, is_dir, size in tree.get(path, ()):
+        total += _size(tree, os.path.join(path, name)) if is_dir else size
+    return total
+
+
+def find_orphans(server, roots, cache=None, workers=SCAN_WORKERS,
+                 view='main'):
+    '''returns a list of (path, SizeBytes, is_dir) for everything below
+    the download roots that no torrent references, biggest first. a
+    directory holding nothing referenced is reported once as a whole.'''
+    files, dirs = referenced(server, view)
+    tree = walk(roots, cache, workers)
+    orphans = []
+
+    def visit(path):
+        for name, is_dir, size in tree.get(path, ()):
+            child = os.path.join(path, name)
+            if is_dir and child in dirs:
+                visit(child)
+            elif is_dir:
+                orphans.append((child, SizeBytes(_size(tree, child)), True))
+            elif child not in files:
+                orphans.append((child, SizeBytes(size), False))
+
+    for root in map(os.path.normpath, roots):
+        visit(root)
+    orphans.sort(key=lambda o: o[1], reverse=True)
+    return orphans
@@ -0,0 +1,65 @@
+'''paces bulk mutations so rtorrent stays responsive to other clients.
+
+rtorrent runs every rpc call on its main loop, so one multicall that starts
+or rechecks thousands of torrents stalls everything else until it is done.
+a Pacer sends the work in batches and, after each one, times a
+system.time_usec round trip: the time a trivial call takes is the time
+anyone else has to wait. while that stays under the target latency the
+batch grows, when it goes over the batch is halved and the pacer waits
+for the daemon to catch up before sending more.'''
+
+from .torrentgroup import MULTICALL_SIZE
+import time
+
+# round trip, in seconds, above which rtorrent is considered busy
+TARGET_LATENCY = 0.05
+# calls in the first batch, and the bounds batches are kept in
+MIN_BATCH = 10
+START_BATCH = 100
+MAX_BATCH = MULTICALL_SIZE
+
+
+class Pacer:
+
+    '''latency governed batch sizing for TorrentGroup.call and the bulk
+    mutations built on it: start_all, check_hash_all, directory.set and
+    the rest take pacer= too. sizes are in calls, so a batch of 100 with
+    two commands per Torrent covers 50 Torrents. latency holds the last
+    probed round trip.'''
+
+    def __init__(self, server, target=TARGET_LATENCY, batch=START_BATCH,
+                 min_batch=MIN_BATCH, max_batch=MAX_BATCH):
+        self.server = server
+        self.target = target
+        self.batch = batch
+        self.min_batch = min_batch
+        self.max_batch = max_batch
+        self.latency = None
+
+    def probe(self):
+        '''times a system.time_usec round trip in seconds'''
+        start = time.monotonic()
+        getattr(self.server._rpc, 'system.time_usec')()
+        self.latency = time.monotonic() - start
+        return self.latency
+
+    def adjust(self, latency):
+        '''grows the batch by half while latency is under target, halves
+        it and waits out the backlog when it is over'''
+        if latency > self.target:
+            self.batch = max(self.min_batch, self.batch // 2)
+            time.sleep(latency)
+        else:
+            self.batch = min(self.max_batch, self.batch + self.batch // 2)
+
+    def chunks(self, items, width=1):
+        '''yields slices of items sized to the current batch, width being
+        the number of calls made per item. the daemon is probed after every
+        slice but the last.'''
+        i = 0
+        while i < len(items):
+            n = max(1, self.batch // width)
+            yield items[i:i + n]
+            i += n
+            if i < len(items):
+                self.adjust(self.probe())
@@ -0,0 +1,132 @@
+'''picks the download directory for new torrents by free space.
+
+    placement = Placement(server, ['/mnt/a/dl', '/mnt/b/dl', '/mnt/c/dl'])
+    server.load.bulk(paths, placement=placement)
+
+the free space of every root's filesystem comes from statvfs and the bytes
+rtorrent still has to write there from the d.left_bytes of the torrents
+already in it, both read once per ttl seconds. what is placed in between
+is counted against its root straight away, so a batch of loads spreads out
+instead of all landing on whichever disk looked emptiest. roots on the same
+filesystem share its space. a torrent goes to the root with the most room
+left once it is counted, which keeps the disks filling evenly.'''
+
+from .fileutils import SizeBytes, device
+import errno
+import os
+import threading
+import time
+
+# seconds statvfs and d.left_bytes are trusted for before being read again
+TTL = 30.0
+
+
+class Placement:
+
+    '''chooses among roots, keeping reserve bytes free on every filesystem.
+    roots must be visible at the same paths from here and from rtorrent.'''
+
+    def __init__(self, server, roots, reserve=0, ttl=TTL, view='main'):
+        self.server = server
+        self.roots = [os.path.abspath(r) for r in roots]
+        self.reserve = reserve
+        self.ttl = ttl
+        self.view = view
+        self.__lock = threading.Lock()
+        self.__read = None
+        self.__devices = {}
+        self.__free = {}
+        self.__committed = {}
+
+    def __device(self, path, cache):
+        for root in self.roots:
+            if path == root or path.startswith(root + os.sep):
+                return self.__devices[root]
+        if path not in cache:
+            cache[path] = device(path)
+        return cache[path]
+
+    def refresh(self):
+        '''reads statvfs of every root and d.left_bytes of the view'''
+        devices, free = {}, {}
+        for root in self.roots:
+            dev = device(root)
+            devices[root] = dev
+            if dev in free:
+                continue
+            path = root
+            while not os.path.exists(path):
+                path = os.path.dirname(path)
+            stat = os.statvfs(path)
+            free[dev] = stat.f_bavail * stat.f_frsize
+        rows = self.server._rpc.d.multicall2('', self.view, 'd.directory=',
+                                             'd.left_bytes=')
+        with self.__lock:
+            self.__devices = devices
+            committed = dict.fromkeys(free, 0)
+            cache = {}
+            for directory, left in rows:
+                dev = self.__device(directory, cache)
+                if dev in committed:
+                    committed[dev] += left
+            self.__free = free
+            self.__committed = committed
+            self.__read = time.monotonic()
+
+    def __stale(self):
+        return self.__read is None or \
+            time.monotonic() - self.__read > self.ttl
+
+    def available(self, root):
+        '''bytes that can still be placed in root'''
+        if self.__stale():
+            self.refresh()
+        with self.__lock:
+            dev = self.__devices[os.path.abspath(root)]
+            return SizeBytes(self.__free[dev] - self.__committed[dev] -
+                             self.reserve)
+
+    def choose(self, size):
+        '''the root with the most room for size more bytes, which is then
+        counted against it. raises ENOSPC when no root has room.'''
+        if self.__stale():
+            self.refresh()
+        with self.__lock:
+            best, room = None, None
+            for root in self.roots:
+                dev = self.__devices[root]
+                left = self.__free[dev] - self.__committed[dev] - \
+                    self.reserve - size
+                if left >= 0 and (room is None or left > room):
+                    best, room = root, left
+            if best is None:
+                raise OSError(errno.ENOSPC,
+                              f'no root has room for {SizeBytes(size)}')
+            self.__committed[self.__devices[best]] += size
+            return best
+
+    def release(self, root, size):
+        '''gives back what choose() counted for a torrent that was not
+        loaded after all'''
+        with self.__lock:
+            dev = self.__devices.get(os.path.abspath(root))
+            if dev in self.__committed:
+                self.__committed[dev] -= size
+
+    def report(self):
+        '''a dict of root -> {'free', 'committed', 'available'}'''
+        if self.__stale():
+            self.refresh()
+        with self.__lock:
+            report = {}
+            for root in self.roots:
+                dev = self.__devices[root]
+                free, committed = self.__free[dev], self.__committed[dev]
+                report[root] = {
+                    'free': SizeBytes(free),
+                    'committed': SizeBytes(committed),
+                    'available': SizeBytes(free - committed - self.reserve)}
+            return report
+
+    def __repr__(self):
+        return f'Placement({self.roots!r}, reserve={SizeBytes(self.reserve)})'
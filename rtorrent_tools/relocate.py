@@ -0,0 +1,226 @@
+'''moves the data of a group of torrents to another directory.
+
+torrents are stopped and closed in bulk, their files moved with rename
+where source and destination share a filesystem and copied otherwise (with
+a reflink when the filesystem supports one), rtorrent is pointed at the new
+location and every torrent is put back in the state it was in.
+
+copies are written to a .part file and renamed into place once verified,
+so a file at the destination is always complete. a move that is cut short
+can be run again: files already at the destination are skipped, and with a
+journal file the states captured before the first run are the ones
+restored.'''
+
+from .fileutils import (remove_empty_dirs, remove_file, chunk, device,
+                        multicall_results, first_fault)
+from .torrentgroup import TorrentGroup, MULTICALL_SIZE
+from concurrent.futures import ThreadPoolExecutor
+import errno
+import hashlib
+import json
+import os
+import shutil
+
+# copy threads per source device
+DISK_WORKERS = 2
+# linux ioctl to clone a file's extents (cp --reflink)
+FICLONE = 0x40049409
+
+
+class MoveError(OSError):
+
+    '''a torrent that could not be moved. error is what stopped it and
+    unrestored lists (path, error) for files that could not be moved back
+    to path. the torrent is left stopped either way.'''
+
+    def __init__(self, error):
+        super().__init__(getattr(error, 'errno', None), str(error))
+        self.error = error
+        self.unrestored = []
+
+    def __str__(self):
+        if self.unrestored:
+            return (f'{self.error}; {len(self.unrestored)} files could not '
+                    f'be moved back, left stopped')
+        return f'{self.error}; files moved back, left stopped'
+
+
+def _reflink(src, dst):
+    '''clones src into dst without copying data if the filesystem can,
+    returns False when it can't'''
+    try:
+        import fcntl
+    except ImportError:
+        return False
+    with open(src, 'rb') as s, open(dst, 'wb') as d:
+        try:
+            fcntl.ioctl(d.fileno(), FICLONE, s.fileno())
+            return True
+        except OSError:
+            return False
+
+
+def _sha1(path):
+    sha = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024**2), b''):
+            sha.update(block)
+    return sha.digest()
+
+
+def move_file(src, dst, check='size'):
+    '''moves one file, renaming when possible. across filesystems the copy
+    is checked by size or, with check='checksum', by sha1 before the source
+    is removed. a file already moved (src gone, dst there) is left alone,
+    but an existing dst is never replaced: with src still there too
+    FileExistsError is raised before anything is touched.'''
+    if not os.path.exists(src):
+        if os.path.exists(dst):
+            return
+        raise FileNotFoundError(errno.ENOENT, 'missing source', src)
+    if os.path.lexists(dst):
+        if os.path.samefile(src, dst):
+            return
+        raise FileExistsError(errno.EEXIST, 'destination already exists',
+                              dst)
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    try:
+        os.rename(src, dst)
+        return
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+    part = dst + '.part'
+    try:
+        if not _reflink(src, part):
+            shutil.copyfile(src, part)
+        shutil.copystat(src, part)
+        if os.path.getsize(part) != os.path.getsize(src):
+            raise OSError(errno.EIO, 'size mismatch after copy', part)
+        if check == 'checksum' and _sha1(part) != _sha1(src):
+            raise OSError(errno.EIO, 'checksum mismatch after copy', part)
+        os.replace(part, dst)
+    except BaseException:
+        remove_file(part)
+        raise
+    os.remove(src)
+
+
+def relocate(group, dest, check='size', workers=DISK_WORKERS, journal=None):
+    '''moves the data of every Torrent in group into dest and updates
+    rtorrent. workers is the number of copy threads per source device and
+    check is 'size' or 'checksum' for cross device copies. journal is an
+    optional json file path that makes an interrupted move resumable.
+    returns a dict mapping each info hash to None on success or the error
+    that stopped it. a Torrent that fails keeps its old location: files
+    already moved are moved back, and unless it failed to stop in the first
+    place it is left stopped with a MoveError saying whether all of them
+    made it back. files already at the destination are never replaced, and
+    torrents that would move into the same place as another one in group
+    are left alone with a FileExistsError.'''
+    if not group.data:
+        return {}
+    dest = os.path.abspath(dest)
+    saved = {}
+    if journal is not None and os.path.exists(journal):
+        with open(journal) as f:
+            saved = json.load(f)
+
+    rows = group.fetch('d.directory_base', 'd.is_multi_file', 'd.state',
+                       'd.is_active',
+                       ('f.multicall', '', 'f.path='))
+    plans = {}
+    for torrent, (base, multi_file, state, active, files) in zip(group, rows):
+        base = os.path.normpath(base)
+        new_base = (os.path.join(dest, os.path.basename(base))
+                    if multi_file else dest)
+        plans[torrent.hash] = saved.get(torrent.hash) or {
+            'base': base, 'new_base': new_base, 'multi_file': bool(multi_file),
+            'state': [state, active], 'files': [f[0] for f in files]}
+    if journal is not None:
+        with open(journal, 'w') as f:
+            json.dump(plans, f)
+
+    # two torrents moving into the same place would mix or overwrite each
+    # other's files, so neither of them is touched
+    report = {}
+    targets = {}
+    for hash, plan in plans.items():
+        for target in ([plan['new_base']] if plan['multi_file'] else
+                       [os.path.join(plan['new_base'], path)
+                        for path in plan['files']]):
+            targets.setdefault(target, []).append(hash)
+    for target, hashes in targets.items():
+        if len(hashes) > 1:
+            for hash in hashes:
+                report[hash] = FileExistsError(
+                    errno.EEXIST, 'another torrent in the group moves to the '
+                    'same place', target)
+    movable = TorrentGroup(*[t for t in group if t.hash not in report])
+    for torrent, row in zip(movable, movable.call('d.stop', 'd.close')):
+        report[torrent.hash] = first_fault(row)
+    stopped = [hash for hash, error in report.items() if error is None]
+
+    # one pool per source device so a slow disk only holds up its own copies
+    pools = {}
+    moves = []
+    try:
+        for hash, plan in plans.items():
+            if report[hash] is not None:
+                continue
+            for path in plan['files']:
+                src = os.path.join(plan['base'], path)
+                dst = os.path.join(plan['new_base'], path)
+                dev = device(src)
+                if dev not in pools:
+                    pools[dev] = ThreadPoolExecutor(max_workers=workers)
+                moves.append((hash, src, dst, pools[dev].submit(
+                    move_file, src, dst, check)))
+        for hash, src, dst, future in moves:
+            if future.exception() and report[hash] is None:
+                report[hash] = future.exception()
+    finally:
+        for pool in pools.values():
+            pool.shutdown()
+
+    moved = [t for t in group if report[t.hash] is None]
+    for torrents in chunk(moved, MULTICALL_SIZE):
+        mc = group.data[0].server.get_mc_proxy()
+        for torrent in torrents:
+            plan = plans[torrent.hash]
+            # a multi file torrent keeps its own directory name, a single
+            # file one lives straight in its directory
+            method = ('d.directory_base.set' if plan['multi_file']
+                      else 'd.directory.set')
+            getattr(mc, method)(torrent.hash, plan['new_base'])
+        for torrent, result in zip(torrents, multicall_results(mc)):
+            report[torrent.hash] = first_fault([result])
+
+    # files of a torrent that failed part way go back where rtorrent still
+    # expects them
+    for hash in stopped:
+        if report[hash] is not None:
+            report[hash] = MoveError(report[hash])
+    for hash, src, dst, future in moves:
+        if report[hash] is None or future.exception():
+            continue
+        try:
+            move_file(dst, src, check)
+        except OSError as e:
+            report[hash].unrestored.append((src, e))
+    for hash in stopped:
+        plan = plans[hash]
+        if plan['multi_file'] and plan['base'] != plan['new_base']:
+            remove_empty_dirs(plan['new_base' if report[hash] else 'base'])
+
+    # only torrents whose data is all where rtorrent looks are restarted
+    restart = [t for t in group if report[t.hash] is None]
+    started = TorrentGroup(*[t for t in restart
+                             if plans[t.hash]['state'][0]])
+    paused = TorrentGroup(*[t for t in started
+                            if not plans[t.hash]['state'][1]])
+    started.call('d.start')
+    paused.call('d.pause')
+    if journal is not None and all(v is None for v in report.values()):
+        os.remove(journal)
+    return report
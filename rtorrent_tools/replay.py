@@ -0,0 +1,208 @@
+'''records rpc traffic to a file and plays it back without rtorrent.
+
+    Server(url, record='session.rpc')      # talk to rtorrent, save it all
+    Server(url, replay='session.rpc')      # answer from the file instead
+
+a recording holds every request body and the response body it got, one
+json line per exchange, base64 encoded so they come back byte for byte.
+on replay each request is matched against the next unused recorded one,
+so a script run twice makes the same calls and gets the same answers
+with no network, daemon or jitter in the way: what is left to time is
+the library itself. json-rpc request ids are random, so they are left out
+when matching and the recorded answers are given the new ids.'''
+
+from . import instrument
+import base64
+import gzip
+import io
+import json
+import threading
+import xmlrpc.client
+
+
+class ReplayError(LookupError):
+    pass
+
+
+def _key(body):
+    '''what two requests must share to be the same call'''
+    if body[:1] not in (b'{', b'['):
+        return body
+    payload = json.loads(body)
+    calls = payload if isinstance(payload, list) else [payload]
+    return json.dumps([(c.get('method'), c.get('params')) for c in calls])
+
+
+def _ids(body):
+    payload = json.loads(body)
+    calls = payload if isinstance(payload, list) else [payload]
+    return [c.get('id') for c in calls]
+
+
+class Recording:
+
+    '''a file of (request, response) pairs. opened with mode 'w' pairs are
+    appended as they are added, with 'r' they are read for replay.'''
+
+    def __init__(self, path, mode='r'):
+        self.path = path
+        self.mode = mode
+        self.__lock = threading.Lock()
+        self.__used = []
+        self.exchanges = []
+        if mode == 'w':
+            self.__file = open(path, 'w')
+        else:
+            self.__file = None
+            with open(path) as f:
+                for line in f:
+                    entry = json.loads(line)
+                    self.exchanges.append(
+                        (base64.b64decode(entry['request']),
+                         base64.b64decode(entry['response'])))
+            self.__keys = [_key(request) for request, _ in self.exchanges]
+            self.__used = [False] * len(self.exchanges)
+        self.__next = 0
+
+    def add(self, request, response):
+        with self.__lock:
+            self.exchanges.append((request, response))
+            self.__file.write(json.dumps({
+                'request': base64.b64encode(request).decode(),
+                'response': base64.b64encode(response).decode()}) + '\n')
+            self.__file.flush()
+
+    def answer(self, request):
+        '''the recorded response to request: the next unused exchange with
+        the same request, looking ahead of the last one matched'''
+        key = _key(request)
+        with self.__lock:
+            for i in range(self.__next, len(self.exchanges)):
+                if not self.__used[i] and self.__keys[i] == key:
+                    break
+            else:
+                raise ReplayError(f'no recorded response for '
+                                  f'{request[:200]!r}')
+            self.__used[i] = True
+            while self.__next < len(self.__used) and self.__used[self.__next]:
+                self.__next += 1
+        recorded, response = self.exchanges[i]
+        if request[:1] in (b'{', b'['):
+            response = _renumber(response, _ids(recorded), _ids(request))
+        return response
+
+    def close(self):
+        if self.__file is not None:
+            self.__file.close()
+
+    def __len__(self):
+        return len(self.exchanges)
+
+    def __repr__(self):
+        return f'Recording({self.path!r}, {len(self)} exchanges)'
+
+
+def _renumber(response, old, new):
+    ids = dict(zip(old, new))
+    payload = json.loads(response)
+    for reply in payload if isinstance(payload, list) else [payload]:
+        reply['id'] = ids.get(reply.get('id'), reply.get('id'))
+    return json.dumps(payload).encode()
+
+
+class _Stored(io.BytesIO):
+
+    '''a response body standing in for an http response'''
+
+    def getheader(self, name, default=None):
+        return default
+
+
+class _Recorder:
+
+    '''xmlrpc Transport mixin saving every exchange to a Recording'''
+
+    def __init__(self, recording, *args, **kwargs):
+        self.recording = recording
+        super().__init__(*args, **kwargs)
+
+    def single_request(self, host, handler, request_body, verbose=False):
+        self._request_body = request_body
+        return super().single_request(host, handler, request_body, verbose)
+
+    def parse_response(self, response):
+        data = response.read()
+        if response.getheader('Content-Encoding', '') == 'gzip':
+            data = gzip.decompress(data)
+        self.recording.add(self._request_body, data)
+        return super().parse_response(_Stored(data))
+
+
+class _Replayer:
+
+    '''xmlrpc Transport mixin answering from a Recording'''
+
+    def __init__(self, recording, *args, **kwargs):
+        self.recording = recording
+        super().__init__(*args, **kwargs)
+
+    def single_request(self, host, handler, request_body, verbose=False):
+        self.verbose = verbose
+        return self.parse_response(_Stored(self.recording.answer(
+            request_body)))
+
+
+class RecordingTransport(instrument._Instrumented, _Recorder,
+                         xmlrpc.client.Transport):
+    pass
+
+
+class RecordingSafeTransport(instrument._Instrumented, _Recorder,
+                             xmlrpc.client.SafeTransport):
+    pass
+
+
+class ReplayTransport(instrument._Instrumented, _Replayer,
+                      xmlrpc.client.Transport):
+    pass
+
+
+def recording_adapter(recording, max_retries=0):
+    '''a requests adapter for JsonRpcProxy sessions that saves every
+    exchange to recording'''
+    from requests.adapters import HTTPAdapter
+
+    class RecordingAdapter(HTTPAdapter):
+
+        def send(self, request, **kwargs):
+            response = super().send(request, **kwargs)
+            recording.add(request.body or b'', response.content)
+            return response
+
+    return RecordingAdapter(max_retries=max_retries)
+
+
+def replay_adapter(recording):
+    '''a requests adapter for JsonRpcProxy sessions that answers from
+    recording'''
+    from requests.adapters import BaseAdapter
+    from requests.models import Response
+    from requests.structures import CaseInsensitiveDict
+
+    class ReplayAdapter(BaseAdapter):
+
+        def send(self, request, **kwargs):
+            response = Response()
+            response.status_code = 200
+            response.reason = 'OK'
+            response._content = recording.answer(request.body or b'')
+            response.headers = CaseInsensitiveDict(
+                {'Content-Type': 'application/json'})
+            response.url = request.url
+            response.request = request
+            return response
+
+        def close(self):
+            pass
+
+    return ReplayAdapter()
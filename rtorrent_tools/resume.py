@@ -0,0 +1,87 @@
+'''libtorrent fast resume data for torrents whose data is already on disk.
+
+rtorrent reads a libtorrent_resume dict from the torrent it loads. with a
+bitfield and the mtime of every file it trusts the data and starts seeding
+straight away instead of queueing a full hash check.'''
+
+from .bencode import set_key
+from .bitfield import Bitfield
+from .metainfo import Metainfo
+from .verify import verify, file_layout
+import os
+import time
+
+# f.priority value for normal
+NORMAL = 1
+
+
+def _pieces_from_sizes(metainfo, layout):
+    '''returns a have bytearray where a piece counts as done when every
+    file it touches exists with the size the torrent gives it'''
+    have = bytearray(len(metainfo))
+    good = [size == 0 or
+            (os.path.isfile(path) and os.path.getsize(path) == size)
+            for path, size, offset in layout]
+    pl = metainfo.piece_length
+    bad = set()
+    for ok, (path, size, offset) in zip(good, layout):
+        if not ok:
+            bad.update(range(offset // pl, (offset + size - 1) // pl + 1))
+    for i in range(len(have)):
+        have[i] = i not in bad
+    return have
+
+
+def resume_data(metainfo, base, verification=None):
+    '''builds the libtorrent_resume dict for a torrent whose data is in
+    base (its d.directory_base). pieces come from verification, a
+    Verification from verify(), or when it is None from trusting every
+    file that exists with the right size.'''
+    if not isinstance(metainfo, Metainfo):
+        metainfo = Metainfo.from_file(metainfo)
+    layout = file_layout(metainfo, base)
+    if verification is None:
+        have = _pieces_from_sizes(metainfo, layout)
+    else:
+        have = verification.have
+    pl = metainfo.piece_length
+    files = []
+    for path, size, offset in layout:
+        first = offset // pl
+        last = (offset + size - 1) // pl + 1 if size else first
+        entry = {'priority': NORMAL,
+                 'completed': sum(have[first:last])}
+        try:
+            entry['mtime'] = int(os.stat(path).st_mtime)
+        except OSError:
+            pass
+        files.append(entry)
+    if all(have):
+        # a plain count tells rtorrent every chunk is done
+        bitfield = len(have)
+    else:
+        bitfield = Bitfield.from_have(have).data
+    return {
+        'bitfield': bitfield,
+        'files': files,
+        'uncertain_pieces.timestamp': int(time.time()),
+    }
+
+
+def with_resume(data, base, check=False, workers=None, pool=None):
+    '''returns raw .torrent data with libtorrent_resume added for the data
+    in base. with check=True the pieces are hashed locally first (see
+    verify, which takes workers and pool), otherwise file sizes are
+    trusted. everything but libtorrent_resume is copied byte for byte, so
+    the info hash stays what it was.'''
+    metainfo = Metainfo(data)
+    verification = verify(metainfo, base, workers, pool) if check else None
+    return set_key(data, b'libtorrent_resume',
+                   resume_data(metainfo, base, verification))
+
+
+def base_directory(metainfo, directory):
+    '''the d.directory_base a torrent gets when loaded into directory'''
+    if metainfo.multi_file:
+        return os.path.join(directory, metainfo.name)
+    return directory
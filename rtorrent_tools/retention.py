@@ -0,0 +1,341 @@
+'''declarative cleanup rules evaluated over one snapshot of a view.
+
+    policy = Policy(
+        Rule('done on x', (col('ratio') > 2) & (col('seed_days') > 14) &
+             col('tracker').matches(r'tracker\\.x'),
+             unless=col('custom1') == 'keep', action='erase'),
+        Rule('archive', col('seed_days') > 60, action='move',
+             dest='/mnt/archive'),
+    )
+    plan = policy.plan(server)
+    print(plan)          # what would happen
+    plan.apply()         # do it, in batched multicalls
+
+every column a rule mentions is fetched for the whole view with a single
+d.multicall2. a comparison turns one column into a mask with a byte per
+torrent, held as one big int, so combining conditions with & | ~ is a few
+bigint operations however many torrents there are. rules are tried in
+order and a torrent is planned by the first one it matches.
+
+columns are the Torrent ACCESSORS ('ratio', 'complete', 'custom1', ...)
+and the ones in COLUMNS below.'''
+
+from .fileutils import SizeBytes, first_fault, tracker_host
+from .torrent import Torrent, ACCESSORS
+from .torrentgroup import TorrentGroup
+import math
+import operator
+import re
+import time
+
+
+def _days(addtime):
+    try:
+        return (time.time() - int(addtime)) / 86400
+    except ValueError:
+        return math.nan
+
+
+# columns on top of the Torrent ACCESSORS.
+# maps column name -> (d.multicall2 command, function given its result)
+COLUMNS = {
+    'tracker': ('t.multicall=,t.url=', tracker_host),
+    'seed_days': ('d.custom=addtime', _days),
+    'addtime': ('d.custom=addtime', str),
+}
+ACTIONS = ('erase', 'erase_with_files', 'stop', 'pause', 'move')
+
+
+def _column(name):
+    if name in COLUMNS:
+        return COLUMNS[name]
+    if name in ACCESSORS:
+        command, convert = ACCESSORS[name]
+        return command + '=', convert
+    raise KeyError(f'unknown column {name!r}')
+
+
+class Mask:
+
+    '''which torrents of a snapshot a condition holds for: byte i of bits
+    is 1 for torrent i'''
+
+    def __init__(self, size, bits):
+        self.size = size
+        self.bits = bits
+
+    @classmethod
+    def from_bools(cls, size, values):
+        return cls(size, int.from_bytes(bytes(map(bool, values)), 'big'))
+
+    @classmethod
+    def full(cls, size):
+        return cls(size, int.from_bytes(b'\1' * size, 'big'))
+
+    def __and__(self, other):
+        return Mask(self.size, self.bits & other.bits)
+
+    def __or__(self, other):
+        return Mask(self.size, self.bits | other.bits)
+
+    def __invert__(self):
+        return Mask(self.size, self.bits ^ Mask.full(self.size).bits)
+
+    def __bytes__(self):
+        return self.bits.to_bytes(self.size, 'big')
+
+    def indexes(self):
+        data = bytes(self)
+        found = []
+        i = data.find(1)
+        while i != -1:
+            found.append(i)
+            i = data.find(1, i + 1)
+        return found
+
+    def __len__(self):
+        return bytes(self).count(1)
+
+
+class _Expr:
+
+    def __and__(self, other):
+        return _Combine(operator.and_, self, other)
+
+    def __or__(self, other):
+        return _Combine(operator.or_, self, other)
+
+    def __invert__(self):
+        return _Not(self)
+
+    def __bool__(self):
+        raise TypeError('use & / | / ~ to combine conditions')
+
+
+class _Combine(_Expr):
+
+    def __init__(self, op, left, right):
+        self.op = op
+        self.left = left
+        self.right = right
+
+    def columns(self):
+        return self.left.columns() | self.right.columns()
+
+    def mask(self, snapshot):
+        return self.op(self.left.mask(snapshot), self.right.mask(snapshot))
+
+    def __repr__(self):
+        symbol = '&' if self.op is operator.and_ else '|'
+        return f'({self.left!r} {symbol} {self.right!r})'
+
+
+class _Not(_Expr):
+
+    def __init__(self, expr):
+        self.expr = expr
+
+    def columns(self):
+        return self.expr.columns()
+
+    def mask(self, snapshot):
+        return ~self.expr.mask(snapshot)
+
+    def __repr__(self):
+        return f'~{self.expr!r}'
+
+
+class _Test(_Expr):
+
+    def __init__(self, name, test, text):
+        self.name = name
+        self.test = test
+        self.text = text
+
+    def columns(self):
+        return {self.name}
+
+    def mask(self, snapshot):
+        return Mask.from_bools(len(snapshot),
+                               map(self.test, snapshot.columns[self.name]))
+
+    def __repr__(self):
+        return self.text
+
+
+class col(_Expr):
+
+    '''a snapshot column in a rule. on its own it is a condition that holds
+    where the value is true; comparing it with a constant, or matches,
+    contains or isin, gives other conditions.'''
+
+    def __init__(self, name):
+        _column(name)
+        self.name = name
+
+    def columns(self):
+        return {self.name}
+
+    def mask(self, snapshot):
+        return Mask.from_bools(len(snapshot), snapshot.columns[self.name])
+
+    def __repr__(self):
+        return self.name
+
+    def __test(self, op, other, symbol):
+        return _Test(self.name, lambda v: op(v, other),
+                     f'{self.name} {symbol} {other!r}')
+
+    def __eq__(self, other): return self.__test(operator.eq, other, '==')
+    def __ne__(self, other): return self.__test(operator.ne, other, '!=')
+    def __lt__(self, other): return self.__test(operator.lt, other, '<')
+    def __le__(self, other): return self.__test(operator.le, other, '<=')
+    def __gt__(self, other): return self.__test(operator.gt, other, '>')
+    def __ge__(self, other): return self.__test(operator.ge, other, '>=')
+
+    __hash__ = None
+
+    def matches(self, pattern, flags=re.I):
+        search = re.compile(pattern, flags).search
+        return _Test(self.name, lambda v: search(str(v)) is not None,
+                     f'{self.name} ~ {pattern!r}')
+
+    def contains(self, text):
+        return _Test(self.name, lambda v: text in str(v),
+                     f'{text!r} in {self.name}')
+
+    def isin(self, values):
+        values = frozenset(values)
+        return _Test(self.name, lambda v: v in values,
+                     f'{self.name} in {sorted(values)!r}')
+
+
+class Snapshot:
+
+    '''columns of every torrent in a view, fetched with one d.multicall2.
+    columns maps name -> list of converted values in hashes order.'''
+
+    def __init__(self, server, view='main', names=()):
+        names = sorted(set(names) | {'name', 'size_bytes'})
+        commands = [_column(n)[0] for n in names]
+        rows = server._rpc.d.multicall2('', view, 'd.hash=', *commands)
+        self.server = server
+        self.view = view
+        self.taken = time.time()
+        self.hashes = [row[0] for row in rows]
+        self.columns = {}
+        for i, name in enumerate(names, 1):
+            convert = _column(name)[1]
+            self.columns[name] = [convert(row[i]) for row in rows]
+
+    def __len__(self):
+        return len(self.hashes)
+
+
+class Rule:
+
+    '''erase, erase_with_files, stop, pause or move (to dest) the torrents
+    a condition holds for, except those unless holds for'''
+
+    def __init__(self, name, when, action='erase', unless=None, dest=None):
+        if action not in ACTIONS:
+            raise ValueError(f'action must be one of {ACTIONS}')
+        if action == 'move' and dest is None:
+            raise ValueError('a move rule needs dest')
+        self.name = name
+        self.when = when
+        self.action = action
+        self.unless = unless
+        self.dest = dest
+
+    def columns(self):
+        columns = self.when.columns()
+        if self.unless is not None:
+            columns |= self.unless.columns()
+        return columns
+
+    def mask(self, snapshot):
+        mask = self.when.mask(snapshot)
+        if self.unless is not None:
+            mask = mask & ~self.unless.mask(snapshot)
+        return mask
+
+    def __repr__(self):
+        unless = f' unless {self.unless!r}' if self.unless is not None else ''
+        return f'Rule({self.name!r}: {self.action} if {self.when!r}{unless})'
+
+
+class Policy:
+
+    '''an ordered list of Rules'''
+
+    def __init__(self, *rules):
+        self.rules = list(rules)
+
+    def plan(self, server, view='main'):
+        '''evaluates every rule over one snapshot of view and returns the
+        Plan. nothing is changed.'''
+        columns = set()
+        for rule in self.rules:
+            columns |= rule.columns()
+        snapshot = Snapshot(server, view, columns)
+        claimed = Mask(len(snapshot), 0)
+        steps = []
+        for rule in self.rules:
+            mask = rule.mask(snapshot) & ~claimed
+            claimed = claimed | mask
+            steps.append((rule, mask.indexes()))
+        return Plan(snapshot, steps)
+
+
+class Plan:
+
+    '''what a Policy would do: steps is a list of (Rule, indexes into the
+    snapshot). print it for a dry run, apply() to carry it out.'''
+
+    def __init__(self, snapshot, steps):
+        self.snapshot = snapshot
+        self.steps = steps
+
+    def group(self, indexes):
+        names = self.snapshot.columns['name']
+        return TorrentGroup(*[Torrent(self.snapshot.server,
+                                      self.snapshot.hashes[i], names[i])
+                              for i in indexes])
+
+    def apply(self):
+        '''runs every step with batched calls and returns a dict of rule
+        name -> {hash: None on success or the error}'''
+        report = {}
+        for rule, indexes in self.steps:
+            group = self.group(indexes)
+            if not group:
+                report[rule.name] = {}
+            elif rule.action == 'erase':
+                report[rule.name] = group.erase_all()
+            elif rule.action == 'erase_with_files':
+                report[rule.name] = group.erase_all_with_files()
+            elif rule.action == 'move':
+                report[rule.name] = group.relocate(rule.dest)
+            else:
+                command = 'd.stop' if rule.action == 'stop' else 'd.pause'
+                report[rule.name] = {t.hash: first_fault(row) for t, row in
+                                     zip(group, group.call(command))}
+        return report
+
+    def __str__(self):
+        names = self.snapshot.columns['name']
+        sizes = self.snapshot.columns['size_bytes']
+        lines = []
+        for rule, indexes in self.steps:
+            total = SizeBytes(sum(sizes[i] for i in indexes))
+            lines.append(f'{rule.name}: {rule.action}'
+                         f'{" to " + rule.dest if rule.dest else ""} '
+                         f'{len(indexes)} torrents, {total}')
+            lines += [f'    {names[i]}' for i in indexes]
+        return '\n'.join(lines)
+
+    def __repr__(self):
+        return (f'Plan({len(self.snapshot)} torrents, ' +
+                ', '.join(f'{rule.name}: {len(indexes)}'
+                          for rule, indexes in self.steps) + ')')
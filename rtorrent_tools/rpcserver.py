@@ -0,0 +1,206 @@
+'''serving an rtorrent-like rpc endpoint, shared by fakeserver and sidecar.
+
+an Endpoint subclass implements request(method, params) and Endpoint turns
+xmlrpc and json-rpc request bodies into calls to it. RPCServer puts an
+endpoint on http, and on scgi or a unix socket if asked, each served from
+its own background thread.
+
+    with RPCServer(endpoint, port=0, scgi_port=0) as rpc:
+        server = Server(rpc.url)'''
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import os
+import socketserver
+import threading
+import xmlrpc.client
+
+
+def fault(code, message):
+    return xmlrpc.client.Fault(code, message)
+
+
+class _Marshaller(xmlrpc.client.Marshaller):
+
+    '''sends ints too big for xmlrpc's i4 as i8 the way rtorrent does'''
+
+    dispatch = dict(xmlrpc.client.Marshaller.dispatch)
+
+    def dump_int(self, value, write):
+        tag = 'int' if -2**31 <= value < 2**31 else 'i8'
+        write(f'<value><{tag}>{int(value)}</{tag}></value>\n')
+
+    dispatch[int] = dump_int
+
+
+def _xml_response(value):
+    m = _Marshaller('utf-8', allow_none=True)
+    if not isinstance(value, xmlrpc.client.Fault):
+        value = (value,)
+    body = m.dumps(value)
+    return ('<?xml version="1.0"?>\n<methodResponse>\n' + body +
+            '</methodResponse>\n').encode()
+
+
+class Endpoint:
+
+    '''decodes xmlrpc and json-rpc request bodies into request(method,
+    params) calls and encodes what they return, or the Fault they raise,
+    the way rtorrent does'''
+
+    def request(self, method, params):
+        raise NotImplementedError
+
+    def handle_xml(self, body):
+        '''answers an xmlrpc request body'''
+        try:
+            params, method = xmlrpc.client.loads(body, use_builtin_types=True)
+            return _xml_response(self.request(method, params))
+        except xmlrpc.client.Fault as f:
+            return _xml_response(f)
+        except Exception as e:
+            return _xml_response(fault(-500, str(e)))
+
+    def batch(self, calls):
+        '''answers the (method, params) calls of a json-rpc request or
+        batch. returns a list with what each call returned or the exception
+        it raised, in order.'''
+        results = []
+        for method, params in calls:
+            try:
+                results.append(self.request(method, params))
+            except Exception as e:
+                results.append(e)
+        return results
+
+    def handle_json(self, body):
+        '''answers a json-rpc request or batch'''
+        try:
+            payload = json.loads(body)
+        except ValueError as e:
+            return json.dumps({'jsonrpc': '2.0', 'id': None, 'error':
+                               {'code': -32700, 'message': str(e)}}).encode()
+        calls = payload if isinstance(payload, list) else [payload]
+        results = self.batch([(call.get('method', ''), call.get('params', []))
+                              for call in calls])
+        replies = [_json_reply(call.get('id'), result)
+                   for call, result in zip(calls, results)]
+        return json.dumps(replies if isinstance(payload, list) else
+                          replies[0]).encode()
+
+
+def _json_reply(id, result):
+    reply = {'jsonrpc': '2.0', 'id': id}
+    if isinstance(result, xmlrpc.client.Fault):
+        reply['error'] = {'code': result.faultCode,
+                          'message': result.faultString}
+    elif isinstance(result, Exception):
+        reply['error'] = {'code': -500, 'message': str(result)}
+    else:
+        reply['result'] = result
+    return reply
+
+
+class _HTTPHandler(BaseHTTPRequestHandler):
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        endpoint = self.server.endpoint
+        if 'json' in self.headers.get('Content-Type', '') or \
+                body[:1] in (b'{', b'['):
+            reply, kind = endpoint.handle_json(body), 'application/json'
+        else:
+            reply, kind = endpoint.handle_xml(body), 'text/xml'
+        self.send_response(200)
+        self.send_header('Content-Type', kind)
+        self.send_header('Content-Length', str(len(reply)))
+        self.end_headers()
+        self.wfile.write(reply)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _SCGIHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        length = b''
+        while not length.endswith(b':'):
+            c = self.rfile.read(1)
+            if not c:
+                return
+            length += c
+        raw = self.rfile.read(int(length[:-1]))
+        self.rfile.read(1)
+        fields = raw.split(b'\0')
+        headers = dict(zip(fields[0::2], fields[1::2]))
+        body = self.rfile.read(int(headers.get(b'CONTENT_LENGTH', 0)))
+        endpoint = self.server.endpoint
+        if b'json' in headers.get(b'CONTENT_TYPE', b''):
+            reply, kind = endpoint.handle_json(body), b'application/json'
+        else:
+            reply, kind = endpoint.handle_xml(body), b'text/xml'
+        self.wfile.write(b'Status: 200 OK\r\nContent-Type: ' + kind +
+                         b'\r\nContent-Length: ' + str(len(reply)).encode() +
+                         b'\r\n\r\n' + reply)
+
+
+class _SCGIServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class _UnixHTTPServer(socketserver.ThreadingMixIn,
+                      socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class RPCServer:
+
+    '''serves endpoint on background threads. url is the http endpoint,
+    scgi the (host, port) it also listens on when scgi_port is not None and
+    socket a unix socket path it listens on for UnixStreamXMLRPCClient.'''
+
+    def __init__(self, endpoint, host='127.0.0.1', port=0, scgi_port=None,
+                 socket=None):
+        self.endpoint = endpoint
+        self.__servers = [ThreadingHTTPServer((host, port), _HTTPHandler)]
+        self.__servers[0].daemon_threads = True
+        self.url = f'http://{host}:{self.__servers[0].server_address[1]}/RPC2'
+        self.scgi = None
+        if scgi_port is not None:
+            self.__servers.append(_SCGIServer((host, scgi_port),
+                                              _SCGIHandler))
+            self.scgi = self.__servers[-1].server_address
+        self.socket = socket
+        if socket is not None:
+            if os.path.exists(socket):
+                os.remove(socket)
+            self.__servers.append(_UnixHTTPServer(socket, _HTTPHandler))
+        for s in self.__servers:
+            s.endpoint = endpoint
+        self.__threads = []
+
+    def start(self):
+        for s in self.__servers:
+            thread = threading.Thread(target=s.serve_forever, daemon=True)
+            thread.start()
+            self.__threads.append(thread)
+        return self
+
+    def stop(self):
+        for s in self.__servers:
+            s.shutdown()
+            s.server_close()
+        if self.socket is not None and os.path.exists(self.socket):
+            os.remove(self.socket)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+    def __repr__(self):
+        return f'RPCServer({self.endpoint!r} at {self.url})'
@@ -2,11 +2,22 @@ from .torrent import Torrent
 from .torrentgroup import TorrentGroup
 from .fileutils import *
 from .jsonrpcproxy import *
+from .bencode import infohash
+from .metainfo import Metainfo
+from . import instrument
+from concurrent.futures import ThreadPoolExecutor
+import functools
 import re
 import socket
 import http.client
 import xmlrpc.client
 
+# torrents sent per load multicall by load.bulk. each one carries the
+# whole .torrent file so this is kept well under rtorrent's xmlrpc size limit
+LOAD_BATCH = 50
+# threads reading .torrent files for load.bulk
+LOAD_WORKERS = 8
+
 class UnixStreamHTTPConnection(http.client.HTTPConnection):
 
     def connect(self):
@@ -16,7 +27,7 @@ class UnixStreamHTTPConnection(http.client.HTTPConnection):
         self.sock.connect(self.host)
 
 
-class UnixStreamTransport(xmlrpc.client.Transport, object):
+class UnixStreamTransport(instrument.Transport):
 
     def __init__(self, socket_path):
         self.socket_path = socket_path
@@ -34,15 +45,74 @@ class UnixStreamXMLRPCClient(xmlrpc.client.ServerProxy):
             "http://", transport=transport, **kwargs
         )
 
+def _read_torrent(source):
+    '''returns (data, info hash) for a .torrent path or raw bytes, or
+    (exception, None) when it can't be read'''
+    try:
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            data = bytes(source)
+        else:
+            with open(source, 'rb') as f:
+                data = f.read()
+        return data, infohash(data)
+    except Exception as e:
+        return e, None
+
+def _add_resume(data, directory, check, pool):
+    '''data with fast resume data for its copy in directory, or the
+    exception that stopped it'''
+    from .resume import with_resume, base_directory
+    try:
+        base = base_directory(Metainfo(data), directory)
+        return with_resume(data, base, check=check, pool=pool)
+    except Exception as e:
+        return e
+
+def _key(source, hash, index):
+    '''report key for a source. paths are reported as given, raw data by
+    its info hash or by its position in sources if it isn't a torrent'''
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return hash if hash is not None else index
+    return source
+
 class Server:
-    def __init__(self: object, server: str, jsonrpc=False) -> None:
+    def __init__(self: object, server: str, jsonrpc=False, record=None,
+                 replay=None) -> None:
+        '''record is a file path every rpc exchange is saved to, replay one
+        written that way to answer from instead of rtorrent. see replay.'''
 
         self.server = server
+        self.recording = None
+        if record is not None or replay is not None:
+            from .replay import (Recording, RecordingTransport,
+                                 RecordingSafeTransport, ReplayTransport,
+                                 recording_adapter, replay_adapter)
+        if record is not None:
+            self.recording = Recording(record, 'w')
+        elif replay is not None:
+            self.recording = Recording(replay)
+        https = self.server.startswith('https')
         if jsonrpc:
             self._rpc = JsonRpcProxy(self.server)
+            if self.recording is not None:
+                retries = self._rpc._session.get_adapter(
+                    self.server).max_retries
+                adapter = (recording_adapter(self.recording, retries)
+                           if record else replay_adapter(self.recording))
+                self._rpc._session.mount('http://', adapter)
+                self._rpc._session.mount('https://', adapter)
             self.multicall = JsonRpcMultiCall(self._rpc)
         else:
-            self._rpc = xmlrpc.client.ServerProxy(self.server, allow_none=True)
+            if record is not None:
+                transport = (RecordingSafeTransport(self.recording) if https
+                             else RecordingTransport(self.recording))
+            elif replay is not None:
+                transport = ReplayTransport(self.recording)
+            else:
+                transport = (instrument.SafeTransport() if https else
+                             instrument.Transport())
+            self._rpc = xmlrpc.client.ServerProxy(self.server, allow_none=True,
+                                                  transport=transport)
             self.multicall = xmlrpc.client.MultiCall(self._rpc)
         self.jsonrpc = jsonrpc
         self.ui = self.__ui(self)
@@ -123,14 +193,153 @@ class Server:
             return self.server._rpc.load.raw_start(meta, torrent_data)
 
         def __raw_start_verbose(self, meta, torrent_data):
-            return self.server_rpc.load.raw_start_verbose(meta, torrent_data)
+            return self.server._rpc.load.raw_start_verbose(meta, torrent_data)
 
         def __start(self, meta, torrent_file):
-            return self.server_rpc.load.start(meta, torrent_file)
+            return self.server._rpc.load.start(meta, torrent_file)
 
         def __start_verbose(self, meta, torrent_file):
             return self.server._rpc.load.start_verbose(meta, torrent_file)
 
+        def bulk(self, sources, start=False, verbose=False, directory=None,
+                 custom=None, throttle=None, commands=(), meta=None,
+                 resume=None, batch_size=LOAD_BATCH, workers=LOAD_WORKERS,
+                 progress=None, placement=None):
+            '''loads many torrents at once. sources are .torrent paths or
+            raw torrent bytes. files are read by a pool of threads and their
+            info hashes worked out locally, so torrents rtorrent already has
+            (or that appear twice in sources) are skipped without sending
+            them. the rest go to load.raw (load.raw_start with start=True)
+            batch_size at a time per multicall while the next batch is
+            read.
+
+            directory, custom (a dict), throttle and commands are applied
+            to every torrent as load commands, meta is an optional function
+            of the source returning more commands for that torrent alone.
+            progress is called with (sources handled, total) after every
+            batch.
+
+            when the data is already in directory, resume='sizes' adds
+            libtorrent fast resume data trusting files of the right size
+            and resume='verify' hashes the pieces locally first, so the
+            torrents come up without rtorrent hash checking them. the data
+            has to be visible at the same path from here. resume data is
+            only built for torrents that will be sent, and every 'verify'
+            check shares one pool of hashing processes.
+
+            instead of directory a Placement can choose one per torrent by
+            its size and the free space left on each of its roots. torrents
+            no root has room for are failed with ENOSPC.
+
+            returns a dict with 'loaded' and 'skipped' mapping sources to
+            their info hash and 'failed' mapping sources to the error. a
+            source given more than once is reported once. json-rpc can't
+            carry the raw data, so a jsonrpc Server raises ValueError.'''
+            method = 'load.raw_start' if start else 'load.raw'
+            if verbose:
+                method += '_verbose'
+            shared = list(commands)
+            if directory is not None:
+                shared.append(f'd.directory.set="{directory}"')
+            for key, value in (custom or {}).items():
+                shared.append(f'd.custom.set={key},"{value}"')
+            if throttle is not None:
+                shared.append(f'd.throttle_name.set={throttle}')
+
+            if self.server.jsonrpc:
+                raise ValueError('load.bulk sends raw torrent data, which '
+                                 'json-rpc has no type for; use an xmlrpc '
+                                 'Server')
+            if resume and directory is None:
+                raise ValueError('resume needs the directory the data is in')
+            if placement is not None and (directory is not None or resume):
+                raise ValueError('placement chooses the directory, it can\'t '
+                                 'be used with directory or resume')
+            sources = list(sources)
+            known = set(self.server.hash_list())
+            reported = set()
+            report = {'loaded': {}, 'skipped': {}, 'failed': {}}
+            batches = chunk(sources, batch_size)
+            if resume == 'verify':
+                from concurrent.futures import ProcessPoolExecutor
+                hashers = ProcessPoolExecutor()
+            else:
+                hashers = None
+            add_resume = functools.partial(_add_resume, directory=directory,
+                                           check=(resume == 'verify'),
+                                           pool=hashers)
+            try:
+                with ThreadPoolExecutor(max_workers=workers) as pool:
+                    pending = (pool.map(_read_torrent, batches[0])
+                               if batches else None)
+                    for n, batch in enumerate(batches):
+                        done = list(pending)
+                        if n + 1 < len(batches):
+                            pending = pool.map(_read_torrent, batches[n + 1])
+                        # everything rtorrent has, or that came earlier in
+                        # sources, is dropped before any resume data is
+                        # built for it
+                        wanted = []
+                        for i, (source, (data, hash)) in enumerate(
+                                zip(batch, done), n * batch_size):
+                            key = _key(source, hash, i)
+                            if key in reported:
+                                continue
+                            reported.add(key)
+                            if isinstance(data, Exception):
+                                report['failed'][key] = data
+                            elif hash in known:
+                                report['skipped'][key] = hash
+                            else:
+                                known.add(hash)
+                                wanted.append((key, source, data, hash))
+                        if resume:
+                            datas = pool.map(add_resume,
+                                             [w[2] for w in wanted])
+                            wanted = [(key, source, data, hash)
+                                      for (key, source, _, hash), data
+                                      in zip(wanted, datas)]
+                        self.__send(method, shared, meta, placement, wanted,
+                                    report)
+                        if progress is not None:
+                            progress(min((n + 1) * batch_size, len(sources)),
+                                     len(sources))
+            finally:
+                if hashers is not None:
+                    hashers.shutdown()
+            return report
+
+        def __send(self, method, shared, meta, placement, wanted, report):
+            '''loads one batch of (key, source, data, info hash) in a
+            multicall and adds the outcomes to report'''
+            mc = self.server.get_mc_proxy()
+            sent = []
+            for key, source, data, hash in wanted:
+                if isinstance(data, Exception):
+                    report['failed'][key] = data
+                    continue
+                extra = list(meta(source)) if meta else []
+                placed = None
+                if placement is not None:
+                    try:
+                        size = Metainfo(data).size
+                        placed = (placement.choose(size), size)
+                    except Exception as e:
+                        report['failed'][key] = e
+                        continue
+                    extra.insert(0, f'd.directory.set="{placed[0]}"')
+                getattr(mc, method)('', xmlrpc.client.Binary(data),
+                                    *shared, *extra)
+                sent.append((key, hash, placed))
+            results = multicall_results(mc) if sent else []
+            for (key, hash, placed), result in zip(sent, results):
+                if isinstance(result, xmlrpc.client.Fault):
+                    report['failed'][key] = result
+                    if placed is not None:
+                        placement.release(*placed)
+                else:
+                    report['loaded'][key] = hash
+
     class __protocol:
 
         def __init__(self, server):
@@ -580,12 +789,55 @@ class Server:
         def unchoked_uploads(self):
             return self.__server._rpc.throttle.unchoked_uploads()
 
-        def names(self):
-            return list(
-                    set(
-                        self.__server.view().each(lambda x: x.throttle_name())
-                        )
-                    )
+        def names(self, view='main'):
+            return list(set(
+                row[0] for row in self.__server._rpc.d.multicall2(
+                    '', view, 'd.throttle_name=')
+            ))
+
+        def limits(self, names):
+            '''returns a dict mapping each throttle name to its configured
+            [down max, up max], read in one multicall. None stands for a
+            name no throttle was defined for.'''
+            names = list(names)
+            if not names:
+                return {}
+            mc = self.__server.get_mc_proxy()
+            for name in names:
+                getattr(mc, 'throttle.down.max')('', name)
+                getattr(mc, 'throttle.up.max')('', name)
+            # a name no throttle was defined for comes back as a Fault
+            return {name: [None if isinstance(v, xmlrpc.client.Fault) else v
+                           for v in pair]
+                    for name, pair in zip(names, chunk(multicall_results(mc), 2))}
+
+        def inventory(self, view='main'):
+            '''returns a dict keyed by throttle name with the number of
+            Torrents using each throttle, their summed down and up rates and
+            the throttle's configured down and up max. takes one d.multicall2
+            and one multicall however many Torrents there are. '' is the
+            unnamed (global) throttle, which has no max of its own.'''
+            inventory = {}
+            for name, down, up in self.__server._rpc.d.multicall2(
+                    '', view, 'd.throttle_name=', 'd.down.rate=',
+                    'd.up.rate='):
+                entry = inventory.setdefault(name, {
+                    'torrents': 0, 'down_rate': 0, 'up_rate': 0,
+                    'down_max': None, 'up_max': None})
+                entry['torrents'] += 1
+                entry['down_rate'] += down
+                entry['up_rate'] += up
+
+            limits = self.limits(name for name in inventory if name)
+            for name, (down_max, up_max) in limits.items():
+                if down_max is not None:
+                    inventory[name]['down_max'] = SizeBytes(down_max)
+                if up_max is not None:
+                    inventory[name]['up_max'] = SizeBytes(up_max)
+            for entry in inventory.values():
+                entry['down_rate'] = SizeBytes(entry['down_rate'])
+                entry['up_rate'] = SizeBytes(entry['up_rate'])
+            return inventory
 
         class __down:
 
@@ -1419,28 +1671,12 @@ class Server:
 
         def __call__(self, view='main'):
     
-            # Everything before the return is not necessary for
-            # the function but caching the names now with one
-            # multicall saves a lot of rpc calls later.
-            hashes = self.__server.hash_list(view)
-    
-##            chunk_length = 5000
-##            results = []
-##            # rtorrent doesn't like to do these all at once if
-##            # you have several 1000 so we split it up into chunks
-##            chunks = chunk(hashes, chunk_length)
-##            for c in chunks:
-##                mc = self.__server.multicall
-##                for hash in c:
-##                    mc.d.name(hash)
-##    
-##                names = list(mc())
-##                assert len(names) == len(chunks),\
-##                    "response from server has incorrect length"
-##                results += names
-    
+            # fetching the names along with the hashes costs nothing
+            # extra and saves an rpc per Torrent when they are printed
+            torrents = self.__server._rpc.d.multicall2('', view, 'd.hash=',
+                                                       'd.name=')
             return TorrentGroup(
-                *[Torrent(self.__server, x) for x in hashes]
+                *[Torrent(self.__server, x, name) for x, name in torrents]
             )
 
         def size(self, view=None):
@@ -1596,7 +1832,7 @@ class Server:
         torrents = self._rpc.d.multicall2('',view, 'd.name=', 'd.hash=')
         for torrent in torrents:
             if re.search(pattern, torrent[0], [0, 2][caseInsensitive]):
-                matches.append(Torrent(self, torrent[1]))
+                matches.append(Torrent(self, torrent[1], torrent[0]))
         return matches
 
     def get_torrent_by_hash(self, hash):
@@ -1613,7 +1849,7 @@ class Server:
         for torrent in torrents:
             for url in torrent[2][0]:
                 if re.search(pattern, url, [0,2][caseInsensitive]):
-                    matches.append(Torrent(self, torrent[1]))
+                    matches.append(Torrent(self, torrent[1], torrent[0]))
 
         return matches
 
@@ -1626,7 +1862,7 @@ class Server:
                                           'd.throttle_name=')
         for torrent in torrents:
             if re.search(pattern, torrent[2], [0,2][caseInsensitive]):
-                matches.append(Torrent(self, torrent[1]))
+                matches.append(Torrent(self, torrent[1], torrent[0]))
 
         return matches
 
@@ -1637,7 +1873,7 @@ class Server:
                                           'd.message=')
         for torrent in torrents:
             if re.search(pattern, torrent[2], [0,2][caseInsensitive]):
-                matches.append(Torrent(self, torrent[1]))
+                matches.append(Torrent(self, torrent[1], torrent[0]))
 
         return matches
 
@@ -1651,6 +1887,28 @@ class Server:
                                                               'd.message=')
                               if 'Unregistered' in y[1]])
 
+    def orphaned_data(self, roots, cache=None, view='main'):
+        '''returns (path, size, is_dir) for everything under the download
+        roots that no torrent references, see orphans.find_orphans'''
+        from .orphans import find_orphans
+        return find_orphans(self, roots, cache=cache, view=view)
+
+    def trace(self, threshold=10, report=True):
+        '''a context manager recording every rpc request made inside it,
+        with the code that made it. on exit, methods called one request at
+        a time at least threshold times from one place are printed to
+        stderr. see tracing.Trace.'''
+        from .tracing import Trace
+        return Trace(threshold, report)
+
+    def placement(self, roots, reserve=0, ttl=None):
+        '''a Placement choosing among roots by free space for load.bulk.
+        see placement.Placement. ttl defaults to placement.TTL.'''
+        from .placement import Placement, TTL
+        if ttl is None:
+            ttl = TTL
+        return Placement(self, roots, reserve, ttl)
+
     def get_mc_proxy(self):
 
         if self.jsonrpc:
@@ -0,0 +1,396 @@
+'''a caching proxy in front of rtorrent for many clients at once.
+
+    python -m rtorrent_tools.sidecar http://localhost/RPC2 --port 8100
+
+then point every Server at http://127.0.0.1:8100/RPC2 instead. the sidecar
+speaks xmlrpc and json-rpc over http (and over scgi or a unix socket if
+asked) and answers each read with what rtorrent said to the same call at
+most max_age seconds ago. reads are kept in one cache shared by every
+client, and a thread asks rtorrent again every refresh seconds for the ones
+still in use, so clients polling the same d.multicall2 scan stop costing
+rtorrent anything. identical reads that arrive while one is being fetched
+wait for it instead of sending their own. a json-rpc batch costs rtorrent
+at most one multicall, for the reads in it that weren't fresh in the cache
+and its state changes.
+
+anything that changes state is sent straight through and marks every
+cached answer stale, so a client reads its own writes. a call is only
+taken to be a read when its name, and that of every command inside a
+multicall, matches READS; everything else, d.try_start or a command the
+sidecar has never heard of alike, changes state.'''
+
+from .rpcserver import Endpoint, RPCServer
+from .fileutils import multicall_results
+import argparse
+import json
+import re
+import threading
+import time
+
+# seconds between refreshes of the cached reads in use
+REFRESH_INTERVAL = 2.0
+# oldest answer given to a read, in seconds
+MAX_AGE = 5.0
+# cached reads nobody asked for in this many seconds are dropped
+IDLE = 60.0
+PORT = 8100
+# commands known only to read rtorrent's state, so their answers can be
+# cached. anything not matched, inside a multicall too, changes state
+READS = re.compile(r'''
+    d\.(hash|name|base_filename|base_path|bitfield|bytes_done|chunk_size
+       |chunks_hashed|complete|completed_bytes|completed_chunks|incomplete
+       |connection_(current|leech|seed)|creation_date|custom[1-5]?
+       |custom\.(if_z|keys)|custom_throw|directory|directory_base
+       |down\.(rate|total|choke_heuristics(\.leech|\.seed)?)
+       |up\.(rate|total|choke_heuristics(\.leech|\.seed)?)|up_rate|up_total
+       |skip\.(rate|total)|downloads_(max|min)|uploads_(max|min)|fileno
+       |free_diskspace|group(\.name)?|hashing|hashing_failed|ignore_commands
+       |is_[a-z_]+|left_bytes|load_date|loaded_file|local_id(_html)?
+       |max_file_size|max_size_pex|message|mode|accepting_seeders
+       |peers_(accounted|complete|connected|max|min|not_connected)
+       |priority(_str)?|ratio|size_(bytes|chunks|files|pex)
+       |state(_changed|_counter)?|throttle_name|tied_to_file
+       |timestamp\.(started|finished)|tracker_(focus|numwant|size)
+       |views(\.has)?)
+    | f\.(completed_chunks|frozen_path|is_[a-z_]+|last_touched
+       |match_depth_(next|prev)|offset|path(_components|_depth)?|priority
+       |range_(first|second)|size_(bytes|chunks))
+    | t\.(url|group|id|is_[a-z_]+|min_interval|normal_interval|type
+       |scrape_[a-z_]+|activity_time_(last|next)|failed_counter
+       |success_counter|latest_[a-z_]+|can_scrape)
+    | p\.(address|banned|client_version|completed_percent|down_rate
+       |down_total|id(_html)?|is_[a-z_]+|options_str|peer_rate|peer_total
+       |port|snubbed|up_rate|up_total)
+    | [dftp]\.multicall2?|d\.multicall\.filtered|system\.multicall
+    | system\.(client_version|library_version|hostname|pid|cwd
+       |time(_seconds|_usec)?|listMethods|methodExist|methodHelp
+       |methodSignature|capabilities|api_version)
+    | download_list|view\.(list|size|size_not_visible)
+    | throttle\.global_(up|down)\.(rate|total|max_rate)
+    | throttle\.(up|down)\.(max|rate)|scheduler\.max_active
+    | directory\.default|session\.(path|name)|network\.(xmlrpc\.size_limit
+       |listen\.port|port_range|bind_address|local_address|open_sockets
+       |max_open_(files|sockets))
+    | and|or|not|cat|if|branch|equal|less|greater|compare|value
+    | (math|string|convert)\.[a-z_]+
+''', re.X)
+# the calls whose string arguments, after the target and view or pattern,
+# are commands of their own
+MULTICALLS = ('d.multicall2', 'd.multicall.filtered', 'f.multicall',
+              't.multicall', 'p.multicall')
+# commands that run their arguments as commands, 'branch=d.is_active=,d.stop='
+EVALUATING = ('branch', 'if', 'and', 'or', 'not', 'cat', 'equal', 'less',
+              'greater', 'compare')
+
+
+def _split(text, separator=','):
+    '''splits text at the separators outside braces and quotes'''
+    parts = []
+    depth = 0
+    quoted = False
+    start = 0
+    for i, c in enumerate(text):
+        if c == '"':
+            quoted = not quoted
+        elif quoted:
+            continue
+        elif c == '{':
+            depth += 1
+        elif c == '}':
+            depth -= 1
+        elif c == separator and depth == 0:
+            parts.append(text[start:i])
+            start = i + 1
+    parts.append(text[start:])
+    return [part.strip() for part in parts]
+
+
+def _commands(text):
+    '''yields the name of every command rtorrent would run for text, a
+    command argument like 'd.name=', 'd.erase' or 'branch=d.is_active=,
+    d.stop=', including those in the arguments of EVALUATING commands and
+    nested multicalls and the $command= ones anywhere'''
+    for expression in _split(text.strip().strip('"'), ';'):
+        if expression.startswith('{') and expression.endswith('}'):
+            for part in _split(expression[1:-1]):
+                yield from _commands(part)
+            continue
+        name, _, rest = expression.lstrip('$').partition('=')
+        if not name:
+            continue
+        yield name
+        for arg in _split(rest) if rest else ():
+            if name in EVALUATING or name in MULTICALLS or \
+                    arg.lstrip('"').startswith('$'):
+                yield from _commands(arg)
+
+
+def _mutating(method, params, reads=READS):
+    if method == 'system.multicall':
+        return any(_mutating(c.get('methodName', ''), c.get('params', ()),
+                             reads) for c in (params[0] if params else ()))
+    if method in MULTICALLS:
+        # the target and the view or pattern come first, unless whatever
+        # is there is a command
+        params = [p for p in params[:2] if isinstance(p, str) and '=' in p] + \
+            list(params[2:])
+    elif method not in EVALUATING:
+        return not reads.fullmatch(method)
+    return any(not reads.fullmatch(name) for p in params
+               if isinstance(p, str) for name in _commands(p))
+
+
+def _key(method, params):
+    return json.dumps([method, list(params)], sort_keys=True, default=repr)
+
+
+class _Entry:
+
+    __slots__ = ('method', 'params', 'value', 'fetched', 'used')
+
+    def __init__(self, method, params):
+        self.method = method
+        self.params = params
+        self.value = None
+        self.fetched = -float('inf')
+        self.used = time.monotonic()
+
+
+class CachingProxy(Endpoint):
+
+    '''the caching and forwarding, without any transport. request(method,
+    params) answers one call from a client.'''
+
+    def __init__(self, server, max_age=MAX_AGE, idle=IDLE,
+                 reads=READS):
+        self.server = server
+        self.max_age = max_age
+        self.idle = idle
+        self.reads = reads
+        self.stats = dict.fromkeys(('hits', 'misses', 'coalesced',
+                                    'passed', 'refreshed'), 0)
+        self.__entries = {}
+        self.__flights = {}
+        self.__generation = 0
+        self.__lock = threading.Lock()
+        self.__upstream = threading.Lock()
+
+    def __forward(self, method, params):
+        '''one call to rtorrent. the proxy it is sent through is not
+        thread safe and rtorrent answers one request at a time anyway.'''
+        with self.__upstream:
+            return getattr(self.server._rpc, method)(*params)
+
+    def request(self, method, params):
+        if _mutating(method, params, self.reads):
+            with self.__lock:
+                self.stats['passed'] += 1
+            try:
+                return self.__forward(method, params)
+            finally:
+                self.invalidate()
+        key = _key(method, params)
+        now = time.monotonic()
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry is None:
+                entry = self.__entries[key] = _Entry(method, params)
+            entry.used = now
+            if now - entry.fetched <= self.max_age:
+                self.stats['hits'] += 1
+                return entry.value
+        return self.__fetch(key, entry)
+
+    def __forward_all(self, calls):
+        '''(method, params) calls to rtorrent in one multicall, with the
+        Fault of each failed one in its place'''
+        mc = self.server.get_mc_proxy()
+        for method, params in calls:
+            getattr(mc, method)(*params)
+        with self.__upstream:
+            return multicall_results(mc)
+
+    def batch(self, calls):
+        '''answers a json-rpc batch with at most one request to rtorrent.
+        fresh reads come from the cache, the misses and state changes go
+        up together as one multicall and each read is cached on its own.
+        reads after a state change in the batch are never answered from
+        the cache, and none of the batch is cached if it changed state.'''
+        if len(calls) == 1:
+            return super().batch(calls)
+        results = [None] * len(calls)
+        upstream = []
+        mutated = False
+        now = time.monotonic()
+        with self.__lock:
+            generation = self.__generation
+            for i, (method, params) in enumerate(calls):
+                if _mutating(method, params, self.reads):
+                    mutated = True
+                    self.stats['passed'] += 1
+                    upstream.append((i, None, method, params))
+                    continue
+                key = _key(method, params)
+                entry = self.__entries.get(key)
+                if entry is None:
+                    entry = self.__entries[key] = _Entry(method, params)
+                entry.used = now
+                if not mutated and now - entry.fetched <= self.max_age:
+                    self.stats['hits'] += 1
+                    results[i] = entry.value
+                else:
+                    self.stats['misses'] += 1
+                    upstream.append((i, entry, method, params))
+        if not upstream:
+            return results
+        try:
+            answers = self.__forward_all([(m, p) for i, e, m, p in upstream])
+        except Exception as e:
+            answers = [e] * len(upstream)
+        finally:
+            if mutated:
+                self.invalidate()
+        fetched = time.monotonic()
+        with self.__lock:
+            keep = not mutated and generation == self.__generation
+            for (i, entry, method, params), answer in zip(upstream, answers):
+                results[i] = answer
+                if keep and not isinstance(answer, Exception):
+                    entry.value = answer
+                    entry.fetched = fetched
+        return results
+
+    def __fetch(self, key, entry, refresh=False):
+        '''fetches entry, or waits for the fetch of it already under way
+        since the last invalidate()'''
+        with self.__lock:
+            generation = self.__generation
+            flight = self.__flights.get((key, generation))
+            leader = flight is None
+            if leader:
+                self.stats['refreshed' if refresh else 'misses'] += 1
+                flight = self.__flights[key, generation] = {
+                    'done': threading.Event()}
+            else:
+                self.stats['coalesced'] += 1
+        if leader:
+            try:
+                flight['value'] = self.__forward(entry.method, entry.params)
+            except Exception as e:
+                flight['error'] = e
+            with self.__lock:
+                del self.__flights[key, generation]
+                if 'value' in flight and generation == self.__generation:
+                    entry.value = flight['value']
+                    entry.fetched = time.monotonic()
+            flight['done'].set()
+        else:
+            flight['done'].wait()
+        if 'error' in flight:
+            raise flight['error']
+        return flight['value']
+
+    def invalidate(self):
+        '''marks every cached answer stale'''
+        with self.__lock:
+            self.__generation += 1
+            for entry in self.__entries.values():
+                entry.fetched = -float('inf')
+
+    def refresh(self):
+        '''fetches again the reads used in the last idle seconds and drops
+        the rest'''
+        now = time.monotonic()
+        with self.__lock:
+            for key in [k for k, e in self.__entries.items()
+                        if now - e.used > self.idle]:
+                del self.__entries[key]
+            entries = list(self.__entries.items())
+        for key, entry in entries:
+            try:
+                self.__fetch(key, entry, refresh=True)
+            except Exception:
+                # the client asking next gets the error instead
+                pass
+
+    def __len__(self):
+        return len(self.__entries)
+
+    def __repr__(self):
+        return (f'CachingProxy({len(self)} reads cached, ' +
+                ', '.join(f'{k}={v}' for k, v in self.stats.items()) + ')')
+
+
+class Sidecar:
+
+    '''runs a CachingProxy for server on background threads. url is the
+    http endpoint to give clients, scgi the (host, port) it also listens on
+    when scgi_port is not None and socket a unix socket path it listens on
+    for UnixStreamXMLRPCClient.'''
+
+    def __init__(self, server, host='127.0.0.1', port=PORT, scgi_port=None,
+                 socket=None, refresh=REFRESH_INTERVAL, max_age=MAX_AGE,
+                 idle=IDLE):
+        self.proxy = CachingProxy(server, max_age, idle)
+        self.refresh = refresh
+        self.__rpc = RPCServer(self.proxy, host, port, scgi_port, socket)
+        self.url = self.__rpc.url
+        self.scgi = self.__rpc.scgi
+        self.socket = socket
+        self.__stop = threading.Event()
+        self.__thread = None
+
+    def __refresh(self):
+        while not self.__stop.wait(self.refresh):
+            self.proxy.refresh()
+
+    def start(self):
+        self.__stop.clear()
+        self.__rpc.start()
+        self.__thread = threading.Thread(target=self.__refresh, daemon=True)
+        self.__thread.start()
+        return self
+
+    def stop(self):
+        self.__stop.set()
+        self.__rpc.stop()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+    def __repr__(self):
+        return f'Sidecar({self.proxy.server.server} at {self.url})'
+
+
+def main():
+    from .server import Server
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('url', help='rtorrent rpc url')
+    parser.add_argument('--jsonrpc', action='store_true',
+                        help='talk json-rpc to rtorrent')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--scgi-port', type=int)
+    parser.add_argument('--socket', help='unix socket path to listen on too')
+    parser.add_argument('--refresh', type=float, default=REFRESH_INTERVAL,
+                        help='seconds between refreshes of cached reads')
+    parser.add_argument('--max-age', type=float, default=MAX_AGE,
+                        help='oldest answer given to a read, in seconds')
+    args = parser.parse_args()
+    server = Server(args.url, jsonrpc=args.jsonrpc)
+    sidecar = Sidecar(server, args.host, args.port, args.scgi_port,
+                      args.socket, args.refresh, args.max_age).start()
+    print(sidecar.url, flush=True)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        sidecar.stop()
+
+
+if __name__ == '__main__':
+    main()
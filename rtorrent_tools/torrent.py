@@ -3,19 +3,108 @@ from .tracker import Tracker
 from urllib.parse import urlsplit
 from .peer import Peer
 import os
+import re
 import time
 
+UNREGISTERED = r'Tracker: \[Failure reason "Unregistered torrent'
+
+def _ratio(value):
+    return value/1000.0
+
+def _unregistered(message):
+    return re.match(UNREGISTERED, message, re.I)
+
+# Torrent accessors that are a single d.* getter. TorrentGroup looks names up
+# here so each('complete') or filter(Torrent.is_private) can be fetched
+# for the whole group with one multicall instead of one rpc per Torrent.
+# maps accessor name -> (rpc command, function applied to the raw result)
+ACCESSORS = {
+    'name': ('d.name', str),
+    'ratio': ('d.ratio', _ratio),
+    'is_unregistered': ('d.message', _unregistered),
+    'message': ('d.message', str),
+    'directory': ('d.directory', str),
+    'directory_base': ('d.directory_base', str),
+    'throttle_name': ('d.throttle_name', str),
+    'custom1': ('d.custom1', str),
+    'custom2': ('d.custom2', str),
+    'custom3': ('d.custom3', str),
+    'custom4': ('d.custom4', str),
+    'custom5': ('d.custom5', str),
+    'priority': ('d.priority', int),
+    'priority_str': ('d.priority_str', str),
+    'peers_min': ('d.peers_min', int),
+    'peers_max': ('d.peers_max', int),
+    'hashing_failed': ('d.hashing_failed', bool),
+    'down.rate': ('d.down.rate', SizeBytes),
+    'down.total': ('d.down.total', SizeBytes),
+    'incomplete': ('d.incomplete', bool),
+    'is_meta': ('d.is_meta', bool),
+    'is_not_partially_done': ('d.is_not_partially_done', bool),
+    'is_partially_done': ('d.is_partially_done', bool),
+    'is_pex_active': ('d.is_pex_active', bool),
+    'load_date': ('d.load_date', int),
+    'base_filename': ('d.base_filename', str),
+    'base_path': ('d.base_path', str),
+    'bitfield': ('d.bitfield', str),
+    'bytes_done': ('d.bytes_done', SizeBytes),
+    'chunk_size': ('d.chunk_size', int),
+    'chunks_hashed': ('d.chunks_hashed', int),
+    'complete': ('d.complete', bool),
+    'completed_bytes': ('d.completed_bytes', SizeBytes),
+    'completed_chunks': ('d.completed_chunks', int),
+    'connection_leech': ('d.connection_leech', str),
+    'connection_seed': ('d.connection_seed', str),
+    'creation_date': ('d.creation_date', int),
+    'free_diskspace': ('d.free_diskspace', int),
+    'hashing': ('d.hashing', int),
+    'left_bytes': ('d.left_bytes', SizeBytes),
+    'loaded_file': ('d.loaded_file', str),
+    'local_id': ('d.local_id', str),
+    'local_id_html': ('d.local_id_html', str),
+    'max_file_size': ('d.max_file_size', SizeBytes),
+    'max_size_pex': ('d.max_size_pex', int),
+    'peers_accounted': ('d.peers_accounted', int),
+    'peers_complete': ('d.peers_complete', int),
+    'peers_connected': ('d.peers_connected', int),
+    'peers_not_connected': ('d.peers_not_connected', int),
+    'size': ('d.size_bytes', SizeBytes),
+    'size_bytes': ('d.size_bytes', int),
+    'size_chunks': ('d.size_chunks', int),
+    'size_files': ('d.size_files', int),
+    'size_pex': ('d.size_pex', int),
+    'state': ('d.state', int),
+    'state_changed': ('d.state_changed', int),
+    'state_counter': ('d.state_counter', int),
+    'tied_to_file': ('d.tied_to_file', str),
+    'tracker_focus': ('d.tracker_focus', int),
+    'tracker_numwant': ('d.tracker_numwant', int),
+    'tracker_size': ('d.tracker_size', int),
+    'up_rate': ('d.up_rate', SizeBytes),
+    'up_total': ('d.up_total', SizeBytes),
+    'uploads_max': ('d.uploads_max', SizeBytes),
+    'is_active': ('d.is_active', bool),
+    'is_hash_checked': ('d.is_hash_checked', bool),
+    'is_hash_checking': ('d.is_hash_checking', bool),
+    'is_multi_file': ('d.is_multi_file', bool),
+    'is_open': ('d.is_open', bool),
+    'is_private': ('d.is_private', bool),
+}
+
 class Torrent:
 
     '''must be initialized with a server, and an info hash.
     provides all of the torrent methods available through
     XMLRPC/JSONRPC as instance methods.'''
 
-    def __init__(self, server, hash):
+    def __init__(self, server, hash, name=None):
 #        if not isinstance(server, Server):
 #            raise TypeError(f'{server} must be type Server')
         self.server = server
         self.hash = hash
+        # a torrent's name never changes, so it is cached once known.
+        # callers that already fetched it in bulk can pass it in.
+        self._name = name
         self.__files = []
         self.down = self.__down(server, hash)
         self.accepting_seeders = self.__accepting_seeders(server, hash)
@@ -351,7 +440,9 @@ class Torrent:
 
     @property
     def name(self):
-        return self.server._rpc.d.name(self.hash)
+        if self._name is None:
+            self._name = self.server._rpc.d.name(self.hash)
+        return self._name
 
     def incomplete(self):
         return bool(self.server._rpc.d.incomplete(self.hash))
@@ -391,7 +482,9 @@ class Torrent:
 
     def erase_with_files(self):
         files = self.get_files()
-        list(map(os.remove, files))
+        list(map(remove_file, files))
+        if self.is_multi_file():
+            remove_empty_dirs(self.directory_base())
         return self.server._rpc.d.erase(self.hash)
 
     def base_filename(self):
@@ -628,11 +721,10 @@ class Torrent:
         if self.complete():
             return TimePeriod(seconds=0)
         return TimePeriod(
-            seconds=(self.left_bytes() / self.down_rate()))
+            seconds=(self.left_bytes() / self.down.rate()))
 
     def is_unregistered(self):
-        return re.match(r'Tracker: \[Failure reason "Unregistered torrent',
-                        self.message(), re.I)
+        return _unregistered(self.message())
 
     @property
     def files(self):
@@ -656,8 +748,8 @@ class Torrent:
         return self.__files
 
     def get_files(self):
-        return list(map(lambda x:os.path.join(self.directory_base(),
-                                              str(x)), self.files))
+        base = self.directory_base()
+        return [os.path.join(base, str(x)) for x in self.files]
 
     def peers(self):
         return [ Peer(self.server, self.hash, p[3])
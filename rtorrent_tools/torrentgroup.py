@@ -1,13 +1,41 @@
 #!/usr/bin/env python
 
 from types import FunctionType
+from concurrent.futures import ThreadPoolExecutor
+import operator
+import os
 import pprint
 from collections.abc import MutableSequence
-from itertools import batched
-from .torrent import Torrent
-from .fileutils import SizeBytes
+import math
+import time
+from .torrent import Torrent, ACCESSORS
+from .bitfield import Bitfield
+from .fileutils import (SizeBytes, Series, chunk, remove_file,
+                        remove_empty_dirs, multicall_results, first_fault,
+                        tracker_host)
 from .jsonrpcproxy import *
 
+# rtorrent stalls on very large multicalls so bulk fetches are split into
+# multicalls of at most this many calls
+MULTICALL_SIZE = 5000
+
+# threads used to delete data from disk
+DELETE_WORKERS = 8
+
+# comparisons filter() takes in an (accessor, op, value) tuple
+OPERATORS = {'==': operator.eq, '!=': operator.ne, '<': operator.lt,
+             '<=': operator.le, '>': operator.gt, '>=': operator.ge}
+
+def _done(completed, size):
+    return completed / size * 100 if size else 0.0
+
+# columns table() can show on top of the Torrent ACCESSORS.
+# maps column name -> (commands fetched, function given their results)
+COLUMNS = {
+    'done': (('d.completed_bytes', 'd.size_bytes'), _done),
+    'tracker': ((('t.multicall', '', 't.url='),), tracker_host),
+}
+
 class TorrentGroup(MutableSequence):
 
     '''List-like group object for Torrent objects.
@@ -58,6 +86,7 @@ class TorrentGroup(MutableSequence):
         self.data.remove(value)
 
     def __str__(self):
+        self.__cache_names()
         return str(self.data)
 
     def pop(self, value=False):
@@ -130,13 +159,9 @@ class TorrentGroup(MutableSequence):
                 mc.d.directory(torrent.hash)
             return list(mc())
 
-        def set(self, directory):
-            if not self.group.data:
-                return []
-            mc = self.group.data[0].server.get_mc_proxy()
-            for torrent in self.group.data:
-                mc.d.directory.set(torrent.hash, directory)
-            return list(mc())
+        def set(self, directory, pacer=None):
+            return self.group.each_call(('d.directory.set', directory),
+                                        pacer=pacer)
 
     class __directory_base:
 
@@ -151,13 +176,9 @@ class TorrentGroup(MutableSequence):
                 mc.d.directory_base(torrent.hash)
             return list(mc())
 
-        def set(self, directory):
-            if not self.group.data:
-                return []
-            mc = self.group.data[0].server.get_mc_proxy()
-            for torrent in self.group.data:
-                mc.d.directory_base.set(torrent.hash, directory)
-            return list(mc())
+        def set(self, directory, pacer=None):
+            return self.group.each_call(('d.directory_base.set', directory),
+                                        pacer=pacer)
 
     class __custom:
 
@@ -330,71 +351,110 @@ class TorrentGroup(MutableSequence):
         return list(mc())
 
     def erase_all(self):
-        '''removes all Torrents in group from rtorrent'''
-        for torrent in self.data[:]:
-            if torrent.erase():
-                self.data.remove(torrent)
-
-    def erase_all_with_files(self):
+        '''removes all Torrents in group from rtorrent. returns a dict
+        mapping each info hash to None if it was erased or to the Fault
+        rtorrent returned for it'''
+        report = {}
+        for torrent, row in zip(self.data, self.call('d.erase')):
+            report[torrent.hash] = first_fault(row)
+        self.data = [t for t in self.data if report[t.hash] is not None]
+        return report
+
+    def erase_all_with_files(self, workers=DELETE_WORKERS):
         '''removes all Torrents in group from rtorrent
-        and deletes data from disk. use with caution'''
-        for torrent in self.data[:]:
-            if torrent.erase_with_files():
-                self.data.remove(torrent)
-
-    def stop_all(self):
-        '''stops all torrents in group'''
+        and deletes data from disk. use with caution.
+        paths are fetched and the Torrents stopped and erased in bulk, then
+        the files are deleted by a pool of threads and directories left
+        empty are removed. data of a Torrent rtorrent fails to erase is left
+        alone, and one it erases loses its data even if stopping or closing
+        it failed. returns a dict mapping each info hash to None on success
+        or to the first error hit for it.'''
         if not self.data:
-            return []
-        mc = self.data[0].server.get_mc_proxy()
-        for torrent in self.data:
-            mc.d.stop(torrent.hash)
-        return list(mc())
-
-    def start_all(self):
-        '''starts all torrents in group'''
-        if not self.data:
-            return []
-        mc = self.data[0].server.get_mc_proxy()
-        for torrent in self.data:
-            mc.d.start(torrent.hash)
-        return list(mc())
-
-    def pause_all(self):
-        '''pauses all torrents in group'''
-        if not self.data:
-            return []
-        mc = self.data[0].server.get_mc_proxy()
-        for torrent in self.data:
-            mc.d.pause(torrent.hash)
-        return list(mc())
-
-    def resume_all(self):
-        '''resumes all torrents in group'''
-        if not self.data:
-            return []
-        mc = self.data[0].server.get_mc_proxy()
-        for torrent in self.data:
-            mc.d.resume(torrent.hash)
-        return list(mc())
-
-    def open_all(self):
-        '''opens all torrents in group'''
-        if not self.data:
-            return []
-        mc = self.data[0].server.get_mc_proxy()
-        for torrent in self.data:
-            mc.d.open(torrent.hash)
-        return list(mc())
-
-    def close_all(self):
-        '''closes all torrents in group'''
-        if not self.data:
-            return []
-        mc = self.data[0].server.get_mc_proxy()
-        for torrent in self.data:
-            mc.d.close(torrent.hash)
-        return list(mc())
+            return {}
+        report = {}
+        paths = {}
+        rows = self.call('d.directory_base', 'd.is_multi_file',
+                         ('f.multicall', '', 'f.path='))
+        for torrent, row in zip(self.data, rows):
+            report[torrent.hash] = first_fault(row)
+            if report[torrent.hash] is None:
+                paths[torrent.hash] = row
+        located = TorrentGroup(*[t for t in self.data if t.hash in paths])
+        rows = located.call('d.stop', 'd.close', 'd.erase')
+        for torrent, (stop, close, erase) in zip(located, rows):
+            # the torrent is gone from rtorrent exactly when d.erase worked,
+            # whatever d.stop and d.close said, and only then is its data
+            # deleted
+            report[torrent.hash] = first_fault([erase])
+            if report[torrent.hash] is not None:
+                del paths[torrent.hash]
+        self.data = [t for t in self.data if t.hash not in paths]
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            removals = [
+                (hash, pool.submit(remove_file, os.path.join(base, f[0])))
+                for hash, (base, multi_file, files) in paths.items()
+                for f in files
+            ]
+            for hash, future in removals:
+                if future.exception() and report[hash] is None:
+                    report[hash] = future.exception()
+            list(pool.map(remove_empty_dirs,
+                          [base for base, multi_file, files in paths.values()
+                           if multi_file]))
+        return report
+
+    def relocate(self, dest, check='size', workers=None, journal=None):
+        '''moves the data of all Torrents in group into dest and points
+        rtorrent at it, restoring each Torrent's state afterwards. see
+        relocate.relocate for check, workers and journal. returns a dict
+        mapping each info hash to None on success or the error hit.'''
+        from .relocate import relocate, DISK_WORKERS
+        if workers is None:
+            workers = DISK_WORKERS
+        return relocate(self, dest, check, workers, journal)
+
+    def check_hashes(self, per_device=1, interval=2.0, progress=None):
+        '''hash checks all Torrents in group, keeping per_device checks
+        running on each disk at a time. see hashcheck.check_hashes for the
+        report returned.'''
+        from .hashcheck import check_hashes
+        return check_hashes(self, per_device, interval, progress)
+
+    def each_call(self, command, pacer=None):
+        '''sends command for every Torrent in the group in chunked
+        multicalls, or in batches sized by a Pacer, and returns its result
+        for each Torrent with a Fault in place of any that failed.'''
+        return [row[0] for row in self.call(command, pacer=pacer)]
+
+    def check_hash_all(self, pacer=None):
+        '''queues a hash check of all torrents in group. see check_hashes
+        to keep the number checking per disk down.'''
+        return self.each_call('d.check_hash', pacer=pacer)
+
+    def stop_all(self, pacer=None):
+        '''stops all torrents in group. see each_call for pacer.'''
+        return self.each_call('d.stop', pacer=pacer)
+
+    def start_all(self, pacer=None):
+        '''starts all torrents in group. see each_call for pacer.'''
+        return self.each_call('d.start', pacer=pacer)
+
+    def pause_all(self, pacer=None):
+        '''pauses all torrents in group. see each_call for pacer.'''
+        return self.each_call('d.pause', pacer=pacer)
+
+    def resume_all(self, pacer=None):
+        '''resumes all torrents in group. see each_call for pacer.'''
+        return self.each_call('d.resume', pacer=pacer)
+
+    def open_all(self, pacer=None):
+        '''opens all torrents in group. see each_call for pacer.'''
+        return self.each_call('d.open', pacer=pacer)
+
+    def close_all(self, pacer=None):
+        '''closes all torrents in group. see each_call for pacer.'''
+        return self.each_call('d.close', pacer=pacer)
 
     def size(self):
         '''returns a SizeBytes object of the total size of
@@ -442,10 +502,73 @@ class TorrentGroup(MutableSequence):
         g = [x/1000.0 for x in mc()]
         return sum(g) / len(g)
 
+    def eta(self):
+        '''returns a Series of the seconds each Torrent in the group needs
+        to finish at its current download rate. complete Torrents are 0 and
+        stalled ones inf. fetched with one multicall per chunk.'''
+        rows = self.fetch('d.left_bytes', 'd.down.rate')
+        return Series(left / rate if rate else (math.inf if left else 0.0)
+                      for left, rate in rows)
+
+    def seed_times(self):
+        '''returns a Series of the seconds since each Torrent in the group
+        was added, from its addtime custom value. Torrents without one are
+        nan.'''
+        now = time.time()
+        return Series(now - int(added) if added else math.nan
+                      for added, in self.fetch(('d.custom', 'addtime')))
+
+    def ratios(self):
+        '''returns a Series of the ratio of each Torrent in the group'''
+        return Series(ratio / 1000.0 for ratio, in self.fetch('d.ratio'))
+
+    def bitfields(self):
+        '''returns a Bitfield of the done pieces of each Torrent in the
+        group, fetched with one chunked multicall. closed Torrents that are
+        partly done get None, rtorrent doesn't say which pieces they have.'''
+        return [Bitfield.from_hex(hex, size, done) for hex, size, done in
+                self.fetch('d.bitfield', 'd.size_chunks',
+                           'd.completed_chunks')]
+
+    def file_completion(self):
+        '''returns a list per Torrent in the group of (path, fraction done)
+        for each of its files, worked out from the bitfield and the piece
+        range of every file. bitfields and file ranges are fetched
+        together in one chunked multicall. the fraction is None for the
+        files of a closed Torrent that is partly done, see bitfields().'''
+        rows = self.fetch('d.bitfield', 'd.size_chunks', 'd.completed_chunks',
+                          ('f.multicall', '', 'f.path=', 'f.range_first=',
+                           'f.range_second='))
+        completion = []
+        for hex, size, done, files in rows:
+            bitfield = Bitfield.from_hex(hex, size, done)
+            completion.append([(path, bitfield.completion(first, last)
+                                if bitfield is not None else None)
+                               for path, first, last in files])
+        return completion
+
+    def incomplete_files(self):
+        '''returns a dict mapping the info hash of each Torrent in the group
+        with missing pieces to the paths of its files that aren't done.
+        closed Torrents that are partly done are left out since which of
+        their files are done can't be told without opening them.'''
+        incomplete = {}
+        for torrent, files in zip(self.data, self.file_completion()):
+            paths = [path for path, done in files
+                     if done is not None and done < 1]
+            if paths:
+                incomplete[torrent.hash] = paths
+        return incomplete
+
     def each(self, func):
         '''takes a function or a Torrent instance method as an argument and
         applies it to every Torrent in the group. similar to the map function.
-        returns a list.'''
+        an accessor name like 'ratio' or an unbound method like
+        Torrent.complete is fetched for the whole group at once, anything
+        else is called once per Torrent. returns a list.'''
+        spec = _compile(func)
+        if spec is not None:
+            return self.__evaluate(spec)
         if isinstance(func, type) or isinstance(func, FunctionType):
             ret = list(map(func, self))
             if all([isinstance(t, Torrent) for t in ret]):
@@ -458,19 +581,69 @@ class TorrentGroup(MutableSequence):
 
     def filter(self, func):
         '''takes a function that returns a bool as an argument and filters the
-        group by applying the function to each member'''
+        group by applying the function to each member. an unbound method
+        like Torrent.complete or an (accessor, op, value) tuple such as
+        ('ratio', '>', 2) is fetched for the whole group at once instead,
+        op being one of OPERATORS or a function of two arguments.'''
         if type(func) is str:
             s = func
-            def func(x):
-                return s in x.name.lower()
-        ret = list(filter(func, self))
+            spec = ('d.name', lambda name: s in name.lower(), None, None)
+        else:
+            spec = _compile(func)
+        if spec is not None:
+            keep = self.__evaluate(spec)
+            ret = [t for t, k in zip(self.data, keep) if k]
+        else:
+            ret = list(filter(func, self))
         try:
             return TorrentGroup(*ret)
         except Exception:
             return ret
 
+    def __evaluate(self, spec):
+        command, convert, op, other = spec
+        values = [convert(row[0]) for row in self.fetch(command)]
+        if op is None:
+            return values
+        return [op(value, other) for value in values]
+
+    def fetch(self, *commands):
+        '''fetches every command for every Torrent in the group and returns
+        a list with one list of results per Torrent. a command is a method
+        name like 'd.name' or a tuple of method name and extra arguments like
+        ('d.custom', 'addtime'). the calls are split across as few
+        multicalls as rtorrent will accept. raises the first Fault.'''
+        rows = self.call(*commands)
+        for row in rows:
+            error = first_fault(row)
+            if error is not None:
+                raise error
+        return rows
+
+    def call(self, *commands, pacer=None):
+        '''like fetch but failed calls are returned as Fault instances in
+        place of their result instead of being raised. used for mutations
+        where every Torrent needs its own outcome. with a Pacer the calls
+        are sent in batches sized to how busy rtorrent is.'''
+        if not self.data or not commands:
+            return []
+        commands = [(c,) if isinstance(c, str) else tuple(c)
+                    for c in commands]
+        if pacer is None:
+            batches = chunk(self.data, max(1, MULTICALL_SIZE // len(commands)))
+        else:
+            batches = pacer.chunks(self.data, len(commands))
+        rows = []
+        for torrents in batches:
+            mc = self.data[0].server.get_mc_proxy()
+            for torrent in torrents:
+                for method, *args in commands:
+                    getattr(mc, method)(torrent.hash, *args)
+            rows += chunk(multicall_results(mc), len(commands))
+        return rows
+
     def unregistered(self):
-        return self.filter(lambda x: x.is_unregistered())
+        return self.filter(Torrent.is_unregistered)
 
     class __throttle_name:
 
@@ -478,7 +651,7 @@ class TorrentGroup(MutableSequence):
             self.group = group
 
         def __call__(self):
-            '''sets a throttle name for each Torrent in the group.'''
+            '''returns the throttle name of each Torrent in the group.'''
             if not self.group.data:
                 return []
             mc = self.group.data[0].server.get_mc_proxy()
@@ -487,41 +660,29 @@ class TorrentGroup(MutableSequence):
             return list(mc())
 
         def set(self, name):
-            mc = self.group.data[0].server.get_mc_proxy()
-            mc2 = self.group.data[0].server.get_mc_proxy()
-            torrent_states = self.__get_states()
-            self.pause_all()
-            for torrent in self.group.data:
-                mc.d.throttle_name.set(torrent.hash, name)
-            # we had to pause the torrents to set the throttle
-            # now we restore state
-            for i, torrent in enumerate(self.group.data):
-                state = torrent_states[i]
-                if all(state):
-                    mc2.d.resume(torrent.hash)
-                if not any(state):
-                    mc2.d.stop(torrent.hash)
-                mc2()
-            return list(mc())
-
-    def __get_states(self):
-        mc = self.data[0].server.get_mc_proxy()
-        for torrent in self.group.data:
-            mc.d.state(torrent.hash)
-            mc.d.is_active(torrent.hash)
-            mc.d.is_open(torrent.hash)
-        return list(batched(mc(),3)) 
+            return self.group.set_throttle_name(name)
 
     def set_throttle_name(self, name):
-        '''sets a throttle name for each Torrent in the group.'''
+        '''sets a throttle name for each Torrent in the group.
+        rtorrent refuses to change the throttle of an active Torrent, so
+        active ones are paused, retagged and resumed inside the same
+        multicall and everything else keeps whatever state it was in.
+        takes three passes of chunked multicalls whatever the group size:
+        reading states, retagging the active ones and retagging the rest.
+        returns the result of setting the name for each Torrent, with a
+        Fault in place of any that failed.'''
         if not self.data:
             return []
-        self.pause_all()
-        mc = self.data[0].server.get_mc_proxy()
-        for torrent in self:
-            mc.d.throttle_name.set(torrent.hash, name)
-        mc()
-        self.resume_all()
+        active = [bool(row[0] and row[1])
+                  for row in self.call('d.state', 'd.is_active')]
+        running = TorrentGroup(*[t for t, a in zip(self.data, active) if a])
+        idle = TorrentGroup(*[t for t, a in zip(self.data, active) if not a])
+        results = iter(running.call('d.pause',
+                                    ('d.throttle_name.set', name),
+                                    'd.resume'))
+        unchanged = iter(idle.call(('d.throttle_name.set', name)))
+        return [next(results)[1] if a else next(unchanged)[0]
+                for a in active]
 
     def multicall(self, arg):
         if not self.data:
@@ -533,9 +694,43 @@ class TorrentGroup(MutableSequence):
             )
         return list(mc())
 
+    def table(self, columns=('name', 'tracker', 'done', 'directory')):
+        '''returns the group as a text table with a row per Torrent.
+        columns are Torrent accessor names or 'done' and 'tracker', and all
+        of them are fetched for the whole group in one chunked multicall.'''
+        specs = []
+        commands = []
+        for column in columns:
+            if column in COLUMNS:
+                fetched, func = COLUMNS[column]
+            elif column in ACCESSORS:
+                command, func = ACCESSORS[column]
+                fetched = (command,)
+            else:
+                raise ValueError(f'unknown column {column!r}')
+            specs.append((len(commands), len(fetched), func))
+            commands += fetched
+        rows = [list(columns)]
+        for torrent, row in zip(self.data, self.fetch(*commands)):
+            rows.append([_cell(func(*row[i:i+n])) for i, n, func in specs])
+            if 'name' in columns:
+                torrent._name = rows[-1][columns.index('name')]
+        widths = [max(map(len, cells)) for cells in zip(*rows)]
+        return _Text('\n'.join(
+            ' | '.join(c.ljust(w) for c, w in zip(row, widths)).rstrip()
+            for row in rows))
+
     def __repr__(self):
+        self.__cache_names()
         return pprint.pformat(self.data, width=120)
 
+    def __cache_names(self):
+        '''fetches the names not yet known in one multicall so showing the
+        group doesn't cost an rpc per Torrent'''
+        missing = TorrentGroup(*[t for t in self.data if t._name is None])
+        for torrent, (name,) in zip(missing, missing.fetch('d.name')):
+            torrent._name = name
+
     def __check(self, v):
         if type(v).__name__ != 'Torrent':
             raise TypeError(v)
@@ -548,3 +743,36 @@ class GroupError(Exception):
 
     pass
 
+
+class _Text(str):
+
+    '''str that shows as itself at the interactive prompt'''
+
+    __repr__ = str.__str__
+
+
+def _cell(value):
+    if isinstance(value, float) and not isinstance(value, SizeBytes):
+        return f'{value:.2f}'
+    return str(value)
+
+def _compile(func):
+    '''returns (command, convert, op, other) for an accessor name, an
+    unbound Torrent method like Torrent.complete or an (accessor, op,
+    value) tuple, and None for anything else, which has to be applied to
+    each Torrent in turn'''
+    if isinstance(func, str):
+        if func not in ACCESSORS:
+            return None
+        command, convert = ACCESSORS[func]
+        return command, convert, None, None
+    if isinstance(func, tuple):
+        path, op, other = func
+        if path not in ACCESSORS:
+            raise ValueError(f'unknown accessor {path!r}')
+        command, convert = ACCESSORS[path]
+        return command, convert, OPERATORS.get(op, op), other
+    if isinstance(func, FunctionType) and \
+            func.__qualname__ == f'Torrent.{func.__name__}':
+        return _compile(func.__name__)
+    return None
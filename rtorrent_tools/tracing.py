@@ -0,0 +1,111 @@
+'''records the rpc requests made by a block of code to find n+1 loops.
+
+    with server.trace() as t:
+        for torrent in group:
+            torrent.name()
+
+    1,204 x d.name from myscript.py:main (1.8s)
+
+a request is pinned to the first frame outside the transport and outside
+torrent.py, whose Torrent methods are one request each, so a loop over
+Torrents is reported where the loop is. requests to one method from one
+place that each carry a single call are what a multicall would replace.'''
+
+from . import instrument
+import os
+import sys
+import threading
+import traceback
+
+# single call requests from one place before they are reported
+THRESHOLD = 10
+# frames kept per request
+STACK_DEPTH = 8
+
+_PACKAGE = os.path.dirname(os.path.abspath(__file__))
+_SKIP = {os.path.join(_PACKAGE, name) for name in
+         ('instrument.py', 'jsonrpcproxy.py', 'tracing.py', 'torrent.py')}
+_LIBRARIES = ('xmlrpc', 'http', 'requests', 'urllib3', 'socket.py', 'ssl.py')
+
+
+def _transport(filename):
+    if filename in _SKIP:
+        return True
+    parts = filename.split(os.sep)
+    return any(lib in parts for lib in _LIBRARIES) and \
+        not filename.startswith(_PACKAGE)
+
+
+class Trace:
+
+    '''a context manager collecting every request the thread that entered
+    it makes. calls holds one dict per request: the instrument event plus
+    site, the (file, line, function) it was pinned to, and stack.'''
+
+    def __init__(self, threshold=THRESHOLD, report=True, file=None):
+        self.threshold = threshold
+        self.report = report
+        self.file = file
+        self.calls = []
+        self.__thread = None
+
+    def __enter__(self):
+        self.__thread = threading.get_ident()
+        instrument.add_hook(self.__hook)
+        return self
+
+    def __exit__(self, *exc):
+        instrument.remove_hook(self.__hook)
+        if self.report and self.repeated():
+            print(self, file=self.file or sys.stderr)
+        return False
+
+    def __hook(self, event):
+        if threading.get_ident() != self.__thread:
+            return
+        frames = [f for f in traceback.extract_stack()
+                  if not _transport(os.path.abspath(f.filename))]
+        stack = [(f.filename, f.lineno, f.name)
+                 for f in frames[-STACK_DEPTH:]][::-1]
+        self.calls.append(dict(event, site=stack[0] if stack else None,
+                               stack=stack))
+
+    def repeated(self, threshold=None):
+        '''returns (count, method, site, seconds) for every method called
+        one request at a time from one place at least threshold times,
+        most frequent first'''
+        if threshold is None:
+            threshold = self.threshold
+        groups = {}
+        for call in self.calls:
+            if len(call['methods']) != 1:
+                continue
+            site = call['site'][::2] if call['site'] else None
+            key = (call['method'], site)
+            count, seconds = groups.get(key, (0, 0.0))
+            groups[key] = (count + 1, seconds + call['seconds'])
+        found = [(count, method, site, seconds)
+                 for (method, site), (count, seconds) in groups.items()
+                 if count >= threshold]
+        found.sort(key=lambda r: r[0], reverse=True)
+        return found
+
+    @property
+    def seconds(self):
+        return sum(call['seconds'] for call in self.calls)
+
+    def summary(self):
+        lines = [f'{len(self.calls):,} requests, '
+                 f'{sum(len(c["methods"]) for c in self.calls):,} calls, '
+                 f'{self.seconds:.2f}s']
+        for count, method, site, seconds in self.repeated():
+            where = (f'{os.path.basename(site[0])}:{site[1]}'
+                     if site else '?')
+            lines.append(f'{count:,} x {method} from {where} '
+                         f'({seconds:.2f}s) could be one multicall')
+        return '\n'.join(lines)
+
+    __str__ = summary
+
+    def __repr__(self):
+        return f'Trace({len(self.calls)} requests)'
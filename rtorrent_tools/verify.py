@@ -0,0 +1,128 @@
+from .bitfield import Bitfield
+from .metainfo import Metainfo
+import hashlib
+import mmap
+import os
+
+# bytes of data each worker hashes per task
+TASK_BYTES = 64 * 1024**2
+
+
+class Verification:
+
+    '''result of checking a torrent's data on disk against its piece
+    hashes. have holds one byte per piece, 1 where the piece matched.'''
+
+    def __init__(self, metainfo, base, have, missing_files):
+        self.infohash = metainfo.infohash
+        self.base = base
+        self.have = have
+        self.missing_files = missing_files
+
+    @property
+    def mismatches(self):
+        '''indexes of the pieces that didn't match'''
+        return [i for i, ok in enumerate(self.have) if not ok]
+
+    @property
+    def complete(self):
+        return all(self.have)
+
+    def bitfield(self):
+        '''the pieces as a bitfield, high bit of the first byte first, the
+        way the bittorrent protocol and rtorrent's d.bitfield lay it out'''
+        return Bitfield.from_have(self.have).data
+
+    def hex(self):
+        '''the bitfield as upper case hex, comparable with d.bitfield'''
+        return self.bitfield().hex().upper()
+
+    def __repr__(self):
+        return (f'Verification({self.infohash}, '
+                f'{sum(self.have)}/{len(self.have)} pieces)')
+
+
+def file_layout(metainfo, base):
+    '''returns a list of (path, size, offset in the torrent) per file'''
+    layout = []
+    offset = 0
+    for path, size in metainfo.files:
+        layout.append((os.path.join(base, path), size, offset))
+        offset += size
+    return layout
+
+
+def _hash_range(layout, piece_length, total, first, hashes):
+    '''hashes pieces first .. first+len(hashes)/20 and returns a bytes
+    with 1 for each piece that matched. files are read through mmap; a
+    missing or short file fails the pieces it covers.'''
+    count = len(hashes) // 20
+    start = first * piece_length
+    end = min(start + count * piece_length, total)
+    maps = {}
+    views = {}
+    have = bytearray(count)
+    try:
+        for path, size, offset in layout:
+            if offset + size <= start or offset >= end or not size:
+                continue
+            try:
+                with open(path, 'rb') as f:
+                    if os.fstat(f.fileno()).st_size < size:
+                        continue
+                    maps[path] = mmap.mmap(f.fileno(), size,
+                                           access=mmap.ACCESS_READ)
+            except OSError:
+                continue
+            views[path] = memoryview(maps[path])
+        for n in range(count):
+            piece_start = start + n * piece_length
+            piece_end = min(piece_start + piece_length, total)
+            sha = hashlib.sha1()
+            for path, size, offset in layout:
+                if offset + size <= piece_start or offset >= piece_end:
+                    continue
+                if not size:
+                    continue
+                if path not in views:
+                    break
+                a = max(piece_start, offset) - offset
+                b = min(piece_end, offset + size) - offset
+                sha.update(views[path][a:b])
+            else:
+                have[n] = sha.digest() == hashes[n*20:n*20+20]
+    finally:
+        for view in views.values():
+            view.release()
+        for m in maps.values():
+            m.close()
+    return bytes(have)
+
+
+def verify(metainfo, base, workers=None, pool=None):
+    '''checks the data of a torrent under base (its d.directory_base)
+    against the piece hashes in metainfo, a Metainfo or a .torrent path.
+    pieces are hashed by a pool of processes, so rtorrent never has to:
+    pool when one is given, to share it between torrents, otherwise one of
+    workers processes made for the call. returns a Verification.'''
+    if not isinstance(metainfo, Metainfo):
+        metainfo = Metainfo.from_file(metainfo)
+    layout = file_layout(metainfo, base)
+    missing = [path for path, size, offset in layout
+               if size and not os.path.isfile(path)]
+    total = metainfo.size
+    per_task = max(1, TASK_BYTES // metainfo.piece_length)
+    pieces = len(metainfo)
+    firsts = range(0, pieces, per_task)
+    args = ([layout] * len(firsts),
+            [metainfo.piece_length] * len(firsts),
+            [total] * len(firsts),
+            firsts,
+            [bytes(metainfo.pieces[i*20:(i+per_task)*20]) for i in firsts])
+    if pool is not None:
+        have = b''.join(pool.map(_hash_range, *args))
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            have = b''.join(pool.map(_hash_range, *args))
+    return Verification(metainfo, base, have, missing)
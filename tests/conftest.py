@@ -0,0 +1,40 @@
+import os
+
+import pytest
+
+from rtorrent_tools import Server
+from rtorrent_tools.fakeserver import FakeServer, torrent_file
+
+
+@pytest.fixture
+def fake():
+    with FakeServer(0) as fake:
+        yield fake
+
+
+@pytest.fixture
+def server(fake):
+    return Server(fake.url)
+
+
+@pytest.fixture
+def on_disk(fake, server, tmp_path):
+    '''a multi file and a single file torrent loaded into tmp_path/src with
+    their data written out'''
+    src = tmp_path / 'src'
+    server.load.bulk([torrent_file('multi', [10, 20, 30]),
+                      torrent_file('single.bin', [5])],
+                     start=True, directory=str(src))
+    for t in fake.fake.torrents.values():
+        for f in t['files']:
+            path = os.path.join(t['directory_base'], f['path'])
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as out:
+                out.write(b'x' * f['size_bytes'])
+    return src
+
+
+@pytest.fixture
+def by_name(fake):
+    '''the fake's torrents keyed by name'''
+    return lambda: {t['name']: t for t in fake.fake.torrents.values()}
@@ -0,0 +1,55 @@
+import hashlib
+
+import pytest
+
+from rtorrent_tools.bencode import (BencodeError, decode, encode, info_span,
+                                    infohash, set_key)
+
+
+def test_round_trip():
+    value = {b'a': [1, -2, 0, b'xyz', [], {}], b'b': {b'c': b''},
+             b'd': 2**70}
+    data = encode(value)
+    assert data == b'd1:ali1ei-2ei0e3:xyzledee1:bd1:c0:e1:di%dee' % 2**70
+    decoded = decode(data)
+    assert bytes(decoded[b'a'][3]) == b'xyz'
+    assert encode(decoded) == data
+
+
+def test_strings_are_views_of_the_buffer():
+    data = bytearray(b'l4:spame')
+    value = decode(data)[0]
+    assert isinstance(value, memoryview)
+    data[3] = ord('S')
+    assert bytes(value) == b'Spam'
+
+
+def test_infohash_is_the_sha1_of_the_raw_info_bytes():
+    info = b'd6:lengthi5e4:name1:xe'
+    data = b'd8:announce3:abc4:info' + info + b'e'
+    assert info_span(data) == (22, 22 + len(info))
+    assert infohash(data) == hashlib.sha1(info).hexdigest().upper()
+
+
+def test_set_key_keeps_other_entries():
+    data = b'd1:bi2e1:ai1e1:di4ee'
+    assert set_key(data, b'c', 3) == b'd1:bi2e1:ai1e1:ci3e1:di4ee'
+    assert set_key(data, b'a', 9) == b'd1:bi2e1:ai9e1:di4ee'
+
+
+@pytest.mark.parametrize('data', [
+    b'd-4:e', b'd+4:spami1ee', b'd04:spami1ee', b'4:sp', b'i1_0e', b'i e',
+    b'ie', b'i1', b'l', b'd1:ae', b'x', b'i1ei2e', b'l' * 5000 + b'e' * 5000,
+])
+def test_malformed(data):
+    with pytest.raises(BencodeError):
+        decode(data)
+
+
+@pytest.mark.parametrize('data', [
+    b'd-4:e', b'd4:infoi1_0ee', b'd4:info' + b'l' * 5000 + b'e' * 5001,
+    b'le', b'd3:foo3:bare',
+])
+def test_malformed_infohash(data):
+    with pytest.raises(BencodeError):
+        infohash(data)
@@ -0,0 +1,48 @@
+import pytest
+
+from rtorrent_tools.bitfield import Bitfield
+
+
+def test_count():
+    # 1111 0000 0000 1111 1111, then four bits of padding
+    field = Bitfield.from_hex('F00FF0', 20)
+    assert len(field) == 20
+    assert field.count() == 12
+    assert field.count(4, 12) == 0
+    assert field.count(2, 14) == 4
+    assert field.count(19, 20) == 1
+    assert field.count(5, 5) == 0
+    assert field.completion(0, 8) == 0.5
+    assert field.completion(7, 7) == 1.0
+    assert [field[i] for i in (0, 4, 12, -1)] == [True, False, True, True]
+    with pytest.raises(IndexError):
+        field[20]
+
+
+@pytest.mark.parametrize('hex, size, ranges', [
+    ('F00FF0', 20, [(4, 12)]),
+    ('00FF00', 24, [(0, 8), (16, 24)]),
+    ('0FFF00', 20, [(0, 4), (16, 20)]),
+    ('FFFFFF', 24, []),
+    ('7FFC', 15, [(0, 1), (14, 15)]),
+    ('7FFE', 15, [(0, 1)]),
+    ('00', 3, [(0, 3)]),
+])
+def test_missing_ranges(hex, size, ranges):
+    assert Bitfield.from_hex(hex, size).missing_ranges() == ranges
+
+
+def test_from_hex_of_closed_torrents():
+    done = Bitfield.from_hex('', 10, 10)
+    assert done.count() == 10 and done.missing_ranges() == []
+    none = Bitfield.from_hex('', 10, 0)
+    assert none.count() == 0 and none.missing_ranges() == [(0, 10)]
+    assert Bitfield.from_hex('', 10, 4) is None
+    assert Bitfield.from_hex('', 10) is None
+    assert Bitfield.from_hex('', 0).count() == 0
+
+
+def test_from_have():
+    field = Bitfield.from_have([1, 0, 1, 1, 0, 0, 0, 0, 1])
+    assert field.hex() == 'B080'
+    assert field.count() == 4
@@ -0,0 +1,43 @@
+import os
+
+from rtorrent_tools import cli
+from rtorrent_tools.fakeserver import synthetic
+
+
+def test_reads_come_from_the_cache(fake, tmp_path, monkeypatch, capsys):
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path))
+    fake.fake.torrents.update(synthetic(10))
+    torrents = list(fake.fake.torrents.values())
+    assert cli.main(['--url', fake.url, 'stats']) == 0
+    assert 'torrents   10\n' in capsys.readouterr().out
+    assert os.path.exists(cli.cache_path(fake.url, 'main'))
+    requests = fake.fake.requests
+    target = torrents[3]
+    assert cli.main(['--url', fake.url, 'grep', target['hash'],
+                     '-f', 'hash']) == 0
+    assert capsys.readouterr().out == f"{target['hash']}  {target['hash']}\n"
+    assert cli.main(['--url', fake.url, 'list']) == 0
+    assert len(capsys.readouterr().out.splitlines()) == 10
+    assert fake.fake.requests == requests
+    assert cli.main(['--url', fake.url, '--refresh', 'top', '-n', '3']) == 0
+    assert len(capsys.readouterr().out.splitlines()) == 3
+    assert fake.fake.requests > requests
+
+
+def test_stop_uses_a_fresh_snapshot(fake, tmp_path, monkeypatch, capsys):
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path))
+    fake.fake.torrents.update(synthetic(10))
+    target = next(iter(fake.fake.torrents.values()))
+    target['state'] = 1
+    assert cli.main(['--url', fake.url, 'list']) == 0
+    assert cli.main(['--url', fake.url, 'stop', f"^{target['name']}$"]) == 0
+    assert capsys.readouterr().out.endswith('1 of 1 torrents done\n')
+    assert not target['state']
+    assert not os.path.exists(cli.cache_path(fake.url, 'main'))
+    assert cli.main(['--url', fake.url, 'stop', 'no such torrent']) == 1
+
+
+def test_needs_a_url(monkeypatch, capsys):
+    monkeypatch.delenv('RTT_URL', raising=False)
+    assert cli.main(['stats']) == 2
+    assert 'no url' in capsys.readouterr().err
@@ -0,0 +1,30 @@
+import pytest
+
+from rtorrent_tools import Exporter, Server
+from rtorrent_tools.fakeserver import FakeServer
+
+
+@pytest.fixture
+def fake():
+    with FakeServer(100) as fake:
+        next(iter(fake.fake.torrents.values()))['throttle_name'] = 'nope'
+        yield fake
+
+
+def test_throttle_limits(fake):
+    limits = Server(fake.url).throttle.limits(['slow', 'fast', 'nope'])
+    assert limits == {'slow': [100 * 1024, 100 * 1024],
+                      'fast': [10 * 1024**2, 10 * 1024**2],
+                      'nope': [None, None]}
+
+
+def test_metrics_take_two_requests_and_are_cached(fake):
+    exporter = Exporter(Server(fake.url), refresh=3600)
+    requests = fake.fake.requests
+    text = exporter.metrics()
+    assert fake.fake.requests == requests + 2
+    assert 'rtorrent_throttle_down_max_bytes{throttle="slow"} 102400' in text
+    assert 'throttle="nope"' in text
+    assert 'rtorrent_throttle_up_max_bytes{throttle="nope"}' not in text
+    assert exporter.metrics() is text
+    assert fake.fake.requests == requests + 2
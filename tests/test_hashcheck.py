@@ -0,0 +1,36 @@
+import xmlrpc.client
+
+from rtorrent_tools.fakeserver import synthetic
+
+
+def test_check_hashes(fake, server, monkeypatch):
+    fake.fake.torrents.update(synthetic(6))
+    group = server.view()
+    gone = group[0].hash
+    del fake.fake.torrents[gone]
+    checking = []
+    dispatch = fake.fake.dispatch
+
+    def recording(method, params):
+        if method == 'd.check_hash':
+            checking.append(params[0])
+        return dispatch(method, params)
+
+    monkeypatch.setattr(fake.fake, 'dispatch', recording)
+    progress = []
+    requests = fake.fake.requests
+    # the synthetic directories don't exist, so all share one device
+    report = group.check_hashes(per_device=2, interval=0,
+                                progress=lambda *a: progress.append(a))
+    # one request to read the torrents, then per round one to start two
+    # checks and one to poll them
+    assert fake.fake.requests - requests == 1 + 3 * 2
+    assert isinstance(report['failed'].pop(gone), xmlrpc.client.Fault)
+    assert not report['failed']
+    torrents = fake.fake.torrents
+    assert checking == [t.hash for t in group[1:]]
+    assert report['checked'] == {h: t['completed_chunks'] / t['size_chunks']
+                                 for h, t in torrents.items()}
+    assert report['bytes'] == sum(t['chunk_size'] * t['size_chunks']
+                                  for t in torrents.values())
+    assert [p[:2] for p in progress] == [(3, 6), (5, 6), (6, 6)]
@@ -0,0 +1,44 @@
+import math
+
+from rtorrent_tools import RateHistory
+from rtorrent_tools.fakeserver import synthetic
+
+
+def _values(series):
+    return [None if math.isnan(v) else v for v in series]
+
+
+def test_rate_history(fake, server):
+    fake.fake.torrents.update(synthetic(2))
+    first, second = fake.fake.torrents.values()
+    history = RateHistory(server, levels=((1, 4), (10, 3)))
+
+    def sample(now, down, done=0):
+        first.update({'down.rate': down, 'up.rate': 10, 'bytes_done': done})
+        second.update({'down.rate': 1000, 'up.rate': 0})
+        requests = fake.fake.requests
+        assert history.sample(now) == 2
+        assert fake.fake.requests - requests == 1
+
+    sample(0.2, 100)
+    sample(0.7, 300)
+    sample(1.1, 500, 1000)
+    # the slot of second 2 gets no samples
+    sample(3.5, 700, 1000)
+    assert len(history) == 2
+    assert _values(history.series(first['hash'])) == [None, 200, 500, None]
+    assert _values(history.series(first['hash'], 'up')) == [None, 10, 10,
+                                                            None]
+    # bytes_done grew by 1000 over the two seconds since the first slot
+    assert _values(history.series(first['hash'], 'done')) == [None, None,
+                                                              500, None]
+    # the ten second slots haven't closed yet
+    assert _values(history.series(first['hash'], level=1)) == [None] * 3
+    assert history.rate(first['hash'], seconds=4) == 350
+    assert history.rate(first['hash'], seconds=1) == 0
+    assert history.rate(server.view(), seconds=4) == 350 + 1000
+
+    del fake.fake.torrents[second['hash']]
+    history.sample(4.0)
+    assert len(history) == 1
+    assert len(history.series(second['hash'])) == 0
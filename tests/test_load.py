@@ -0,0 +1,27 @@
+import pytest
+
+from rtorrent_tools import Server
+from rtorrent_tools.fakeserver import torrent_file
+
+
+def test_bulk_dedupe(fake, server, tmp_path):
+    one, two = torrent_file('one', [10]), torrent_file('two', [20, 30])
+    path = tmp_path / 'one.torrent'
+    path.write_bytes(one)
+    first = server.load.bulk([one, str(path), two, two, str(path)])
+    assert len(first['loaded']) == 2
+    assert list(first['skipped']) == [str(path)]
+    assert first['failed'] == {}
+    assert sorted(t['name'] for t in fake.fake.torrents.values()) == \
+        ['one', 'two']
+    requests = fake.fake.requests
+    again = server.load.bulk([one, two])
+    assert again['loaded'] == {}
+    assert set(again['skipped']) == set(first['loaded'])
+    # only the hash list was asked for, nothing was sent
+    assert fake.fake.requests == requests + 1
+
+
+def test_bulk_refuses_jsonrpc(fake):
+    with pytest.raises(ValueError):
+        Server(fake.url, jsonrpc=True).load.bulk([torrent_file('one', [1])])
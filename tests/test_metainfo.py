@@ -0,0 +1,41 @@
+import os
+
+from rtorrent_tools.bencode import infohash
+from rtorrent_tools.fakeserver import torrent_file
+from rtorrent_tools.metainfo import Metainfo, build_index
+
+
+def test_metainfo():
+    data = torrent_file('multi', [10, 2**18 + 1], piece_length=2**18)
+    meta = Metainfo(data)
+    assert meta.name == 'multi'
+    assert meta.multi_file
+    assert meta.files == [('0.bin', 10), ('1.bin', 2**18 + 1)]
+    assert meta.size == 2**18 + 11
+    assert len(meta) == 2
+    assert bytes(meta.piece(1)) == b'\0' * 20
+    assert meta.infohash == infohash(data)
+
+
+def test_single_file_from_file(tmp_path):
+    path = tmp_path / 'one.torrent'
+    path.write_bytes(torrent_file('one.bin', [7]))
+    meta = Metainfo.from_file(str(path))
+    assert not meta.multi_file
+    assert meta.files == [('one.bin', 7)]
+    assert meta.summary(str(path)).path == str(path)
+
+
+def test_build_index_skips_bad_files(tmp_path):
+    good = [torrent_file(f'{n}.bin', [n + 1]) for n in range(3)]
+    os.makedirs(tmp_path / 'sub')
+    for n, data in enumerate(good):
+        (tmp_path / ('sub' if n else '') / f'{n}.torrent').write_bytes(data)
+    (tmp_path / 'bad.torrent').write_bytes(b'd-4:e')
+    (tmp_path / 'deep.torrent').write_bytes(b'l' * 5000 + b'e' * 5000)
+    (tmp_path / 'empty.torrent').write_bytes(b'')
+    (tmp_path / 'other.txt').write_bytes(good[0])
+    index = build_index(str(tmp_path), workers=2)
+    assert set(index) == {infohash(data) for data in good}
+    assert sorted(info.name for info in index.values()) == \
+        ['0.bin', '1.bin', '2.bin']
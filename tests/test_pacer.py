@@ -0,0 +1,36 @@
+from rtorrent_tools import Pacer
+from rtorrent_tools.fakeserver import synthetic
+
+
+def test_batches_grow_while_fast(fake, server):
+    fake.fake.torrents.update(synthetic(100))
+    group = server.view()
+    pacer = Pacer(server, batch=20, max_batch=40)
+    calls, requests = fake.fake.calls, fake.fake.requests
+    assert group.stop_all(pacer=pacer) == [0] * 100
+    # batches of 20, 30, 40 and the last 10, with a probe between each
+    assert fake.fake.requests - requests == 7
+    assert fake.fake.calls - calls == 7 + 100
+    assert pacer.batch == 40
+    assert pacer.latency is not None
+    assert not any(t['state'] for t in fake.fake.torrents.values())
+
+
+def test_batches_shrink_while_slow(server):
+    # every probe is over a negative target
+    pacer = Pacer(server, target=-1, batch=8, min_batch=2)
+    items = list(range(10))
+    # two calls per item, so a batch of 8 covers 4 items
+    assert [len(c) for c in pacer.chunks(items, width=2)] == [4, 2, 1, 1,
+                                                              1, 1]
+    assert pacer.batch == 2
+
+
+def test_group_call_keeps_order(fake, server):
+    fake.fake.torrents.update(synthetic(30))
+    group = server.view()
+    rows = group.call('d.name', 'd.size_bytes',
+                      pacer=Pacer(server, batch=10))
+    assert rows == [[t['name'], t['size_bytes']]
+                    for t in map(fake.fake.torrents.get,
+                                 (t.hash for t in group))]
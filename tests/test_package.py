@@ -0,0 +1,26 @@
+import subprocess
+import sys
+
+import pytest
+
+import rtorrent_tools
+
+
+def test_exports_and_submodules():
+    from rtorrent_tools.torrentgroup import GroupError, TorrentGroup
+    assert rtorrent_tools.TorrentGroup is TorrentGroup
+    assert rtorrent_tools.torrentgroup.GroupError is GroupError
+    with pytest.raises(AttributeError):
+        rtorrent_tools.no_such_thing
+
+
+def test_server_imports_only_what_it_needs():
+    code = ('import sys, rtorrent_tools.server; print(sorted(m for m in '
+            'sys.modules if m.startswith(("rtorrent_tools.", '
+            '"multiprocessing"))))')
+    loaded = subprocess.run([sys.executable, '-c', code], check=True,
+                            capture_output=True, text=True).stdout
+    for module in ('replay', 'placement', 'orphans', 'tracing', 'resume',
+                   'verify'):
+        assert f'rtorrent_tools.{module}' not in loaded
+    assert 'multiprocessing' not in loaded
@@ -0,0 +1,49 @@
+import errno
+import os
+from types import SimpleNamespace
+
+import pytest
+
+from rtorrent_tools import placement
+from rtorrent_tools.fakeserver import synthetic
+
+
+@pytest.fixture
+def roots(tmp_path, monkeypatch):
+    '''two roots on filesystems with 1000 and 600 bytes free'''
+    a, b = str(tmp_path / 'a'), str(tmp_path / 'b')
+    free = {a: 1000, b: 600}
+    monkeypatch.setattr(placement, 'device', lambda path: next(
+        (root for root in free if path.startswith(root)), None))
+    monkeypatch.setattr(os, 'statvfs', lambda path: SimpleNamespace(
+        f_bavail=free[path], f_frsize=1))
+    for root in free:
+        os.mkdir(root)
+    return a, b
+
+
+def test_choose_and_release(fake, server, roots):
+    a, b = roots
+    torrent = next(iter(synthetic(1).values()))
+    torrent.update(directory=os.path.join(a, 'x'), left_bytes=300)
+    fake.fake.torrents[torrent['hash']] = torrent
+    requests = fake.fake.requests
+    chooser = placement.Placement(server, [a, b], reserve=50)
+    assert chooser.available(a) == 1000 - 300 - 50
+    assert chooser.choose(400) == a
+    # a now has 250 left and b 550
+    assert chooser.choose(400) == b
+    assert chooser.available(b) == 150
+    with pytest.raises(OSError) as e:
+        chooser.choose(400)
+    assert e.value.errno == errno.ENOSPC
+    chooser.release(a, 400)
+    assert chooser.choose(100) == a
+    assert chooser.report()[a] == {'free': 1000, 'committed': 400,
+                                   'available': 550}
+    # statvfs and d.left_bytes were read once
+    assert fake.fake.requests - requests == 1
+    # a fresh read forgets what was placed but never loaded
+    chooser.ttl = -1
+    assert chooser.available(b) == 550
+    assert fake.fake.requests - requests == 2
@@ -0,0 +1,78 @@
+import os
+
+import pytest
+
+from rtorrent_tools.fakeserver import torrent_file
+from rtorrent_tools.relocate import MoveError, move_file
+
+
+def test_relocate(server, on_disk, tmp_path, by_name):
+    dst = tmp_path / 'dst'
+    report = server.view().relocate(str(dst))
+    assert all(error is None for error in report.values())
+    torrents = by_name()
+    assert torrents['multi']['directory_base'] == str(dst / 'multi')
+    assert torrents['single.bin']['directory_base'] == str(dst)
+    assert all(t['state'] == 1 for t in torrents.values())
+    assert sorted(os.listdir(dst / 'multi')) == ['0.bin', '1.bin', '2.bin']
+    assert (dst / 'single.bin').read_bytes() == b'x' * 5
+    assert not (on_disk / 'multi').exists()
+
+
+def test_relocate_partial_failure(server, on_disk, tmp_path, by_name):
+    dst = tmp_path / 'dst'
+    # a directory where a file has to go fails that one move
+    os.makedirs(dst / 'multi' / '2.bin')
+    report = server.view().relocate(str(dst))
+    torrents = by_name()
+    multi, single = torrents['multi'], torrents['single.bin']
+    error = report[multi['hash']]
+    assert isinstance(error, MoveError)
+    assert error.unrestored == []
+    assert str(error).endswith('files moved back, left stopped')
+    assert multi['state'] == 0
+    assert multi['directory_base'] == str(on_disk / 'multi')
+    assert sorted(os.listdir(on_disk / 'multi')) == ['0.bin', '1.bin', '2.bin']
+    assert report[single['hash']] is None
+    assert single['state'] == 1
+    assert single['directory_base'] == str(dst)
+
+
+def test_relocate_keeps_existing_files(server, on_disk, tmp_path, by_name):
+    dst = tmp_path / 'dst'
+    dst.mkdir()
+    (dst / 'single.bin').write_bytes(b'not the torrent')
+    report = server.view().relocate(str(dst))
+    single = by_name()['single.bin']
+    error = report[single['hash']]
+    assert isinstance(error, MoveError)
+    assert isinstance(error.error, FileExistsError)
+    assert (dst / 'single.bin').read_bytes() == b'not the torrent'
+    assert (on_disk / 'single.bin').read_bytes() == b'x' * 5
+    assert single['directory_base'] == str(on_disk)
+    assert report[by_name()['multi']['hash']] is None
+
+
+def test_relocate_refuses_shared_destination(fake, server, tmp_path,
+                                             by_name):
+    for n in range(2):
+        server.load.bulk([torrent_file('same', [10, 20 + n])],
+                         directory=str(tmp_path / f'src{n}'))
+    report = server.view().relocate(str(tmp_path / 'dst'))
+    assert len(report) == 2
+    assert all(isinstance(e, FileExistsError) for e in report.values())
+    assert not (tmp_path / 'dst').exists()
+    assert {t['directory_base'] for t in fake.fake.torrents.values()} == \
+        {str(tmp_path / 'src0' / 'same'), str(tmp_path / 'src1' / 'same')}
+
+
+def test_move_file_resumes_but_never_overwrites(tmp_path):
+    src, dst = tmp_path / 'a', tmp_path / 'b'
+    src.write_bytes(b'a')
+    dst.write_bytes(b'b')
+    with pytest.raises(FileExistsError):
+        move_file(str(src), str(dst))
+    assert src.read_bytes() == b'a' and dst.read_bytes() == b'b'
+    src.unlink()
+    move_file(str(src), str(dst))
+    assert dst.read_bytes() == b'b'
@@ -0,0 +1,30 @@
+import xmlrpc.client
+
+import pytest
+
+from rtorrent_tools import Server
+from rtorrent_tools.fakeserver import FakeServer
+from rtorrent_tools.replay import Recording, ReplayError
+
+
+def _session(server):
+    group = server.view()
+    return [t.name for t in group], list(group.ratios()), group.size()
+
+
+@pytest.mark.parametrize('jsonrpc', [False, True])
+def test_record_then_replay(tmp_path, jsonrpc):
+    path = str(tmp_path / 'session.rpc')
+    with FakeServer(30) as fake:
+        server = Server(fake.url, jsonrpc=jsonrpc, record=path)
+        recorded = _session(server)
+        server.recording.close()
+    assert len(Recording(path)) == len(server.recording) > 0
+    # the daemon is gone, every answer comes from the file
+    server = Server(fake.url, jsonrpc=jsonrpc, replay=path)
+    assert _session(server) == recorded
+    # json-rpc reports the ReplayError as a ProtocolError like any other
+    # transport failure
+    with pytest.raises((ReplayError, xmlrpc.client.ProtocolError),
+                       match='no recorded response'):
+        server.view('stopped')
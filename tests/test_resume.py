@@ -0,0 +1,38 @@
+from rtorrent_tools.bencode import decode, infohash
+from rtorrent_tools.fakeserver import torrent_file
+from rtorrent_tools.metainfo import Metainfo
+from rtorrent_tools.resume import with_resume
+
+# an info dict with its keys out of order, as some clients write them
+UNSORTED = (b'd8:announce3:abc4:infod4:name4:data6:lengthi5e'
+            b'12:piece lengthi16384e6:pieces20:' + b'\0' * 20 + b'ee')
+
+
+def test_with_resume_keeps_the_info_hash(tmp_path):
+    (tmp_path / 'data').write_bytes(b'x' * 5)
+    data = with_resume(UNSORTED, str(tmp_path))
+    assert Metainfo(data).infohash == infohash(UNSORTED)
+    meta = decode(data)
+    assert list(meta) == [b'announce', b'info', b'libtorrent_resume']
+    resume = meta[b'libtorrent_resume']
+    assert resume[b'bitfield'] == 1
+    assert resume[b'files'][0][b'completed'] == 1
+
+
+def test_with_resume_replaces_old_resume_data(tmp_path):
+    data = with_resume(with_resume(UNSORTED, str(tmp_path)), str(tmp_path))
+    resume = decode(data)[b'libtorrent_resume']
+    # the file is missing, so no piece is done
+    assert bytes(resume[b'bitfield']) == b'\0'
+    assert data.count(b'libtorrent_resume') == 1
+
+
+def test_bulk_with_resume_loads_the_reported_hash(fake, server, tmp_path):
+    data = torrent_file('multi', [10, 20])
+    (tmp_path / 'multi').mkdir()
+    for n, size in enumerate([10, 20]):
+        (tmp_path / 'multi' / f'{n}.bin').write_bytes(b'x' * size)
+    report = server.load.bulk([data], directory=str(tmp_path),
+                              resume='sizes')
+    assert list(report['loaded'].values()) == [infohash(data)]
+    assert list(fake.fake.torrents) == [infohash(data)]
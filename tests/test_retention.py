@@ -0,0 +1,53 @@
+import pytest
+
+from rtorrent_tools import Policy, Rule, Server, col
+from rtorrent_tools.fakeserver import FakeServer
+
+
+@pytest.fixture
+def fake():
+    with FakeServer(200) as fake:
+        for i, t in enumerate(fake.fake.torrents.values()):
+            if i % 3 == 0:
+                t['custom1'] = 'keep'
+        yield fake
+
+
+def policy():
+    return Policy(
+        Rule('ratio met', col('ratio') > 1, unless=col('custom1') == 'keep'),
+        Rule('stop incomplete', ~col('complete'), action='stop'))
+
+
+def test_dry_run(fake):
+    before = {h: dict(t) for h, t in fake.fake.torrents.items()}
+    plan = policy().plan(Server(fake.url))
+    erased = [i for i in range(len(plan.snapshot))
+              if plan.snapshot.columns['ratio'][i] > 1 and
+              plan.snapshot.columns['custom1'][i] != 'keep']
+    assert plan.steps[0][1] == erased
+    text = str(plan)
+    assert text.startswith(f'ratio met: erase {len(erased)} torrents, ')
+    names = plan.snapshot.columns['name']
+    assert all(f'    {names[i]}' in text for i in erased)
+    assert {h: dict(t) for h, t in fake.fake.torrents.items()} == before
+
+
+def test_apply(fake):
+    plan = policy().plan(Server(fake.url))
+    hashes = plan.snapshot.hashes
+    erased = {hashes[i] for i in plan.steps[0][1]}
+    stopped = {hashes[i] for i in plan.steps[1][1]}
+    assert erased and stopped and not erased & stopped
+    report = plan.apply()
+    assert set(report['ratio met']) == erased
+    assert set(report['stop incomplete']) == stopped
+    assert all(error is None for step in report.values()
+               for error in step.values())
+    assert not erased & set(fake.fake.torrents)
+    assert all(fake.fake.torrents[h]['state'] == 0 for h in stopped)
+
+
+def test_conditions_refuse_and_or():
+    with pytest.raises(TypeError):
+        (col('ratio') > 1) and (col('complete') == 1)
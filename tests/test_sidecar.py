@@ -0,0 +1,95 @@
+import pytest
+
+from rtorrent_tools import Server, Sidecar
+from rtorrent_tools.fakeserver import FakeServer
+from rtorrent_tools.sidecar import _mutating
+
+
+@pytest.fixture
+def fake():
+    with FakeServer(50) as fake:
+        yield fake
+
+
+@pytest.fixture
+def sidecar(fake):
+    # no refreshes during a test
+    with Sidecar(Server(fake.url), port=0, refresh=3600, max_age=3600) as s:
+        yield s
+
+
+def started(fake):
+    return next(h for h, t in fake.fake.torrents.items() if t['state'])
+
+
+def test_reads_are_cached(fake, sidecar):
+    client = Server(sidecar.url)
+    hash = started(fake)
+    assert client._rpc.d.state(hash) == 1
+    requests = fake.fake.requests
+    for _ in range(5):
+        assert client._rpc.d.state(hash) == 1
+    assert fake.fake.requests == requests
+    assert sidecar.proxy.stats['hits'] == 5
+
+
+def test_write_invalidates(fake, sidecar):
+    client = Server(sidecar.url)
+    hash = started(fake)
+    name = client._rpc.d.name(hash)
+    assert client._rpc.d.state(hash) == 1
+    client._rpc.d.stop(hash)
+    assert fake.fake.torrents[hash]['state'] == 0
+    assert client._rpc.d.state(hash) == 0
+    assert client._rpc.d.name(hash) == name
+    assert sidecar.proxy.stats['passed'] == 1
+
+
+def test_invalidate(fake, sidecar):
+    client = Server(sidecar.url)
+    hash = started(fake)
+    assert client._rpc.d.state(hash) == 1
+    fake.fake.torrents[hash]['state'] = 0
+    assert client._rpc.d.state(hash) == 1
+    sidecar.proxy.invalidate()
+    assert client._rpc.d.state(hash) == 0
+
+
+def test_unknown_methods_mutate():
+    for method in ('d.try_start', 'd.close.directly', 'd.peer_exchange',
+                   'd.accepting_seeders.enable', 'x.never_heard_of'):
+        assert _mutating(method, ['H'])
+    assert not _mutating('d.name', ['H'])
+    assert not _mutating('d.multicall2', ['', 'main', 'd.name=',
+                                          't.multicall=,t.url='])
+    assert _mutating('d.multicall2', ['', 'main', 'd.name=',
+                                      'd.custom1.set=x'])
+
+
+def test_bare_nested_commands_mutate():
+    assert _mutating('d.multicall2', ['', 'main', 'd.erase'])
+    assert _mutating('system.multicall', [[
+        {'methodName': 'd.multicall2', 'params': ['', 'main', 'd.erase']}]])
+    assert _mutating('d.multicall2', ['', 'main', 't.multicall=,t.disable='])
+    assert _mutating('d.multicall2', ['', 'main', 'd.name=;d.stop='])
+
+
+def test_evaluating_commands_mutate():
+    assert _mutating('branch', ['', 'd.is_active=', 'd.stop='])
+    assert _mutating('d.multicall2', ['', 'main',
+                                      'branch=d.is_active=,d.stop='])
+    assert _mutating('d.multicall2', ['', 'main', 'cat=$d.erase='])
+    assert not _mutating('branch', ['', 'd.is_active=', 'd.name='])
+    assert not _mutating('d.multicall.filtered', [
+        '', 'main', 'and={d.complete=,not=$d.is_open=}', 'd.hash='])
+
+
+def test_json_batch_is_one_request(fake, sidecar):
+    group = Server(sidecar.url, jsonrpc=True).view()
+    requests = fake.fake.requests
+    names = group.fetch('d.name')
+    assert fake.fake.requests == requests + 1
+    assert [row[0] for row in names] == \
+        [fake.fake.torrents[t.hash]['name'] for t in group]
+    group.fetch('d.name')
+    assert fake.fake.requests == requests + 1
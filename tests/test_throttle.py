@@ -0,0 +1,53 @@
+import xmlrpc.client
+
+import pytest
+
+from rtorrent_tools import Server
+from rtorrent_tools.fakeserver import FakeServer
+
+
+@pytest.fixture
+def fake():
+    with FakeServer(40) as fake:
+        yield fake
+
+
+def test_set_throttle_name_keeps_states(fake, monkeypatch):
+    torrents = fake.fake.torrents
+    states = {h: (t['state'], t['is_active']) for h, t in torrents.items()}
+    # started and active, started but paused, and stopped are all there
+    assert len(set(states.values())) == 3
+    dispatch = fake.fake.dispatch
+
+    def refusing(method, params):
+        # like rtorrent, an active torrent's throttle can't be changed
+        if method == 'd.throttle_name.set' and \
+                torrents[params[0]]['is_active']:
+            raise xmlrpc.client.Fault(-500, 'Torrent is active.')
+        return dispatch(method, params)
+
+    monkeypatch.setattr(fake.fake, 'dispatch', refusing)
+    group = Server(fake.url).view()
+    requests = fake.fake.requests
+    assert group.set_throttle_name('slow') == [0] * len(torrents)
+    assert fake.fake.requests - requests == 3
+    assert all(t['throttle_name'] == 'slow' for t in torrents.values())
+    assert {h: (t['state'], t['is_active'])
+            for h, t in torrents.items()} == states
+
+
+def test_inventory(fake):
+    torrents = fake.fake.torrents.values()
+    server = Server(fake.url)
+    requests = fake.fake.requests
+    inventory = server.throttle.inventory()
+    assert fake.fake.requests - requests == 2
+    assert sorted(inventory) == ['', 'fast', 'slow']
+    for name, entry in inventory.items():
+        using = [t for t in torrents if t['throttle_name'] == name]
+        assert entry['torrents'] == len(using)
+        assert entry['down_rate'] == sum(t['down.rate'] for t in using)
+        assert entry['up_rate'] == sum(t['up.rate'] for t in using)
+    assert inventory['']['down_max'] is inventory['']['up_max'] is None
+    assert inventory['slow']['down_max'] == 100 * 1024
+    assert inventory['fast']['up_max'] == 10 * 1024**2
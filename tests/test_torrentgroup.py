@@ -0,0 +1,115 @@
+import math
+import os
+import xmlrpc.client
+
+from rtorrent_tools import Torrent, TorrentGroup
+from rtorrent_tools.fakeserver import synthetic
+from rtorrent_tools.fileutils import Series
+
+
+def test_erase_all(fake, server, on_disk, by_name):
+    group = server.view()
+    gone = by_name()['single.bin']['hash']
+    # erased behind the group's back, so rtorrent faults for it
+    del fake.fake.torrents[gone]
+    report = group.erase_all()
+    assert isinstance(report[gone], xmlrpc.client.Fault)
+    assert [error for hash, error in report.items() if hash != gone] == [None]
+    assert not fake.fake.torrents
+    assert [t.hash for t in group] == [gone]
+    # the data stays
+    assert sorted(os.listdir(on_disk / 'multi')) == ['0.bin', '1.bin', '2.bin']
+
+
+def test_erase_all_with_files(fake, server, on_disk):
+    group = server.view()
+    report = group.erase_all_with_files()
+    assert len(report) == 2
+    assert all(error is None for error in report.values())
+    assert not fake.fake.torrents
+    assert list(os.walk(on_disk)) == [(str(on_disk), [], [])]
+
+
+def test_erase_all_with_files_follows_erase(fake, server, on_disk, by_name,
+                                            monkeypatch):
+    torrents = by_name()
+    closing, kept = torrents['multi']['hash'], torrents['single.bin']['hash']
+    dispatch = fake.fake.dispatch
+
+    def failing(method, params):
+        # d.close fails for one torrent and d.erase for the other
+        if (method, list(params[:1])) in (('d.close', [closing]),
+                                    ('d.erase', [kept])):
+            raise xmlrpc.client.Fault(-500, 'no')
+        return dispatch(method, params)
+
+    monkeypatch.setattr(fake.fake, 'dispatch', failing)
+    group = server.view()
+    report = group.erase_all_with_files()
+    assert report[closing] is None
+    assert isinstance(report[kept], xmlrpc.client.Fault)
+    assert list(fake.fake.torrents) == [kept]
+    assert [t.hash for t in group] == [kept]
+    assert not (on_disk / 'multi').exists()
+    assert (on_disk / 'single.bin').exists()
+
+
+def test_eta_and_ratios(fake, server):
+    fake.fake.torrents.update(synthetic(30))
+    group = server.view()
+    torrents = [fake.fake.torrents[t.hash] for t in group]
+    requests = fake.fake.requests
+    eta = group.eta()
+    ratios = group.ratios()
+    assert fake.fake.requests - requests == 2
+    for t, seconds, ratio in zip(torrents, eta, ratios):
+        if not t['left_bytes']:
+            assert seconds == 0
+        elif not t['down.rate']:
+            assert seconds == math.inf
+        else:
+            assert seconds == t['left_bytes'] / t['down.rate']
+        assert ratio == t['ratio'] / 1000.0
+    assert len(eta) == len(ratios) == 30
+
+
+def test_series_summary():
+    series = Series([4, math.nan, 1, 3, 2, 5])
+    assert series.known() == [1, 2, 3, 4, 5]
+    assert series.summary((0, 50, 90, 100)) == {0: 1, 50: 3, 90: 4.6,
+                                                100: 5}
+    assert series.percentile(25) == 2
+    assert math.isnan(Series([math.nan]).percentile(50))
+    assert isinstance(series[1:3], Series)
+
+
+def test_names_are_fetched_once(fake, server):
+    fake.fake.torrents.update(synthetic(20))
+    names = sorted(t['name'] for t in fake.fake.torrents.values())
+    unnamed = lambda: TorrentGroup(*[Torrent(server, h)
+                                     for h in fake.fake.torrents])
+    group = unnamed()
+    requests = fake.fake.requests
+    assert all(name in repr(group) for name in names)
+    assert fake.fake.requests - requests == 1
+    repr(group)
+    str(group)
+    assert sorted(t.name for t in group) == names
+    assert fake.fake.requests - requests == 1
+
+
+def test_table_caches_names(fake, server):
+    fake.fake.torrents.update(synthetic(20))
+    group = TorrentGroup(*[Torrent(server, h) for h in fake.fake.torrents])
+    requests = fake.fake.requests
+    lines = group.table().splitlines()
+    assert fake.fake.requests - requests == 1
+    cells = [[c.strip() for c in line.split(' | ')] for line in lines]
+    assert cells[0] == ['name', 'tracker', 'done', 'directory']
+    for torrent, (name, tracker, done, directory) in zip(
+            fake.fake.torrents.values(), cells[1:]):
+        assert name == torrent['name']
+        assert tracker in torrent['trackers'][0]['url']
+        assert directory == torrent['directory']
+    repr(group)
+    assert fake.fake.requests - requests == 1
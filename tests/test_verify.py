@@ -0,0 +1,52 @@
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import os
+
+from rtorrent_tools.bencode import encode
+from rtorrent_tools.metainfo import Metainfo
+from rtorrent_tools.verify import verify
+
+# five 16 byte pieces across three files, the third piece spanning two
+PIECE = 16
+SIZES = [40, 30, 10]
+
+
+def _torrent(tmp_path):
+    '''writes the files under tmp_path/multi and returns a torrent with
+    their real piece hashes'''
+    data = bytes(range(sum(SIZES)))
+    base = tmp_path / 'multi'
+    base.mkdir()
+    offset = 0
+    for n, size in enumerate(SIZES):
+        (base / f'{n}.bin').write_bytes(data[offset:offset + size])
+        offset += size
+    pieces = b''.join(hashlib.sha1(data[i:i + PIECE]).digest()
+                      for i in range(0, len(data), PIECE))
+    info = {b'name': b'multi', b'piece length': PIECE, b'pieces': pieces,
+            b'files': [{b'length': s, b'path': [f'{n}.bin'.encode()]}
+                       for n, s in enumerate(SIZES)]}
+    return Metainfo(encode({b'info': info})), str(base)
+
+
+def test_verify_complete(tmp_path):
+    metainfo, base = _torrent(tmp_path)
+    result = verify(metainfo, base, workers=2)
+    assert result.complete
+    assert result.mismatches == []
+    assert result.missing_files == []
+    assert result.hex() == 'F8'
+
+
+def test_verify_damaged(tmp_path):
+    metainfo, base = _torrent(tmp_path)
+    with open(os.path.join(base, '0.bin'), 'r+b') as f:
+        f.seek(20)
+        f.write(b'\xff')
+    os.remove(os.path.join(base, '2.bin'))
+    with ThreadPoolExecutor(2) as pool:
+        result = verify(metainfo, base, pool=pool)
+    assert not result.complete
+    assert result.mismatches == [1, 4]
+    assert result.missing_files == [os.path.join(base, '2.bin')]
+    assert result.hex() == 'B0'